@@ -0,0 +1 @@
+"""Offline benchmarks for the Aprende Aqui video engine."""
@@ -0,0 +1,110 @@
+"""Exercise the per-provider API policies against the local stub under throttling and outages.
+
+Run with ``python -m benchmarks.bench_api [--requests 24] [--limit 4] [--concurrency 8]``.
+No real API is touched: every service points at ``benchmarks.stub_api``.
+
+- ``throttled``: the stub allows ``--limit`` requests/s per provider. The same
+  burst of Gemini, ElevenLabs and Pexels calls runs with unpaced clients
+  (retries and Retry-After only) and with clients paced by a token bucket at
+  the stub's limit; 429s seen by the server, retries, failures and wall time
+  are reported for each.
+- ``outage``: Gemini answers 503 to everything. Script requests run with the
+  circuit breaker disabled and enabled; with it, calls after the breaker trips
+  fall back to the local script immediately instead of retrying.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from benchmarks.stub_api import StubServer
+from src.services.elevenlabs_service import ElevenLabsService
+from src.services.gemini_service import GeminiService
+from src.services.pexels_service import PexelsService
+from src.utils.retry import ApiPolicy
+
+
+def _burst(root: Path, base_url: str, requests: int, concurrency: int, rate: float | None, burst: int) -> dict:
+    gemini = GeminiService("stub", base_url=base_url, policy=ApiPolicy("gemini", rate, burst, retry_on=(ValueError,)))
+    tts = ElevenLabsService("stub", "voice", base_url=base_url, policy=ApiPolicy("elevenlabs", rate, burst))
+    pexels = PexelsService("stub", root / "cache", base_url=base_url, policy=ApiPolicy("pexels", rate, burst))
+    audio_dir = root / "audio"
+    audio_dir.mkdir(parents=True, exist_ok=True)
+    calls = [
+        *[lambda i=i: gemini.generate_script(f"tema {i}", "curiosity", 40, use_cache=False) for i in range(requests)],
+        *[lambda i=i: tts.policy.call(tts._elevenlabs_tts, f"texto {i}", audio_dir / f"{i}.mp3") for i in range(requests)],
+        *[lambda i=i: pexels._search("videos/search", {"query": f"busca {i}", "per_page": 8}) for i in range(requests)],
+    ]
+
+    def one(call) -> bool:
+        try:
+            call()
+            return True
+        except Exception:
+            return False
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, calls))
+    return {
+        "wall_seconds": round(time.perf_counter() - started, 3),
+        "failed_calls": results.count(False),
+        "client": {service.policy.name: service.policy.stats() for service in (gemini, tts, pexels)},
+    }
+
+
+def throttled(requests: int, limit: float, concurrency: int) -> list[dict]:
+    results = []
+    for name, rate in (("unpaced", None), ("paced", limit)):
+        root = Path(tempfile.mkdtemp(prefix="bench_api_"))
+        server = StubServer(limit=limit, burst=2, retry_after=1.0, seed=1).start()
+        try:
+            result = _burst(root, server.base_url, requests, concurrency, rate, 2)
+            results.append({"scenario": "throttled", "client": name, **result, "server": server.stats})
+        finally:
+            server.shutdown()
+            shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def outage(requests: int, concurrency: int) -> list[dict]:
+    results = []
+    for name, threshold in (("no_breaker", 10**9), ("breaker", 3)):
+        server = StubServer(down=("gemini",), seed=1).start()
+        try:
+            policy = ApiPolicy("gemini", failure_threshold=threshold, reset_after=60.0, retry_on=(ValueError,))
+            gemini = GeminiService("stub", base_url=server.base_url, policy=policy)
+            started = time.perf_counter()
+            scripts = gemini.generate_scripts([(f"tema {i}", "curiosity", 40) for i in range(requests)], use_cache=False)
+            results.append(
+                {
+                    "scenario": "outage",
+                    "client": name,
+                    "wall_seconds": round(time.perf_counter() - started, 3),
+                    "fallback_scripts": sum(1 for script in scripts if script.safety_flags.get("fallback_mode")),
+                    "client_stats": policy.stats(),
+                    "server": server.stats,
+                }
+            )
+        finally:
+            server.shutdown()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=24)
+    parser.add_argument("--limit", type=float, default=4.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    results = throttled(args.requests, args.limit, args.concurrency) + outage(args.requests, args.concurrency)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Compare buffered serial downloads with PexelsService's streamed, concurrent downloads.
+
+Run with ``python -m benchmarks.bench_downloads [--files 9] [--size-mb 40] [--latency-ms 40]``.
+A local HTTP server (with Range support and per-chunk latency) stands in for the
+Pexels CDN. Each strategy runs in its own child process so ``ru_maxrss`` is its
+peak RSS alone.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+
+def serve(root: Path, latency: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            path = root / self.path.lstrip("/").split("?")[0]
+            if not path.is_file():
+                self.send_error(404)
+                return
+            size = path.stat().st_size
+            start = 0
+            if self.headers.get("Range", "").startswith("bytes="):
+                start = int(self.headers["Range"][6:].split("-")[0] or 0)
+                if start >= size:
+                    self.send_error(416)
+                    return
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{size - 1}/{size}")
+            else:
+                self.send_response(200)
+            self.send_header("Content-Length", str(size - start))
+            self.end_headers()
+            with path.open("rb") as handle:
+                handle.seek(start)
+                while chunk := handle.read(256 * 1024):
+                    time.sleep(latency)
+                    self.wfile.write(chunk)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _buffered_serial(urls: list[str], out_dir: Path) -> None:
+    for idx, url in enumerate(urls):
+        with urllib.request.urlopen(url, timeout=60) as response:
+            (out_dir / f"clip_{idx}.mp4").write_bytes(response.read())
+
+
+def _streamed_concurrent(urls: list[str], out_dir: Path) -> None:
+    from src.services.pexels_service import PexelsService
+
+    service = PexelsService(None, out_dir)
+    with ThreadPoolExecutor(max_workers=service.max_connections) as pool:
+        list(pool.map(service._download, urls, [f"clip {idx}" for idx in range(len(urls))]))
+
+
+STRATEGIES = {"buffered_serial": _buffered_serial, "streamed_concurrent": _streamed_concurrent}
+
+
+def _child(strategy: str, urls: list[str], out_dir: str) -> None:
+    started = time.perf_counter()
+    STRATEGIES[strategy](urls, Path(out_dir))
+    elapsed = time.perf_counter() - started
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"strategy": strategy, "wall_seconds": round(elapsed, 3), "peak_rss_mb": round(peak_kb / 1024, 1)}))
+
+
+def run(files: int, size_mb: int, latency_ms: int) -> list[dict]:
+    root = Path(tempfile.mkdtemp(prefix="bench_downloads_"))
+    try:
+        served = root / "served"
+        served.mkdir()
+        for idx in range(files):
+            with (served / f"clip_{idx}.mp4").open("wb") as handle:
+                for _ in range(size_mb):
+                    handle.write(bytes([idx % 256]) * (1024 * 1024))
+        server = serve(served, latency_ms / 1000)
+        urls = [f"http://127.0.0.1:{server.server_port}/clip_{idx}.mp4" for idx in range(files)]
+        results = []
+        for strategy in STRATEGIES:
+            out_dir = root / strategy
+            out_dir.mkdir()
+            child = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_downloads", "--child", strategy, str(out_dir), *urls],
+                check=True,
+                capture_output=True,
+                text=True,
+            )
+            results.append(json.loads(child.stdout.strip().splitlines()[-1]))
+        server.shutdown()
+        return results
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main() -> None:
+    if len(sys.argv) > 3 and sys.argv[1] == "--child":
+        _child(sys.argv[2], sys.argv[4:], sys.argv[3])
+        return
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=9)
+    parser.add_argument("--size-mb", type=int, default=40)
+    parser.add_argument("--latency-ms", type=int, default=40)
+    args = parser.parse_args()
+    print(json.dumps(run(args.files, args.size_mb, args.latency_ms), indent=2))
+
+
+if __name__ == "__main__":
+    main()
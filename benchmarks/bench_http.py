@@ -0,0 +1,122 @@
+"""Compare one fresh connection per request (what ``urlopen`` did) with the pooled keep-alive client over HTTPS.
+
+Run with ``python -m benchmarks.bench_http [--rtt-ms 20] [--handshake-rtts 3] [--videos 3] [--concurrency 4]``.
+A self-signed certificate is generated with ``openssl`` and ``benchmarks.stub_api``
+serves Gemini, ElevenLabs and Pexels over TLS. Each request costs ``--rtt-ms`` and
+each new connection ``--handshake-rtts`` extra round trips on top of the real
+loopback TCP+TLS handshake. ``fresh_connections`` is the HTTP client with pooling
+disabled, which connects like ``urlopen``; ``pooled`` keeps connections alive.
+Both run the API calls of ``--videos`` videos (one script, then per segment one
+TTS call, two searches and a download) through the real services. Wall time,
+per-request latency and the connections the server accepted are reported.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import ssl
+import statistics
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from benchmarks.stub_api import StubServer
+from src.services.elevenlabs_service import ElevenLabsService
+from src.services.gemini_service import GeminiService
+from src.services.pexels_service import PexelsService
+from src.utils.http import HttpClient
+
+SEGMENTS = 8
+
+
+def make_cert(root: Path) -> tuple[Path, Path]:
+    cert, key = root / "cert.pem", root / "key.pem"
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=127.0.0.1",
+            "-addext", "subjectAltName=IP:127.0.0.1", "-keyout", str(key), "-out", str(cert),
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return cert, key
+
+
+def _services(http: HttpClient, base_url: str, root: Path, videos: int, concurrency: int) -> list[float]:
+    gemini = GeminiService("stub", base_url=base_url, http=http)
+    tts = ElevenLabsService("stub", "voice", base_url=base_url, http=http)
+    pexels = PexelsService("stub", root / "cache", base_url=base_url, http=http, max_connections=concurrency)
+    audio = root / "audio"
+    audio.mkdir(parents=True, exist_ok=True)
+
+    def timed(call) -> float:
+        started = time.perf_counter()
+        call()
+        return time.perf_counter() - started
+
+    calls = []
+    for video in range(videos):
+        calls.append(lambda v=video: gemini._request_script(f"tema {v}"))
+        for idx in range(SEGMENTS):
+            calls.append(lambda v=video, i=idx: tts._elevenlabs_tts(f"texto {v} {i}", audio / f"{v}_{i}.mp3"))
+            calls.append(lambda v=video, i=idx: pexels._fetch_search("videos/search", {"query": f"q{v}_{i}"}))
+            calls.append(lambda v=video, i=idx: pexels._fetch_search("v1/search", {"query": f"q{v}_{i}"}))
+            calls.append(lambda v=video, i=idx: pexels._stream_to(f"{base_url}/media/clip_{v}_{i}.mp4", root / f"{v}_{i}.part"))
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(timed, calls))
+
+
+def run(rtt_ms: int, handshake_rtts: int, videos: int, concurrency: int) -> list[dict]:
+    root = Path(tempfile.mkdtemp(prefix="bench_http_"))
+    try:
+        cert, key = make_cert(root)
+        context = ssl.create_default_context(cafile=str(cert))
+        rtt = rtt_ms / 1000
+        clients = {
+            "fresh_connections": lambda server, out: _services(HttpClient(ssl_context=context, max_idle_per_host=0), server.base_url, out, videos, concurrency),
+            "pooled": lambda server, out: _services(HttpClient(ssl_context=context, max_idle_per_host=concurrency), server.base_url, out, videos, concurrency),
+        }
+        results = []
+        for name, client in clients.items():
+            server = StubServer(latency=rtt, connect_latency=rtt * handshake_rtts, certfile=str(cert), keyfile=str(key), media=b"\0" * 256 * 1024).start()
+            out = root / name
+            out.mkdir()
+            try:
+                started = time.perf_counter()
+                latencies = client(server, out)
+                wall = time.perf_counter() - started
+            finally:
+                server.shutdown()
+                server.server_close()
+            latencies.sort()
+            results.append(
+                {
+                    "client": name,
+                    "requests": len(latencies),
+                    "connections": server.connections,
+                    "wall_seconds": round(wall, 3),
+                    "p50_ms": round(statistics.median(latencies) * 1000, 1),
+                    "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 1),
+                    "mean_ms": round(statistics.fmean(latencies) * 1000, 1),
+                }
+            )
+        return results
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rtt-ms", type=int, default=20)
+    parser.add_argument("--handshake-rtts", type=int, default=3)
+    parser.add_argument("--videos", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+    print(json.dumps(run(args.rtt_ms, args.handshake_rtts, args.videos, args.concurrency), indent=2))
+
+
+if __name__ == "__main__":
+    main()
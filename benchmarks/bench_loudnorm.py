@@ -0,0 +1,59 @@
+"""Compare dynamic and linear loudnorm narration mixes.
+
+Run with ``python -m benchmarks.bench_loudnorm [--segments 8]``. Each mode mixes
+the same fallback-tone narration; the report holds wall time and the measured
+loudness of ``narration_full.mp3`` against the -16 LUFS / -1.5 dBTP target.
+The linear run is repeated with a warm cache to show that measurements are reused.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from src.services.elevenlabs_service import LOUDNORM_MODES, ElevenLabsService
+from src.utils.audio import LOUDNORM_TARGET, measure_loudness
+from src.utils.cache import FileCache
+
+
+def run(segments: int) -> list[dict]:
+    root = Path(tempfile.mkdtemp(prefix="bench_loudnorm_"))
+    try:
+        texts = [f"Segmento {idx} com algumas palavras de narração para o teste." * (1 + idx % 3) for idx in range(segments)]
+        results = []
+        for label, mode in [*((mode, mode) for mode in LOUDNORM_MODES), ("linear_warm_cache", "linear")]:
+            cache = FileCache(root / f"cache_{mode}", 1 << 30, suffix=".mp3")
+            service = ElevenLabsService(None, "bench", cache=cache, loudnorm_mode=mode)
+            out_dir = root / label
+            out_dir.mkdir()
+            started = time.perf_counter()
+            _, narration, _ = service.synthesize_segments(texts, out_dir)
+            elapsed = time.perf_counter() - started
+            measured = measure_loudness(narration)
+            results.append(
+                {
+                    "mode": label,
+                    "wall_seconds": round(elapsed, 3),
+                    "integrated_lufs": measured["input_i"],
+                    "true_peak_dbtp": measured["input_tp"],
+                    "delta_lu": round(measured["input_i"] - LOUDNORM_TARGET["I"], 2),
+                    "cache": cache.stats(),
+                }
+            )
+        return results
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--segments", type=int, default=8)
+    args = parser.parse_args()
+    print(json.dumps(run(args.segments), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Compare the multi-pass and single-pass render modes of VideoComposer.
+
+Run with ``python -m benchmarks.bench_render_modes [--scenes 9] [--workers N]``.
+Reports wall time, bytes left on disk in the run directory and bytes written
+by ffmpeg child processes (``ru_oublock``).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import resource
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.fixtures import make_scene_inputs
+from src.video.composer import RENDER_MODES, VideoComposer
+
+
+def _dir_bytes(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def run(scenes: int, workers: int | None) -> list[dict]:
+    root = Path(tempfile.mkdtemp(prefix="bench_render_"))
+    try:
+        assets, timings, narration, ass_path = make_scene_inputs(root / "fixtures", count=scenes)
+        results = []
+        for mode in RENDER_MODES:
+            out_dir = root / mode
+            out_dir.mkdir()
+            blocks_before = resource.getrusage(resource.RUSAGE_CHILDREN).ru_oublock
+            started = time.perf_counter()
+            _, metadata = VideoComposer(seed=1, workers=workers).compose(
+                assets, timings, narration, ass_path, out_dir, "medium", music_on=False, music_path=None, render_mode=mode
+            )
+            elapsed = time.perf_counter() - started
+            blocks = resource.getrusage(resource.RUSAGE_CHILDREN).ru_oublock - blocks_before
+            results.append(
+                {
+                    "mode": json.loads(metadata.read_text(encoding="utf-8"))["render_mode"],
+                    "requested_mode": mode,
+                    "wall_seconds": round(elapsed, 3),
+                    "bytes_on_disk": _dir_bytes(out_dir),
+                    "bytes_written": blocks * 512,
+                }
+            )
+        return results
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scenes", type=int, default=9)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    print(json.dumps(run(args.scenes, args.workers), indent=2))
+
+
+if __name__ == "__main__":
+    main()
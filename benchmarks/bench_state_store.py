@@ -0,0 +1,93 @@
+"""History updates: JsonCache whole-file rewrite vs. StateStore (SQLite WAL) single-key update.
+
+Run with ``python -m benchmarks.bench_state_store [--updates 10000] [--processes 4]``.
+The concurrency check runs `--processes` writers against one file and counts lost updates.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import tempfile
+import time
+from multiprocessing import Process
+from pathlib import Path
+
+from src.utils.cache import JsonCache, StateStore
+
+
+def _history_update(history: list[str], item: str) -> list[str]:
+    return (history[-6:] + [item])[-12:]
+
+
+def _fill(store: JsonCache | StateStore, keys: int) -> None:
+    # realistic payload: one history list per CTA key plus the asset history
+    for idx in range(keys):
+        store.set(f"initial_style_{idx}", [f"cta {n}" for n in range(5)])
+
+
+def _timed_updates(store: JsonCache | StateStore, updates: int) -> float:
+    started = time.perf_counter()
+    for idx in range(updates):
+        store.update("recent_assets", lambda history, i=idx: _history_update(history, f"asset_{i}.mp4"), default=[])
+    return time.perf_counter() - started
+
+
+def _counter_worker(kind: str, path: str, increments: int) -> None:
+    store = StateStore(Path(path), "bench") if kind == "state_store" else JsonCache(Path(path))
+    for _ in range(increments):
+        try:
+            store.update("counter", lambda value: value + 1, default=0)
+        except ValueError:
+            pass  # a torn JsonCache read; the update is lost
+
+
+def _lost_updates(kind: str, path: Path, processes: int, increments: int) -> int:
+    workers = [Process(target=_counter_worker, args=(kind, str(path), increments)) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    store = StateStore(path, "bench") if kind == "state_store" else JsonCache(path)
+    try:
+        final = store.get("counter", 0)
+    except ValueError:
+        final = 0
+    return processes * increments - final
+
+
+def run(updates: int, processes: int) -> list[dict]:
+    root = Path(tempfile.mkdtemp(prefix="bench_state_"))
+    try:
+        results = []
+        for kind, store in (
+            ("json_cache", JsonCache(root / "history.json")),
+            ("state_store", StateStore(root / "state.sqlite3", "bench")),
+        ):
+            _fill(store, 40)
+            elapsed = _timed_updates(store, updates)
+            counter_path = root / ("counter.json" if kind == "json_cache" else "counter.sqlite3")
+            results.append(
+                {
+                    "backend": kind,
+                    "updates": updates,
+                    "seconds": round(elapsed, 3),
+                    "updates_per_second": round(updates / elapsed),
+                    "lost_updates_concurrent": _lost_updates(kind, counter_path, processes, 200),
+                }
+            )
+        return results
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--updates", type=int, default=10_000)
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+    print(json.dumps(run(args.updates, args.processes), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Compare segment timing extraction strategies on a 10-segment narration.
+
+Run with ``python -m benchmarks.bench_timing [--segments 10] [--repeat 5]``.
+``ffprobe_per_segment`` is the previous behaviour of ``_build_timing``;
+``mp3_headers`` is the in-process reader now used by ElevenLabsService and
+``batch_probe`` is its single-process fallback.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.fixtures import make_tone
+from src.utils.audio import mp3_duration, probe_durations
+
+
+def _ffprobe_per_segment(paths: list[Path]) -> list[float]:
+    durations = []
+    for path in paths:
+        probe = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=nw=1:nk=1", str(path)],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        durations.append(float(probe.stdout.strip()))
+    return durations
+
+
+STRATEGIES = {
+    "ffprobe_per_segment": _ffprobe_per_segment,
+    "batch_probe": probe_durations,
+    "mp3_headers": lambda paths: [mp3_duration(path) for path in paths],
+}
+
+
+def run(segments: int, repeat: int) -> dict:
+    root = Path(tempfile.mkdtemp(prefix="bench_timing_"))
+    try:
+        paths = [make_tone(root / f"segment_{idx:02d}.mp3", 1.8 + 0.37 * idx) for idx in range(segments)]
+        reference = _ffprobe_per_segment(paths)
+        results = {}
+        for name, strategy in STRATEGIES.items():
+            best = float("inf")
+            for _ in range(repeat):
+                started = time.perf_counter()
+                durations = strategy(paths)
+                best = min(best, time.perf_counter() - started)
+            results[name] = {
+                "best_ms": round(best * 1000, 3),
+                "max_abs_error_s": round(max(abs(a - b) for a, b in zip(durations, reference)), 4),
+            }
+        return results
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--segments", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args.segments, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import subprocess
+from pathlib import Path
+
+from src.models import AssetChoice, Segment, Timing
+from src.services.subtitle_service import SubtitleService
+
+
+def make_clip(path: Path, seconds: float = 4.0, size: str = "1920x1080", rate: int = 30) -> Path:
+    if not path.exists():
+        subprocess.run(
+            ["ffmpeg", "-y", "-f", "lavfi", "-i", f"testsrc2=size={size}:rate={rate}", "-t", f"{seconds}", "-pix_fmt", "yuv420p", str(path)],
+            check=True,
+            capture_output=True,
+        )
+    return path
+
+
+def make_image(path: Path, size: str = "1600x1200") -> Path:
+    if not path.exists():
+        subprocess.run(["ffmpeg", "-y", "-f", "lavfi", "-i", f"testsrc2=size={size}", "-frames:v", "1", str(path)], check=True, capture_output=True)
+    return path
+
+
+def make_tone(path: Path, seconds: float) -> Path:
+    if not path.exists():
+        subprocess.run(
+            ["ffmpeg", "-y", "-f", "lavfi", "-i", f"sine=frequency=220:duration={seconds}", "-af", "volume=0.03", str(path)],
+            check=True,
+            capture_output=True,
+        )
+    return path
+
+
+def make_scene_inputs(root: Path, count: int = 9, seconds: float = 2.5) -> tuple[list[AssetChoice], list[Timing], Path, Path]:
+    """Build assets, timings, narration and subtitles for a `count`-scene render."""
+    root.mkdir(parents=True, exist_ok=True)
+    clip = make_clip(root / "clip.mp4")
+    image = make_image(root / "still.jpg")
+    assets = [
+        AssetChoice(i, f"item {i}", "image" if i % 3 == 2 else "video", str(image if i % 3 == 2 else clip), None) for i in range(count)
+    ]
+    timings = [Timing(segment_index=i, start=i * seconds, end=(i + 1) * seconds, duration=seconds) for i in range(count)]
+    narration = make_tone(root / "narration.mp3", count * seconds)
+    segments = [Segment(f"Cena {i + 1} do benchmark.", [f"item {i}"], ["benchmark"]) for i in range(count)]
+    _, ass_path = SubtitleService().write(segments, timings, root)
+    return assets, timings, narration, ass_path
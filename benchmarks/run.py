@@ -0,0 +1,186 @@
+"""Offline end-to-end benchmark: time every generation stage for each style and visual intensity.
+
+Run with ``python -m benchmarks.run [--repeat 1] [--output results.json]``.
+No API keys are used: scripts and narration come from the key-less fallbacks and
+assets from local fixture media seeded into a fresh catalog, so each case is a
+cold run. Stage times (median of ``--repeat``) are printed as JSON.
+
+``--baseline FILE`` compares against stored results and exits with status 1
+when a stage is slower than ``--threshold`` (default 20%; per stage with
+``--stage-threshold scenes=0.5``) and more than ``--min-seconds`` slower in
+absolute terms. ``--save-baseline`` writes the current results to FILE instead.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import replace
+from pathlib import Path
+
+from benchmarks.fixtures import make_clip, make_image
+from src.config import AppConfig
+from src.models import GenerationJob
+from src.pipeline import STYLES, Pipeline
+from src.utils.audio import mp3_duration
+
+INTENSITIES = ("low", "medium", "high")
+TOPIC = "benchmark offline"
+
+
+@contextmanager
+def _timed(stages: dict[str, float], name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    yield
+    stages[name] = time.perf_counter() - started
+
+
+def _pipeline(root: Path, workers: int | None) -> Pipeline:
+    config = replace(
+        AppConfig.from_env(),
+        output_dir=root / "output",
+        cache_dir=root / "cache",
+        pexels_api_key=None,
+        gemini_api_key=None,
+        elevenlabs_api_key=None,
+        music_default_path=None,
+    )
+    config.cache_dir.mkdir(parents=True, exist_ok=True)
+    return Pipeline(config, workers=workers)
+
+
+def run_case(root: Path, fixtures: dict[str, Path], style: str, intensity: str, workers: int | None) -> dict[str, float]:
+    pipeline = _pipeline(root, workers)
+    slug = pipeline.pexels._slug(TOPIC)
+    pipeline.pexels.catalog.add(fixtures["video"], slug, TOPIC, "video", used=False)
+    pipeline.pexels.catalog.add(fixtures["image"], slug, TOPIC, "image", used=False)
+    job = GenerationJob(topic=TOPIC, style=style, visual_intensity=intensity, seed=1)
+    out = root / "run"
+    out.mkdir(parents=True, exist_ok=True)
+    composer = pipeline.composer
+
+    stages: dict[str, float] = {}
+    with _timed(stages, "script"):
+        script = pipeline.write_script(job, out)
+    with _timed(stages, "tts"):
+        segment_files, narration, _ = pipeline.tts.synthesize_segments([s.text for s in script.segments], out)
+    with _timed(stages, "timing"):
+        timings = pipeline.tts._build_timing([mp3_duration(path) for path in segment_files])
+    with _timed(stages, "assets"):
+        assets = pipeline.fetch_assets(script)
+    with _timed(stages, "subtitles"):
+        _, ass_path = pipeline.write_subtitles(script, timings, out)
+    scenes_dir = out / "scenes"
+    scenes_dir.mkdir(exist_ok=True)
+    with _timed(stages, "scenes"), ThreadPoolExecutor(max_workers=composer.workers) as pool:
+        rendered = list(pool.map(lambda pair: composer.render_scene(pair[0], pair[1], scenes_dir, intensity), zip(assets, timings)))
+    with _timed(stages, "concat"):
+        visual = composer.concat_scenes([path for path, _, _ in rendered], out / "visual_only.mp4")
+    with _timed(stages, "mux"):
+        composer.mux(visual, narration, ass_path, out / "final.mp4", None)
+    stages["total"] = sum(stages.values())
+    return stages
+
+
+def run(styles: list[str], intensities: list[str], repeat: int, workers: int | None) -> dict:
+    root = Path(tempfile.mkdtemp(prefix="bench_run_"))
+    try:
+        fixtures = {"video": make_clip(root / "clip.mp4"), "image": make_image(root / "still.jpg")}
+        cases = []
+        for style in styles:
+            for intensity in intensities:
+                samples = []
+                for attempt in range(repeat):
+                    case_root = root / f"{style}_{intensity}_{attempt}"
+                    samples.append(run_case(case_root, fixtures, style, intensity, workers))
+                    shutil.rmtree(case_root, ignore_errors=True)
+                stages = {name: round(statistics.median(sample[name] for sample in samples), 3) for name in samples[0]}
+                cases.append({"style": style, "intensity": intensity, "stages": stages})
+        return {"meta": _meta(repeat, workers), "cases": cases}
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def _meta(repeat: int, workers: int | None) -> dict:
+    ffmpeg = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True).stdout.split("\n", 1)[0]
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "ffmpeg": ffmpeg,
+        "repeat": repeat,
+        "workers": workers,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float, stage_thresholds: dict[str, float], min_seconds: float) -> list[dict]:
+    reference = {(case["style"], case["intensity"]): case["stages"] for case in baseline["cases"]}
+    regressions = []
+    for case in results["cases"]:
+        base = reference.get((case["style"], case["intensity"]))
+        if not base:
+            continue
+        for stage, seconds in case["stages"].items():
+            if stage not in base:
+                continue
+            limit = stage_thresholds.get(stage, threshold)
+            if seconds - base[stage] > min_seconds and seconds > base[stage] * (1 + limit):
+                regressions.append(
+                    {
+                        "style": case["style"],
+                        "intensity": case["intensity"],
+                        "stage": stage,
+                        "baseline": base[stage],
+                        "current": seconds,
+                        "ratio": round(seconds / base[stage], 3) if base[stage] else None,
+                        "threshold": limit,
+                    }
+                )
+    return regressions
+
+
+def _stage_threshold(value: str) -> tuple[str, float]:
+    stage, _, limit = value.partition("=")
+    return stage, float(limit)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--styles", nargs="+", choices=sorted(STYLES), default=sorted(STYLES))
+    parser.add_argument("--intensities", nargs="+", choices=INTENSITIES, default=list(INTENSITIES))
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--baseline", type=Path, default=None)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--stage-threshold", type=_stage_threshold, action="append", default=[])
+    parser.add_argument("--min-seconds", type=float, default=0.05)
+    args = parser.parse_args()
+
+    results = run(args.styles, args.intensities, max(1, args.repeat), args.workers)
+    if args.baseline and args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    elif args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        results["regressions"] = compare(results, baseline, args.threshold, dict(args.stage_threshold), args.min_seconds)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(json.dumps(results, indent=2))
+    if results.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
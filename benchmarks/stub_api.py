@@ -0,0 +1,196 @@
+"""Local stand-in for the Gemini, ElevenLabs and Pexels APIs with simulated throttling and outages.
+
+Run with ``python -m benchmarks.stub_api [--port 8089] [--limit 2] [--error-rate 0.1] [--down gemini]``
+and point the pipeline at it with ``GEMINI_BASE_URL``, ``ELEVENLABS_BASE_URL`` and
+``PEXELS_BASE_URL`` (any non-empty API keys will do). Each provider allows ``--limit``
+requests per second (token bucket, ``--burst`` banked) and answers the excess with
+429 and ``Retry-After``; ``--error-rate`` adds random 503s and ``--down`` makes a
+provider answer 503 to everything. Media links in search results point back at
+the stub, so downloads are exercised too.
+
+Connections are kept alive (HTTP/1.1). With ``--cert``/``--key`` the stub speaks
+HTTPS, and ``--connect-latency-ms`` delays every new connection to emulate the
+TCP+TLS handshake round trips of a remote API.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SCRIPT = {
+    "title": "Roteiro de teste",
+    "hook": "Você não vai acreditar nisso.",
+    "style": "curiosity",
+    "segments": [{"text": f"Segmento {idx} do roteiro de teste.", "keywords": ["teste", f"item {idx}"], "emphasis_words": ["teste"]} for idx in range(1, 8)],
+    "hashtags": ["#teste"],
+    "description": "Roteiro gerado pelo stub local.",
+    "cta_final": None,
+    "safety_flags": {"medical_claim": False, "financial_claim": False, "harmful": False},
+}
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        port: int = 0,
+        limit: float | None = None,
+        burst: int = 1,
+        retry_after: float = 1.0,
+        error_rate: float = 0.0,
+        latency: float = 0.0,
+        down: tuple[str, ...] = (),
+        audio: bytes = b"ID3",
+        media: bytes = b"\0" * 1024,
+        seed: int | None = None,
+        connect_latency: float = 0.0,
+        certfile: str | None = None,
+        keyfile: str | None = None,
+    ):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.scheme = "http"
+        if certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            # the handshake then runs on the handler thread instead of blocking accept()
+            self.socket = context.wrap_socket(self.socket, server_side=True, do_handshake_on_connect=False)
+            self.scheme = "https"
+        self.connect_latency = connect_latency
+        self.limit = limit
+        self.burst = max(1, burst)
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.latency = latency
+        self.down = set(down)
+        self.audio = audio
+        self.media = media
+        self.random = random.Random(seed)
+        self.stats: dict[str, dict[str, int]] = {}
+        self.connections = 0
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.scheme}://127.0.0.1:{self.server_port}"
+
+    def start(self) -> "StubServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def admit(self, provider: str) -> int:
+        """Status for the next request to `provider`: 200, 429 (over the limit) or 503."""
+        with self._lock:
+            stats = self.stats.setdefault(provider, {"requests": 0, "ok": 0, "throttled": 0, "errors": 0})
+            stats["requests"] += 1
+            if provider in self.down or self.random.random() < self.error_rate:
+                stats["errors"] += 1
+                return 503
+            if self.limit:
+                now = time.monotonic()
+                tokens, updated = self._buckets.get(provider, (float(self.burst), now))
+                tokens = min(self.burst, tokens + (now - updated) * self.limit)
+                if tokens < 1:
+                    self._buckets[provider] = (tokens, now)
+                    stats["throttled"] += 1
+                    return 429
+                self._buckets[provider] = (tokens - 1, now)
+            stats["ok"] += 1
+            return 200
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: StubServer
+    protocol_version = "HTTP/1.1"
+
+    def setup(self) -> None:
+        super().setup()
+        with self.server._lock:
+            self.server.connections += 1
+        if self.server.connect_latency:
+            time.sleep(self.server.connect_latency)
+
+    def do_GET(self) -> None:
+        path = self.path.split("?")[0]
+        if path.startswith("/media/"):
+            self._reply("pexels_cdn", self.server.media, "video/mp4" if path.endswith(".mp4") else "image/jpeg")
+        elif path == "/videos/search":
+            link = f"{self.server.base_url}/media/clip.mp4"
+            payload = {"videos": [{"duration": 6, "video_files": [{"height": 1920, "link": link}]}]}
+            self._reply("pexels", json.dumps(payload).encode("utf-8"), "application/json")
+        elif path == "/v1/search":
+            payload = {"photos": [{"src": {"large2x": f"{self.server.base_url}/media/still.jpg"}}]}
+            self._reply("pexels", json.dumps(payload).encode("utf-8"), "application/json")
+        else:
+            self.send_error(404)
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        path = self.path.split("?")[0]
+        if path.endswith(":generateContent"):
+            payload = {"candidates": [{"content": {"parts": [{"text": json.dumps(SCRIPT, ensure_ascii=False)}]}}]}
+            self._reply("gemini", json.dumps(payload).encode("utf-8"), "application/json")
+        elif path.startswith("/v1/text-to-speech/"):
+            self._reply("elevenlabs", self.server.audio, "audio/mpeg")
+        else:
+            self.send_error(404)
+
+    def _reply(self, provider: str, body: bytes, content_type: str) -> None:
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        status = self.server.admit(provider)
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", f"{self.server.retry_after:g}")
+        if status != 200:
+            body, content_type = b"{}", "application/json"
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--limit", type=float, default=None, help="requisições por segundo por provedor")
+    parser.add_argument("--burst", type=int, default=1)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--latency-ms", type=int, default=0)
+    parser.add_argument("--down", nargs="*", default=[], choices=["gemini", "elevenlabs", "pexels", "pexels_cdn"])
+    parser.add_argument("--connect-latency-ms", type=int, default=0)
+    parser.add_argument("--cert", default=None)
+    parser.add_argument("--key", default=None)
+    args = parser.parse_args()
+    server = StubServer(
+        args.port,
+        args.limit,
+        args.burst,
+        args.retry_after,
+        args.error_rate,
+        args.latency_ms / 1000,
+        tuple(args.down),
+        connect_latency=args.connect_latency_ms / 1000,
+        certfile=args.cert,
+        keyfile=args.key,
+    )
+    print(f"stub em {server.base_url} (Ctrl+C para sair)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(server.stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
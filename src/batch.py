@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import fields
+from pathlib import Path
+
+from src.models import GenerationJob, Script
+from src.pipeline import STYLES, Pipeline
+from src.video.profiles import PROFILES
+from src.video.renditions import RENDITIONS
+from src.utils import tracing
+from src.utils.logging import setup_logger
+from src.utils.tracing import Tracer
+
+STAGES = ("script", "tts", "assets", "render")
+# jobs whose scripts are requested from Gemini together, ahead of their other stages
+SCRIPT_PREFETCH = 16
+JOB_FIELDS = {f.name for f in fields(GenerationJob)}
+
+
+def job_id_for(payload: dict) -> str:
+    if payload.get("id"):
+        return str(payload["id"])
+    canonical = json.dumps({k: v for k, v in payload.items() if k in JOB_FIELDS}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:12]
+
+
+def parse_job(payload: dict) -> GenerationJob:
+    job = GenerationJob(**{k: v for k, v in payload.items() if k in JOB_FIELDS})
+    if job.style not in STYLES:
+        raise ValueError(f"estilo inválido: {job.style}")
+    if job.profile not in PROFILES:
+        raise ValueError(f"perfil inválido: {job.profile}")
+    unknown = [name for name in job.renditions if name not in RENDITIONS]
+    if unknown:
+        raise ValueError(f"renditions inválidas: {unknown}")
+    return job
+
+
+def completed_jobs(results_path: Path) -> set[str]:
+    done: set[str] = set()
+    if not results_path.exists():
+        return done
+    for line in results_path.read_text(encoding="utf-8").splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue  # a crash may leave a torn last line
+        if record.get("status") == "ok":
+            done.add(record["job_id"])
+    return done
+
+
+def iter_jobs(jobs_path: Path, on_error: Callable[[int, ValueError], None] | None = None) -> Iterator[dict]:
+    """Job payloads of a JSONL file; with `on_error`, a malformed line is reported by line number and skipped."""
+    with jobs_path.open(encoding="utf-8") as handle:
+        for number, line in enumerate(handle, start=1):
+            if not line.strip():
+                continue
+            try:
+                payload = json.loads(line)
+                if not isinstance(payload, dict):
+                    raise ValueError(f"esperado um objeto JSON, recebido {type(payload).__name__}")
+            except ValueError as exc:
+                if on_error is None:
+                    raise
+                on_error(number, exc)
+                continue
+            yield payload
+
+
+class BatchRunner:
+    """Runs jobs through shared services; each stage admits one job at a time so jobs overlap stage-wise.
+
+    Scripts are the exception: they are requested concurrently, `SCRIPT_PREFETCH` jobs at a time, while
+    the jobs before them are still being narrated and rendered.
+    """
+
+    def __init__(self, pipeline: Pipeline, output_root: Path, results_path: Path):
+        self.pipeline = pipeline
+        self.output_root = output_root
+        self.results_path = results_path
+        self.logger = setup_logger()
+        self.gates = {stage: threading.Semaphore(1) for stage in STAGES}
+        self._results_lock = threading.Lock()
+
+    def run(self, jobs_path: Path) -> None:
+        done = completed_jobs(self.results_path)
+        self.results_path.parent.mkdir(parents=True, exist_ok=True)
+        in_flight = threading.BoundedSemaphore(len(STAGES) + 1)
+        with ThreadPoolExecutor(max_workers=len(STAGES) + 1) as pool:
+            for chunk in self._chunks(jobs_path, done):
+                scripts = self._prefetch_scripts(chunk)
+                for job_id, payload in chunk:
+                    in_flight.acquire()
+                    future = pool.submit(self._run_job, job_id, payload, scripts.get(job_id))
+                    future.add_done_callback(lambda _: in_flight.release())
+
+    def _chunks(self, jobs_path: Path, done: set[str]) -> Iterator[list[tuple[str, dict]]]:
+        chunk: list[tuple[str, dict]] = []
+        for payload in iter_jobs(jobs_path, self._malformed):
+            job_id = job_id_for(payload)
+            if job_id in done:
+                self.logger.info(f"Job {job_id} já concluído, pulando")
+                continue
+            chunk.append((job_id, payload))
+            if len(chunk) == SCRIPT_PREFETCH:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _prefetch_scripts(self, chunk: list[tuple[str, dict]]) -> dict[str, Script]:
+        """Scripts for the valid jobs of `chunk`, generated concurrently; invalid jobs fail later in `_run_job`."""
+        jobs: dict[str, GenerationJob] = {}
+        for job_id, payload in chunk:
+            try:
+                jobs[job_id] = parse_job(payload)
+            except (TypeError, ValueError):
+                continue
+        scripts: dict[str, Script] = {}
+        for use_cache in (True, False):
+            ids = [job_id for job_id, job in jobs.items() if (job.script_cache == "on") == use_cache]
+            if ids:
+                self.logger.info(f"Gerando {len(ids)} roteiros em paralelo")
+                try:
+                    generated = self.pipeline.gemini.generate_scripts([(jobs[i].topic, jobs[i].style, jobs[i].length) for i in ids], use_cache=use_cache)
+                except Exception:  # each job then requests its own script and fails on its own
+                    self.logger.exception("Falha ao gerar roteiros em paralelo")
+                    continue
+                scripts.update(zip(ids, generated))
+        return scripts
+
+    def _run_job(self, job_id: str, payload: dict, generated: Script | None = None) -> None:
+        started = time.perf_counter()
+        output_dir = self.output_root / job_id
+        record: dict = {"job_id": job_id, "output_dir": str(output_dir)}
+        try:
+            job = parse_job(payload)
+            profile = PROFILES[job.profile]
+            tracer = Tracer(self.logger)
+            with self.pipeline.workspace(output_dir, job.profile, tracer.fetched) as workspace, tracing.activate(tracer), tracer.span("generate", job_id=job_id):
+                work_dir = workspace.path
+                with self.gates["script"], tracer.span("stage.script"):
+                    script = self.pipeline.write_script(job, work_dir, generated=generated)
+                with self.gates["tts"], tracer.span("stage.narration"):
+                    narration, timings = self.pipeline.narrate(script, work_dir, profile)
+                with self.gates["assets"], tracer.span("stage.assets"):
+                    assets = self.pipeline.fetch_assets(script)
+                with self.gates["render"], tracer.span("stage.compose"):
+                    subtitles = self.pipeline.write_subtitles(script, timings, work_dir, profile)
+                    report = self.pipeline.render(job, script, narration, timings, assets, subtitles, work_dir)
+            report = self.pipeline.finish_report(self.pipeline.disk_report(workspace, report), tracer, output_dir)
+            record.update(
+                status="ok", final_video=report["final_video"], title=report["title"], disk_bytes_written=report["disk"]["disk_bytes_written"]
+            )
+        except Exception as exc:  # one bad job must not stop the batch
+            self.logger.exception(f"Job {job_id} falhou")
+            record.update(status="error", error=f"{type(exc).__name__}: {exc}")
+        record["seconds"] = round(time.perf_counter() - started, 3)
+        self._emit(record)
+
+    def _malformed(self, number: int, exc: ValueError) -> None:
+        self.logger.error(f"Linha {number} de jobs inválida: {exc}")
+        self._emit({"job_id": None, "line": number, "status": "error", "error": f"{type(exc).__name__}: {exc}", "seconds": 0.0})
+
+    def _emit(self, record: dict) -> None:
+        line = json.dumps(record, ensure_ascii=False)
+        with self._results_lock, self.results_path.open("a", encoding="utf-8") as handle:
+            handle.write(line + "\n")
+            handle.flush()
@@ -4,6 +4,9 @@ import os
 from dataclasses import dataclass
 from pathlib import Path
 
+from src.services.elevenlabs_service import LOUDNORM_MODES
+from src.video.motion import parse_motion
+
 
 @dataclass(slots=True)
 class AppConfig:
@@ -11,11 +14,38 @@ class AppConfig:
     output_dir: Path
     cache_dir: Path
     pexels_api_key: str | None
+    pexels_max_connections: int
+    pexels_max_download_bytes: int | None
+    pexels_search_ttl: float
+    pexels_search_negative_ttl: float
+    asset_ingest: bool
+    cache_journal_mode: str
     gemini_api_key: str | None
     elevenlabs_api_key: str | None
     elevenlabs_voice_id: str
+    elevenlabs_max_concurrency: int
+    loudnorm_mode: str
     music_default_path: Path | None
-
+    render_workers: int | None
+    motion: dict[str, str]
+    scene_cache_max_bytes: int
+    tts_cache_max_bytes: int
+    gemini_base_url: str | None
+    elevenlabs_base_url: str | None
+    pexels_base_url: str | None
+    gemini_rate: float | None
+    elevenlabs_rate: float | None
+    pexels_rate: float | None
+    api_max_attempts: int
+    circuit_failures: int
+    circuit_reset_seconds: float
+    http_connect_timeout: float
+    http_pool_size: int
+    farm_queue: Path
+    farm_lease_seconds: float
+    farm_max_attempts: int
+    scratch_root: Path | None
+    artifact_policy: str
 
     @classmethod
     def from_env(cls) -> "AppConfig":
@@ -26,13 +56,57 @@ class AppConfig:
         cache.mkdir(parents=True, exist_ok=True)
 
         music_path = os.getenv("BG_MUSIC_PATH")
+        render_workers = os.getenv("RENDER_WORKERS")
+        scratch_root = os.getenv("SCRATCH_ROOT")
+        max_download_mb = int(os.getenv("PEXELS_MAX_DOWNLOAD_MB", "200"))
         return cls(
             project_root=root,
             output_dir=output,
             cache_dir=cache,
             pexels_api_key=os.getenv("PEXELS_API_KEY"),
+            pexels_max_connections=int(os.getenv("PEXELS_MAX_CONNECTIONS", "4")),
+            pexels_max_download_bytes=max_download_mb * 1024 * 1024 if max_download_mb > 0 else None,
+            pexels_search_ttl=float(os.getenv("PEXELS_SEARCH_TTL", str(24 * 3600))),
+            pexels_search_negative_ttl=float(os.getenv("PEXELS_SEARCH_NEGATIVE_TTL", "3600")),
+            asset_ingest=os.getenv("ASSET_INGEST", "on") == "on",
+            # WAL needs shared memory, so a cache directory shared between hosts falls back to a rollback journal
+            cache_journal_mode="DELETE" if os.getenv("SHARED_CACHE", "off") == "on" else "WAL",
             gemini_api_key=os.getenv("GEMINI_API_KEY"),
             elevenlabs_api_key=os.getenv("ELEVENLABS_API_KEY"),
             elevenlabs_voice_id=os.getenv("ELEVENLABS_VOICE_ID", "21m00Tcm4TlvDq8ikWAM"),
+            elevenlabs_max_concurrency=int(os.getenv("ELEVENLABS_MAX_CONCURRENCY", "3")),
+            loudnorm_mode=_loudnorm_mode(os.getenv("LOUDNORM_MODE", "linear")),
             music_default_path=Path(music_path) if music_path else None,
+            render_workers=int(render_workers) if render_workers else None,
+            motion=parse_motion(os.getenv("MOTION_BACKEND")),
+            scene_cache_max_bytes=int(os.getenv("SCENE_CACHE_MAX_MB", "2048")) * 1024 * 1024,
+            tts_cache_max_bytes=int(os.getenv("TTS_CACHE_MAX_MB", "512")) * 1024 * 1024,
+            gemini_base_url=os.getenv("GEMINI_BASE_URL"),
+            elevenlabs_base_url=os.getenv("ELEVENLABS_BASE_URL"),
+            pexels_base_url=os.getenv("PEXELS_BASE_URL"),
+            gemini_rate=_rate(os.getenv("GEMINI_RATE_PER_SEC", "0.25")),
+            elevenlabs_rate=_rate(os.getenv("ELEVENLABS_RATE_PER_SEC", "2")),
+            pexels_rate=_rate(os.getenv("PEXELS_RATE_PER_SEC", "1")),
+            api_max_attempts=int(os.getenv("API_MAX_ATTEMPTS", "4")),
+            circuit_failures=int(os.getenv("CIRCUIT_FAILURES", "5")),
+            circuit_reset_seconds=float(os.getenv("CIRCUIT_RESET_SECONDS", "60")),
+            http_connect_timeout=float(os.getenv("HTTP_CONNECT_TIMEOUT", "10")),
+            http_pool_size=int(os.getenv("HTTP_POOL_SIZE", "8")),
+            farm_queue=Path(os.getenv("FARM_QUEUE", str(output / "farm" / "queue.sqlite3"))),
+            farm_lease_seconds=float(os.getenv("FARM_LEASE_SECONDS", "120")),
+            farm_max_attempts=int(os.getenv("FARM_MAX_ATTEMPTS", "3")),
+            scratch_root=Path(scratch_root) if scratch_root else None,
+            artifact_policy=os.getenv("ARTIFACT_POLICY", "review"),
         )
+
+
+def _rate(value: str) -> float | None:
+    """Requests per second; 0 disables the limit."""
+    rate = float(value)
+    return rate if rate > 0 else None
+
+
+def _loudnorm_mode(value: str) -> str:
+    if value not in LOUDNORM_MODES:
+        raise ValueError(f"modo de loudnorm inválido: {value} (opções: {', '.join(LOUDNORM_MODES)})")
+    return value
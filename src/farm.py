@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import json
+import os
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+from src.batch import job_id_for, parse_job
+from src.pipeline import Pipeline
+from src.utils.cache import SqliteFile
+from src.utils.logging import setup_logger
+from src.utils.stages import StageCancelled
+
+
+@dataclass(slots=True)
+class Lease:
+    job_id: str
+    payload: dict
+    attempt: int
+
+
+class WorkQueue:
+    """Job queue in a SQLite file shared by every worker, on one host or many (the file needs working POSIX locks).
+
+    The file uses a rollback journal rather than WAL, whose shared-memory index only works for processes
+    on one host; every transaction takes the file lock, which is plenty for job-sized work items.
+
+    A worker claims the oldest queued job with a time-limited lease and keeps it alive with heartbeats; a
+    lease that expires (crashed or stalled worker) puts the job back in the queue, up to `max_attempts`.
+    Completion and failure are fenced on the lease holder, so a worker that lost its lease cannot
+    overwrite the outcome of the worker that took the job over.
+    """
+
+    def __init__(self, path: Path, max_attempts: int = 3):
+        self.path = path
+        self.max_attempts = max(1, max_attempts)
+        self.db = SqliteFile(path, journal_mode="DELETE")
+        with self.db.transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, payload TEXT NOT NULL, status TEXT NOT NULL DEFAULT 'queued', attempts INTEGER NOT NULL DEFAULT 0, "
+                "worker TEXT, lease_expires REAL, enqueued_at REAL NOT NULL, started_at REAL, finished_at REAL, seconds REAL, result TEXT, error TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, enqueued_at)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS workers ("
+                "id TEXT PRIMARY KEY, host TEXT NOT NULL, pid INTEGER NOT NULL, started_at REAL NOT NULL, last_seen REAL NOT NULL, "
+                "stopped_at REAL, busy_seconds REAL NOT NULL DEFAULT 0, jobs_ok INTEGER NOT NULL DEFAULT 0, jobs_failed INTEGER NOT NULL DEFAULT 0, current_job TEXT)"
+            )
+
+    def enqueue(self, payloads: Iterator[dict]) -> dict:
+        """Add jobs keyed by `job_id_for`; a job already in the queue (in any state) is left alone."""
+        added = skipped = 0
+        now = time.time()
+        with self.db.transaction() as conn:
+            for payload in payloads:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO jobs (id, payload, enqueued_at) VALUES (?, ?, ?)", (job_id_for(payload), json.dumps(payload, ensure_ascii=False), now)
+                )
+                added += cursor.rowcount
+                skipped += 1 - cursor.rowcount
+        return {"enqueued": added, "skipped": skipped}
+
+    def register(self, worker: str) -> None:
+        now = time.time()
+        with self.db.transaction() as conn:
+            conn.execute(
+                "INSERT INTO workers (id, host, pid, started_at, last_seen) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET started_at = excluded.started_at, last_seen = excluded.last_seen, stopped_at = NULL, "
+                "busy_seconds = 0, jobs_ok = 0, jobs_failed = 0, current_job = NULL",
+                (worker, socket.gethostname(), os.getpid(), now, now),
+            )
+
+    def retire(self, worker: str) -> None:
+        with self.db.transaction() as conn:
+            conn.execute("UPDATE workers SET stopped_at = ?, current_job = NULL WHERE id = ?", (time.time(), worker))
+
+    def claim(self, worker: str, lease_seconds: float) -> Lease | None:
+        now = time.time()
+        with self.db.transaction() as conn:
+            self._requeue_expired(conn, now)
+            row = conn.execute("SELECT id, payload, attempts FROM jobs WHERE status = 'queued' ORDER BY enqueued_at, rowid LIMIT 1").fetchone()
+            conn.execute("UPDATE workers SET last_seen = ?, current_job = ? WHERE id = ?", (now, row[0] if row else None, worker))
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1, started_at = ? WHERE id = ?",
+                (worker, now + lease_seconds, now, row[0]),
+            )
+        return Lease(row[0], json.loads(row[1]), row[2] + 1)
+
+    def heartbeat(self, worker: str, job_id: str, lease_seconds: float) -> bool:
+        """Extend the lease; False when the job is no longer leased to `worker`."""
+        now = time.time()
+        with self.db.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'leased'", (now + lease_seconds, job_id, worker)
+            )
+            conn.execute("UPDATE workers SET last_seen = ? WHERE id = ?", (now, worker))
+        return cursor.rowcount == 1
+
+    def complete(self, worker: str, job_id: str, result: dict, seconds: float) -> bool:
+        return self._finish(worker, job_id, "done", seconds, result=result)
+
+    def fail(self, worker: str, job_id: str, error: str, seconds: float, retry: bool = True) -> bool:
+        return self._finish(worker, job_id, "queued" if retry else "failed", seconds, error=error)
+
+    def _finish(self, worker: str, job_id: str, status: str, seconds: float, result: dict | None = None, error: str | None = None) -> bool:
+        now = time.time()
+        with self.db.transaction() as conn:
+            if status == "queued":
+                row = conn.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                status = "failed" if row and row[0] >= self.max_attempts else "queued"
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, worker = CASE WHEN ? = 'queued' THEN NULL ELSE worker END, lease_expires = NULL, "
+                "finished_at = ?, seconds = ?, result = ?, error = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                (status, status, now, seconds, json.dumps(result, ensure_ascii=False) if result else None, error, job_id, worker),
+            )
+            fenced = cursor.rowcount == 1
+            counter = "jobs_ok" if status == "done" and fenced else "jobs_failed"
+            conn.execute(
+                f"UPDATE workers SET busy_seconds = busy_seconds + ?, {counter} = {counter} + 1, current_job = NULL, last_seen = ? WHERE id = ?",
+                (seconds, now, worker),
+            )
+        return fenced
+
+    def requeue_expired(self) -> int:
+        with self.db.transaction() as conn:
+            return self._requeue_expired(conn, time.time())
+
+    def _requeue_expired(self, conn: sqlite3.Connection, now: float) -> int:
+        cursor = conn.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+            "error = 'lease expirado (' || worker || ')', worker = NULL, lease_expires = NULL WHERE status = 'leased' AND lease_expires < ?",
+            (self.max_attempts, now),
+        )
+        return cursor.rowcount
+
+    def pending(self) -> int:
+        return self.db.conn().execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'leased')").fetchone()[0]
+
+    def stats(self, window: float = 3600.0, stale_after: float = 300.0) -> dict:
+        """Queue depth, throughput over the last `window` seconds and per-worker utilization (busy / alive time)."""
+        now = time.time()
+        conn = self.db.conn()
+        depth = {status: count for status, count in conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")}
+        done, avg_seconds, first_start = conn.execute(
+            "SELECT COUNT(*), AVG(seconds), MIN(started_at) FROM jobs WHERE status = 'done' AND finished_at >= ?", (now - window,)
+        ).fetchone()
+        span = min(window, now - first_start) if first_start else window
+        workers = []
+        rows = conn.execute(
+            "SELECT w.id, w.host, w.pid, w.started_at, w.last_seen, w.stopped_at, w.busy_seconds, w.jobs_ok, w.jobs_failed, w.current_job, j.started_at "
+            "FROM workers w LEFT JOIN jobs j ON j.id = w.current_job AND j.worker = w.id AND j.status = 'leased' ORDER BY w.id"
+        )
+        for worker, host, pid, started, last_seen, stopped, busy, ok, failed, current, job_started in rows:
+            end = stopped or now
+            busy_now = busy + (now - job_started if job_started and not stopped else 0.0)
+            state = "stopped" if stopped else ("lost" if now - last_seen > stale_after else ("busy" if current else "idle"))
+            workers.append(
+                {
+                    "worker": worker,
+                    "host": host,
+                    "pid": pid,
+                    "state": state,
+                    "current_job": current,
+                    "jobs_ok": ok,
+                    "jobs_failed": failed,
+                    "utilization": round(busy_now / (end - started), 3) if end > started else 0.0,
+                }
+            )
+        return {
+            "queue": {status: depth.get(status, 0) for status in ("queued", "leased", "done", "failed")},
+            "throughput": {
+                "window_seconds": round(span, 1),
+                "jobs_done": done,
+                "jobs_per_hour": round(done * 3600 / span, 2) if span > 0 else 0.0,
+                "avg_job_seconds": round(avg_seconds, 3) if avg_seconds else None,
+            },
+            "workers": workers,
+        }
+
+
+class FarmWorker:
+    """Pulls jobs from a WorkQueue and runs each with the pipeline into `output_root/<job_id>/`.
+
+    The job directory keeps its manifest.json, so a job re-run after an expired lease reuses whatever
+    stages the previous attempt finished. A worker whose heartbeat finds the lease gone stops its run at
+    the next stage boundary, leaving the job to the worker that took it over.
+    """
+
+    def __init__(self, pipeline: Pipeline, queue: WorkQueue, output_root: Path, lease_seconds: float = 120.0, poll_seconds: float = 2.0):
+        self.pipeline = pipeline
+        self.queue = queue
+        self.output_root = output_root
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.logger = setup_logger()
+        self._stop = threading.Event()
+
+    def stop(self) -> None:
+        """Finish the current job, then exit."""
+        self._stop.set()
+
+    def run(self, max_jobs: int | None = None, exit_when_idle: bool = False) -> int:
+        self.queue.register(self.worker_id)
+        self.logger.info(f"Worker {self.worker_id} iniciado")
+        processed = 0
+        try:
+            while not self._stop.is_set() and (max_jobs is None or processed < max_jobs):
+                lease = self.queue.claim(self.worker_id, self.lease_seconds)
+                if lease is None:
+                    # leased jobs may still come back if their worker dies, so only an empty queue ends the run
+                    if exit_when_idle and not self.queue.pending():
+                        break
+                    self._stop.wait(self.poll_seconds)
+                    continue
+                self._run_job(lease)
+                processed += 1
+        finally:
+            self.queue.retire(self.worker_id)
+        self.logger.info(f"Worker {self.worker_id} encerrado após {processed} jobs")
+        return processed
+
+    def _run_job(self, lease: Lease) -> None:
+        self.logger.info(f"Job {lease.job_id} (tentativa {lease.attempt})")
+        output_dir = self.output_root / lease.job_id
+        lost = threading.Event()
+        done = threading.Event()
+        beat = threading.Thread(target=self._heartbeat, args=(lease.job_id, done, lost), daemon=True)
+        beat.start()
+        started = time.perf_counter()
+        try:
+            try:
+                job = parse_job(lease.payload)
+            except (TypeError, ValueError) as exc:
+                # a malformed job fails the same way on every worker
+                self.queue.fail(self.worker_id, lease.job_id, f"{type(exc).__name__}: {exc}", time.perf_counter() - started, retry=False)
+                return
+            try:
+                report = self.pipeline.run(job, output_dir, cancel=lost)
+            except StageCancelled:
+                self.logger.warning(f"Job {lease.job_id} interrompido: o lease expirou e o job voltou para a fila")
+                return
+            except Exception as exc:  # one bad job must not stop the worker
+                self.logger.exception(f"Job {lease.job_id} falhou")
+                self.queue.fail(self.worker_id, lease.job_id, f"{type(exc).__name__}: {exc}", time.perf_counter() - started)
+                return
+            result = {
+                "output_dir": str(output_dir),
+                "final_video": report["final_video"],
+                "title": report["title"],
+                "disk_bytes_written": report["disk"]["disk_bytes_written"],
+            }
+            if not self.queue.complete(self.worker_id, lease.job_id, result, time.perf_counter() - started):
+                self.logger.warning(f"Job {lease.job_id} concluído, mas o lease já tinha expirado; resultado descartado")
+        finally:
+            done.set()
+            beat.join()
+            if lost.is_set():
+                self.logger.warning(f"Lease do job {lease.job_id} perdido durante a execução")
+
+    def _heartbeat(self, job_id: str, done: threading.Event, lost: threading.Event) -> None:
+        while not done.wait(self.lease_seconds / 3):
+            try:
+                if not self.queue.heartbeat(self.worker_id, job_id, self.lease_seconds):
+                    lost.set()
+                    return
+            except sqlite3.Error:
+                self.logger.exception("Falha no heartbeat")
+
+
+def spawn_workers(count: int, argv: list[str]) -> int:
+    """Run `count` local worker processes (`python -m src.main worker <argv>`) and wait for all of them."""
+    procs = [subprocess.Popen([sys.executable, "-m", "src.main", "worker", *argv]) for _ in range(count)]
+
+    def forward(signum: int, _frame: object) -> None:
+        for proc in procs:
+            proc.send_signal(signum)
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    return max(proc.wait() for proc in procs)
@@ -2,20 +2,26 @@ from __future__ import annotations
 
 import argparse
 import json
+import os
 import random
+import signal
+import sys
+import time
 from pathlib import Path
 
 
+from src.batch import BatchRunner, iter_jobs
 from src.config import AppConfig
-from src.services.cta_manager import CtaManager
-from src.services.elevenlabs_service import ElevenLabsService
-from src.services.gemini_service import GeminiService
+from src.farm import FarmWorker, WorkQueue, spawn_workers
+from src.models import GenerationJob
+from src.pipeline import STYLES, Pipeline
 from src.services.pexels_service import PexelsService
-from src.services.subtitle_service import SubtitleService
-from src.utils.logging import setup_logger
-from src.video.composer import VideoComposer
-
-STYLES = {"curiosity", "tips", "facts", "top_list"}
+from src.utils.manifest import STAGE_ORDER
+from src.utils.workspace import unique_run_id
+from src.video.composer import RENDER_MODES
+from src.video.ingest import MezzanineIngest
+from src.video.profiles import PROFILES
+from src.video.renditions import RENDITIONS
 
 
 def parse_args() -> argparse.Namespace:
@@ -30,78 +36,154 @@ def parse_args() -> argparse.Namespace:
     generate.add_argument("--visual_intensity", choices=["low", "medium", "high"], default="medium")
     generate.add_argument("--music", choices=["on", "off"], default="off")
     generate.add_argument("--seed", type=int, default=None)
+    generate.add_argument("--render_mode", choices=RENDER_MODES, default="multi")
+    generate.add_argument("--script_cache", choices=["on", "off"], default="on", help="Reaproveita roteiros já gerados para o mesmo prompt")
+    generate.add_argument("--profile", choices=sorted(PROFILES), default="final", help="draft: prévia 540x960 rápida, sem normalização de loudness")
+    generate.add_argument("--renditions", nargs="+", choices=sorted(RENDITIONS), default=[], help="Saídas extras geradas no mesmo grafo do render final")
+    generate.add_argument("--workers", type=int, default=None, help="Encodes de cena em paralelo (padrão: núcleos da CPU)")
+    generate.add_argument("--force", action="store_true", help="Recalcula todos os estágios, ignorando o manifest.json da execução")
+    generate.add_argument("--from-stage", dest="from_stage", choices=STAGE_ORDER, default=None, help="Recalcula este estágio e os seguintes")
+    generate.add_argument("--trace", action="store_true", help="Grava trace.json (formato Chrome trace) no diretório de saída")
+    generate.add_argument("--run-id", dest="run_id", default=None, help="Reaproveita output/<run-id> (padrão: um id novo e único por execução)")
+
+    batch = sub.add_parser("batch", help="Gera vídeos a partir de um arquivo JSONL de jobs")
+    batch.add_argument("--jobs", type=Path, default=Path("requests.jsonl"))
+    batch.add_argument("--results", type=Path, default=None, help="JSONL de resultados (padrão: output/batch/results.jsonl)")
+    batch.add_argument("--workers", type=int, default=None, help="Encodes de cena em paralelo (padrão: núcleos da CPU)")
+    batch.add_argument("--trace", action="store_true", help="Grava trace.json (formato Chrome trace) no diretório de cada job")
+
+    promote = sub.add_parser("promote", help="Renderiza em qualidade final um rascunho aprovado, sem refazer roteiro nem TTS")
+    promote.add_argument("--run", type=Path, required=True, help="Diretório de saída do rascunho")
+    promote.add_argument("--workers", type=int, default=None, help="Encodes de cena em paralelo (padrão: núcleos da CPU)")
+
+    sub.add_parser("reindex", help="Reconstrói o catálogo de assets a partir de assets/cache/pexels")
+
+    ingest = sub.add_parser("ingest", help="Gera mezzanines 1080x1920 para os assets do catálogo")
+    ingest.add_argument("--workers", type=int, default=2, help="Transcodes em paralelo")
+
+    enqueue = sub.add_parser("enqueue", help="Coloca os jobs de um JSONL na fila compartilhada do render farm")
+    enqueue.add_argument("--jobs", type=Path, default=Path("requests.jsonl"))
+    enqueue.add_argument("--queue", type=Path, default=None, help="Arquivo SQLite da fila (padrão: FARM_QUEUE ou output/farm/queue.sqlite3)")
+
+    worker = sub.add_parser("worker", help="Processa jobs da fila compartilhada até ser interrompido")
+    worker.add_argument("--queue", type=Path, default=None, help="Arquivo SQLite da fila (padrão: FARM_QUEUE ou output/farm/queue.sqlite3)")
+    worker.add_argument("--output", type=Path, default=None, help="Raiz das saídas por job (padrão: diretório da fila)")
+    worker.add_argument("--processes", type=int, default=1, help="Processos worker nesta máquina")
+    worker.add_argument("--max-jobs", dest="max_jobs", type=int, default=None)
+    worker.add_argument("--exit-when-idle", dest="exit_when_idle", action="store_true", help="Encerra quando a fila esvazia")
+    worker.add_argument("--workers", type=int, default=None, help="Encodes de cena em paralelo por processo (padrão: núcleos da CPU)")
+    worker.add_argument("--trace", action="store_true", help="Grava trace.json (formato Chrome trace) no diretório de cada job")
+
+    coordinator = sub.add_parser("coordinator", help="Relata vazão, profundidade da fila e utilização dos workers")
+    coordinator.add_argument("--queue", type=Path, default=None, help="Arquivo SQLite da fila (padrão: FARM_QUEUE ou output/farm/queue.sqlite3)")
+    coordinator.add_argument("--window", type=float, default=3600.0, help="Janela de vazão em segundos")
+    coordinator.add_argument("--watch", type=float, default=None, help="Repete o relatório a cada N segundos")
     return parser.parse_args()
 
 
 def run_generate(args: argparse.Namespace) -> None:
     config = AppConfig.from_env()
-    logger = setup_logger()
     random.seed(args.seed)
 
-    run_name = f"{args.style}_{args.topic[:18].replace(' ', '_')}"
-    output_dir = config.output_dir / run_name
-    output_dir.mkdir(parents=True, exist_ok=True)
+    run_name = args.run_id or unique_run_id(args.style, args.topic[:18])
+    job = GenerationJob(
+        topic=args.topic,
+        style=args.style,
+        length=args.length,
+        cta_variation=args.cta_variation,
+        visual_intensity=args.visual_intensity,
+        music=args.music,
+        seed=args.seed,
+        render_mode=args.render_mode,
+        script_cache=args.script_cache,
+        profile=args.profile,
+        renditions=args.renditions,
+    )
+    Pipeline(config, workers=args.workers, trace=args.trace).run(job, config.output_dir / run_name, force=args.force, from_stage=args.from_stage)
 
-    cta = CtaManager(config.cache_dir, seed=args.seed)
-    gemini = GeminiService(config.gemini_api_key, seed=args.seed)
-    tts = ElevenLabsService(config.elevenlabs_api_key, config.elevenlabs_voice_id)
-    pexels = PexelsService(config.pexels_api_key, config.cache_dir)
-    subtitles = SubtitleService()
-    composer = VideoComposer(seed=args.seed)
 
-    logger.info("Gerando roteiro")
-    script = gemini.generate_script(args.topic, args.style, args.length)
+def run_batch(args: argparse.Namespace) -> None:
+    config = AppConfig.from_env()
+    output_root = config.output_dir / "batch"
+    runner = BatchRunner(Pipeline(config, workers=args.workers, trace=args.trace), output_root, args.results or output_root / "results.jsonl")
+    runner.run(args.jobs)
 
-    initial_cta = cta.initial(args.style, enabled=args.cta_variation == "on")
-    final_cta = script.cta_final or cta.final(enabled=args.cta_variation == "on")
 
-    script.segments[0].text = f"{script.hook} {initial_cta}. {script.segments[0].text}"
-    script.segments[-1].text = f"{script.segments[-1].text} {final_cta}."
+def run_promote(args: argparse.Namespace) -> None:
+    config = AppConfig.from_env()
+    Pipeline(config, workers=args.workers).promote(args.run)
 
-    logger.info("Gerando áudio de narração")
-    _, narration_full, timing_path = tts.synthesize_segments([s.text for s in script.segments], output_dir)
-    timings_payload = json.loads(timing_path.read_text(encoding="utf-8"))
 
-    from src.models import Timing  # local import for lean startup
+def run_reindex() -> None:
+    config = AppConfig.from_env()
+    pexels = PexelsService(config.pexels_api_key, config.cache_dir, journal_mode=config.cache_journal_mode)
+    print(json.dumps(pexels.reindex(), ensure_ascii=False))
 
-    timings = [Timing(**item) for item in timings_payload]
 
-    logger.info("Buscando assets")
-    asset_choices = [pexels.pick_asset(i, segment.keywords) for i, segment in enumerate(script.segments)]
+def run_ingest(args: argparse.Namespace) -> None:
+    config = AppConfig.from_env()
+    pexels = PexelsService(config.pexels_api_key, config.cache_dir, journal_mode=config.cache_journal_mode)
+    print(json.dumps(pexels.ingest_cache(MezzanineIngest(config.cache_dir / "mezzanine"), workers=args.workers), ensure_ascii=False))
 
-    logger.info("Gerando legendas")
-    srt_path, ass_path = subtitles.write(script.segments, timings, output_dir)
 
-    logger.info("Compondo vídeo final")
-    final_mp4, metadata_path = composer.compose(
-        assets=asset_choices,
-        timings=timings,
-        narration_path=narration_full,
-        subtitles_ass=ass_path,
-        output_dir=output_dir,
-        visual_intensity=args.visual_intensity,
-        music_on=args.music == "on",
-        music_path=config.music_default_path,
-    )
+def run_enqueue(args: argparse.Namespace) -> None:
+    config = AppConfig.from_env()
+    queue = WorkQueue(args.queue or config.farm_queue, config.farm_max_attempts)
+    malformed: list[dict] = []
+    result = queue.enqueue(iter_jobs(args.jobs, lambda number, exc: malformed.append({"line": number, "error": str(exc)})))
+    print(json.dumps({**result, "malformed": malformed}, ensure_ascii=False))
 
-    report = {
-        "title": script.title,
-        "topic": args.topic,
-        "style": args.style,
-        "length_target": args.length,
-        "assets": [asset.__dict__ for asset in asset_choices],
-        "final_video": str(final_mp4),
-        "subtitles_srt": str(srt_path),
-        "subtitles_ass": str(ass_path),
-        "metadata": str(metadata_path),
-        "hashtags": script.hashtags,
-        "description": script.description,
-    }
-    (output_dir / "generation_report.json").write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
-    logger.info(f"Concluído em: {final_mp4}")
+
+def run_worker(args: argparse.Namespace) -> None:
+    config = AppConfig.from_env()
+    queue_path = args.queue or config.farm_queue
+    output_root = args.output or queue_path.parent
+    if args.processes > 1:
+        # split the cores between the local processes instead of letting each one claim all of them
+        workers = args.workers or config.render_workers or max(1, (os.cpu_count() or 1) // args.processes)
+        argv = ["--queue", str(queue_path), "--output", str(output_root), "--workers", str(workers)]
+        if args.max_jobs is not None:
+            argv += ["--max-jobs", str(args.max_jobs)]
+        if args.exit_when_idle:
+            argv.append("--exit-when-idle")
+        if args.trace:
+            argv.append("--trace")
+        sys.exit(spawn_workers(args.processes, argv))
+    queue = WorkQueue(queue_path, config.farm_max_attempts)
+    pipeline = Pipeline(config, workers=args.workers, trace=args.trace)
+    worker = FarmWorker(pipeline, queue, output_root, lease_seconds=config.farm_lease_seconds)
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    signal.signal(signal.SIGINT, lambda *_: worker.stop())
+    worker.run(max_jobs=args.max_jobs, exit_when_idle=args.exit_when_idle)
+
+
+def run_coordinator(args: argparse.Namespace) -> None:
+    config = AppConfig.from_env()
+    queue = WorkQueue(args.queue or config.farm_queue, config.farm_max_attempts)
+    stale_after = 3 * config.farm_lease_seconds
+    while True:
+        report = {"requeued": queue.requeue_expired(), **queue.stats(window=args.window, stale_after=stale_after)}
+        print(json.dumps(report, ensure_ascii=False), flush=True)
+        if not args.watch:
+            break
+        time.sleep(args.watch)
 
 
 if __name__ == "__main__":
     arguments = parse_args()
     if arguments.command == "generate":
         run_generate(arguments)
+    elif arguments.command == "batch":
+        run_batch(arguments)
+    elif arguments.command == "promote":
+        run_promote(arguments)
+    elif arguments.command == "reindex":
+        run_reindex()
+    elif arguments.command == "ingest":
+        run_ingest(arguments)
+    elif arguments.command == "enqueue":
+        run_enqueue(arguments)
+    elif arguments.command == "worker":
+        run_worker(arguments)
+    elif arguments.command == "coordinator":
+        run_coordinator(arguments)
@@ -38,3 +38,19 @@ class AssetChoice:
     media_type: str
     path: str
     source_url: str | None
+    mezzanine_path: str | None = None
+
+
+@dataclass(slots=True)
+class GenerationJob:
+    topic: str
+    style: str
+    length: int = 40
+    cta_variation: str = "on"
+    visual_intensity: str = "medium"
+    music: str = "off"
+    seed: int | None = None
+    render_mode: str = "multi"
+    script_cache: str = "on"
+    profile: str = "final"
+    renditions: list[str] = field(default_factory=list)
@@ -0,0 +1,383 @@
+from __future__ import annotations
+
+import json
+import random
+import threading
+from dataclasses import asdict
+from pathlib import Path
+
+from src.config import AppConfig
+from src.models import AssetChoice, GenerationJob, Script, Segment, Timing
+from src.services.cta_manager import CtaManager
+from src.services.elevenlabs_service import ElevenLabsService
+from src.services.gemini_service import GeminiService
+from src.services.pexels_service import PexelsService
+from src.services.subtitle_service import SubtitleService
+from src.utils.cache import FileCache, StateStore
+from src.utils.http import HttpClient
+from src.utils.logging import setup_logger
+from src.utils.manifest import StageManifest
+from src.utils.retry import ApiPolicy
+from src.utils import tracing
+from src.utils.stages import StageGraph
+from src.utils.tracing import Tracer
+from src.utils.workspace import Workspace
+from src.video.composer import VideoComposer
+from src.video.ingest import MezzanineIngest
+from src.video.profiles import PROFILES, RenderProfile
+from src.video.renditions import RENDITIONS
+
+STYLES = {"curiosity", "tips", "facts", "top_list"}
+
+
+class Pipeline:
+    """Long-lived service instances plus the generation stages that use them."""
+
+    def __init__(self, config: AppConfig, workers: int | None = None, trace: bool = False):
+        self.config = config
+        self.trace = trace
+        self.logger = setup_logger()
+        self.cta = CtaManager(config.cache_dir, journal_mode=config.cache_journal_mode)
+        # one keep-alive pool and one policy per provider, shared by every job this pipeline runs
+        self.http = HttpClient(connect_timeout=config.http_connect_timeout, max_idle_per_host=config.http_pool_size)
+        self.policies = {
+            "gemini": self._policy("gemini", config.gemini_rate, 4, retry_on=(ValueError,)),
+            "elevenlabs": self._policy("elevenlabs", config.elevenlabs_rate, config.elevenlabs_max_concurrency),
+            "pexels": self._policy("pexels", config.pexels_rate, config.pexels_max_connections),
+            "pexels_cdn": self._policy("pexels_cdn", None, config.pexels_max_connections),
+        }
+        self.gemini = GeminiService(
+            config.gemini_api_key,
+            cache=StateStore(config.cache_dir / "state.sqlite3", "scripts", journal_mode=config.cache_journal_mode),
+            base_url=config.gemini_base_url,
+            policy=self.policies["gemini"],
+            http=self.http,
+        )
+        tts_cache = FileCache(config.cache_dir / "tts", config.tts_cache_max_bytes, suffix=".mp3")
+        self.tts = ElevenLabsService(
+            config.elevenlabs_api_key,
+            config.elevenlabs_voice_id,
+            config.elevenlabs_max_concurrency,
+            cache=tts_cache,
+            loudnorm_mode=config.loudnorm_mode,
+            base_url=config.elevenlabs_base_url,
+            policy=self.policies["elevenlabs"],
+            http=self.http,
+        )
+        self.pexels = PexelsService(
+            config.pexels_api_key,
+            config.cache_dir,
+            max_connections=config.pexels_max_connections,
+            max_download_bytes=config.pexels_max_download_bytes,
+            search_ttl=config.pexels_search_ttl,
+            negative_ttl=config.pexels_search_negative_ttl,
+            ingest=MezzanineIngest(config.cache_dir / "mezzanine") if config.asset_ingest else None,
+            base_url=config.pexels_base_url,
+            policy=self.policies["pexels"],
+            download_policy=self.policies["pexels_cdn"],
+            http=self.http,
+            journal_mode=config.cache_journal_mode,
+        )
+        self.subtitles = SubtitleService()
+        scene_cache = FileCache(config.cache_dir / "scenes", config.scene_cache_max_bytes, suffix=".mp4")
+        self.composer = VideoComposer(workers=workers or config.render_workers, scene_cache=scene_cache, motion=config.motion)
+
+    def _policy(self, name: str, rate: float | None, burst: int, retry_on: tuple[type[Exception], ...] = ()) -> ApiPolicy:
+        return ApiPolicy(
+            name,
+            rate=rate,
+            burst=burst,
+            max_attempts=self.config.api_max_attempts,
+            failure_threshold=self.config.circuit_failures,
+            reset_after=self.config.circuit_reset_seconds,
+            retry_on=retry_on,
+        )
+
+    def api_stats(self) -> dict:
+        return {name: policy.stats() for name, policy in self.policies.items()}
+
+    def run(
+        self, job: GenerationJob, output_dir: Path, force: bool = False, from_stage: str | None = None, cancel: threading.Event | None = None
+    ) -> dict:
+        """Run one job as a stage graph: asset lookups overlap TTS and each scene encodes as soon as its inputs exist.
+
+        Stages whose inputs match the run directory's manifest are reused instead of recomputed; `force`
+        recomputes everything and `from_stage` recomputes that stage and everything downstream of it.
+        Files are written in the job's workspace and promoted to `output_dir` at the end. Setting `cancel`
+        stops the run at the next stage boundary with StageCancelled.
+        """
+        tracer = Tracer(self.logger)
+        with self.workspace(output_dir, job.profile, tracer.fetched) as workspace:
+            manifest = StageManifest(workspace.path, force=force, from_stage=from_stage)
+            with tracing.activate(tracer), tracer.span("generate", topic=job.topic, style=job.style, profile=job.profile):
+                report, graph = self._run_graph(job, workspace.path, manifest, cancel)
+        graph.log_summary(self.logger)
+        report["stages"] = manifest.summary()
+        self.logger.info(f"Estágios reaproveitados: {len(report['stages']['reused'])}, recalculados: {len(report['stages']['recomputed'])}")
+        return self.finish_report(self.disk_report(workspace, report), tracer, output_dir, graph.critical_path())
+
+    def workspace(self, output_dir: Path, profile: str, fetched: set[Path] | None = None) -> Workspace:
+        policy = self.config.artifact_policy
+        if profile == "draft" and policy == "final":
+            policy = "review"  # a draft has to stay promotable
+        return Workspace(output_dir, self.config.scratch_root, policy, fetched)
+
+    def disk_report(self, workspace: Workspace, report: dict) -> dict:
+        """Point the report at the promoted files and add what the run wrote to disk."""
+        report = workspace.relocate(report)
+        report["disk"] = workspace.disk
+        self.logger.info(
+            f"Artefatos em {workspace.output_dir}; gravados em disco: {workspace.disk['disk_bytes_written'] / 1e6:.1f} MB "
+            f"(scratch: {workspace.disk['scratch_bytes'] / 1e6:.1f} MB, removidos: {workspace.disk['removed_bytes'] / 1e6:.1f} MB)"
+        )
+        return report
+
+    def finish_report(self, report: dict, tracer: Tracer, output_dir: Path, critical_path: list[str] | None = None) -> dict:
+        """Add the run's spans to generation_report.json, plus trace.json when tracing is on."""
+        spans = tracer.summary()
+        report["timings"] = {
+            "total_seconds": max((span["end"] for span in spans), default=0.0),
+            "critical_path": critical_path or [],
+            "spans": spans,
+        }
+        if self.trace:
+            report["trace"] = str(tracer.write_chrome_trace(output_dir / "trace.json"))
+        (output_dir / "generation_report.json").write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        return report
+
+    def _run_graph(
+        self, job: GenerationJob, output_dir: Path, manifest: StageManifest, cancel: threading.Event | None = None
+    ) -> tuple[dict, StageGraph]:
+        profile = PROFILES[job.profile]
+        graph = StageGraph(cancel=cancel)
+        graph.add("script", lambda: self.write_script(job, output_dir, manifest))
+        script = graph.run()["script"]
+        count = len(script.segments)
+
+        # each segment's duration is known as soon as its own audio is; only the mix waits for all of them
+        self.logger.info("Gerando áudio de narração")
+        audio_stages: list[str] = []
+        for idx, (segment, path) in enumerate(zip(script.segments, self.tts.segment_paths(count, output_dir))):
+            graph.add(
+                f"audio_{idx:02d}", lambda t=segment.text, p=path: self.tts.synthesize_segment(t, p, _loudnorm_mode(profile), manifest)
+            )
+            audio_stages.append(f"audio_{idx:02d}")
+        graph.add("narration", lambda *metas: self.mix_narration(list(metas), output_dir, profile, manifest), deps=audio_stages)
+        graph.add(
+            "subtitles", lambda s, narration: self.write_subtitles(s, narration[1], output_dir, profile, manifest), deps=["script", "narration"]
+        )
+        asset_stages: list[str] = []
+        for idx, segment in enumerate(script.segments):
+            graph.add(f"asset_{idx:02d}", lambda i=idx, k=segment.keywords: self.pick_asset(i, k, manifest))
+            asset_stages.append(f"asset_{idx:02d}")
+
+        scene_stages: list[str] = []
+        if job.render_mode == "multi":
+            scenes_dir = output_dir / "scenes"
+            scenes_dir.mkdir(parents=True, exist_ok=True)
+            for idx, (audio_stage, asset_stage) in enumerate(zip(audio_stages, asset_stages)):
+                graph.add(
+                    f"scene_{idx:02d}",
+                    lambda meta, asset: self.render_scene(asset, float(meta["duration"]), scenes_dir, job.visual_intensity, profile, manifest),
+                    deps=[audio_stage, asset_stage],
+                )
+                scene_stages.append(f"scene_{idx:02d}")
+
+        def compose(script: Script, narration: tuple[Path, list[Timing]], subtitles: tuple[Path, Path], *rest) -> dict:
+            assets, scenes = list(rest[:count]), list(rest[count:])
+            return self.render(job, script, narration[0], narration[1], assets, subtitles, output_dir, rendered_scenes=scenes or None, manifest=manifest)
+
+        graph.add("compose", compose, deps=["script", "narration", "subtitles", *asset_stages, *scene_stages])
+        return graph.run()["compose"], graph
+
+    def promote(self, run_dir: Path) -> dict:
+        """Re-render a draft run at the final profile from its saved script, audio segments, timings and assets."""
+        report = json.loads((run_dir / "generation_report.json").read_text(encoding="utf-8"))
+        job = GenerationJob(**{**report["job"], "profile": "final"})
+        profile = PROFILES[job.profile]
+        script = self._load_script(run_dir / "script.json")
+        timings = [Timing(**item) for item in json.loads((run_dir / "timing.json").read_text(encoding="utf-8"))]
+        assets = [AssetChoice(**item) for item in report["assets"]]
+
+        self.logger.info(f"Promovendo rascunho {run_dir} para render final")
+        tracer = Tracer(self.logger)
+        with self.workspace(run_dir, job.profile, tracer.fetched) as workspace, tracing.activate(tracer), tracer.span("promote", run_dir=str(run_dir)):
+            work_dir = workspace.path
+            with tracer.span("stage.narration"):
+                narration = self.tts.remix([s.text for s in script.segments], [t.duration for t in timings], work_dir)
+            with tracer.span("stage.subtitles"):
+                subtitles = self.write_subtitles(script, timings, work_dir, profile)
+            with tracer.span("stage.compose"):
+                report = self.render(job, script, narration, timings, assets, subtitles, work_dir)
+        return self.finish_report(self.disk_report(workspace, report), tracer, run_dir)
+
+    def write_script(
+        self, job: GenerationJob, output_dir: Path | None = None, manifest: StageManifest | None = None, generated: Script | None = None
+    ) -> Script:
+        """Request the job's script (unless `generated` already holds it) and add the CTAs."""
+        inputs = StageManifest.key(job.topic, job.style, job.length, job.cta_variation, job.seed, self.gemini.MODEL, bool(self.gemini.api_key))
+        if output_dir and manifest and manifest.fresh("script", inputs):
+            self.logger.info("Reaproveitando roteiro")
+            return self._load_script(output_dir / "script.json")
+
+        if generated:
+            script = generated
+        else:
+            self.logger.info("Gerando roteiro")
+            script = self.gemini.generate_script(job.topic, job.style, job.length, use_cache=job.script_cache == "on")
+
+        rng = random.Random(job.seed)
+        initial_cta = self.cta.initial(job.style, enabled=job.cta_variation == "on", rng=rng)
+        final_cta = script.cta_final or self.cta.final(enabled=job.cta_variation == "on", rng=rng)
+
+        script.segments[0].text = f"{script.hook} {initial_cta}. {script.segments[0].text}"
+        script.segments[-1].text = f"{script.segments[-1].text} {final_cta}."
+        if output_dir:
+            # kept so a draft can be promoted without asking Gemini again
+            (output_dir / "script.json").write_text(json.dumps(asdict(script), indent=2, ensure_ascii=False), encoding="utf-8")
+            # a fallback script that stood in for an unavailable Gemini should not be reused next run
+            if manifest and not (self.gemini.api_key and script.safety_flags.get("fallback_mode")):
+                manifest.record("script", inputs, [output_dir / "script.json"])
+        return script
+
+    def _load_script(self, path: Path) -> Script:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+        return Script(**{**payload, "segments": [Segment(**segment) for segment in payload["segments"]]})
+
+    def narrate(
+        self, script: Script, output_dir: Path, profile: RenderProfile = PROFILES["final"], manifest: StageManifest | None = None
+    ) -> tuple[Path, list[Timing]]:
+        self.logger.info("Gerando áudio de narração")
+        texts = [s.text for s in script.segments]
+        _, narration_full, timing_path = self.tts.synthesize_segments(texts, output_dir, loudnorm_mode=_loudnorm_mode(profile), manifest=manifest)
+        return narration_full, _load_timings(timing_path)
+
+    def mix_narration(
+        self, metas: list[dict], output_dir: Path, profile: RenderProfile = PROFILES["final"], manifest: StageManifest | None = None
+    ) -> tuple[Path, list[Timing]]:
+        """Narration mix and timings from segments already synthesized with `tts.synthesize_segment`."""
+        _, narration_full, timing_path = self.tts.mix_segments(metas, output_dir, loudnorm_mode=_loudnorm_mode(profile), manifest=manifest)
+        return narration_full, _load_timings(timing_path)
+
+    def fetch_assets(self, script: Script) -> list[AssetChoice]:
+        self.logger.info("Buscando assets")
+        return self.pexels.pick_assets(script.segments)
+
+    def pick_asset(self, segment_index: int, keywords: list[str], manifest: StageManifest | None = None) -> AssetChoice:
+        stage = f"assets.{segment_index:02d}"
+        inputs = StageManifest.key(keywords, bool(self.pexels.api_key))
+        if manifest and manifest.fresh(stage, inputs):
+            return AssetChoice(**manifest.value(stage))
+        asset = self.pexels.pick_asset(segment_index, keywords)
+        if manifest:
+            manifest.record(stage, inputs, [Path(asset.path)], asdict(asset))
+        return asset
+
+    def render_scene(
+        self,
+        asset: AssetChoice,
+        duration: float,
+        scenes_dir: Path,
+        visual_intensity: str,
+        profile: RenderProfile = PROFILES["final"],
+        manifest: StageManifest | None = None,
+    ) -> tuple[Path, float, bool]:
+        stage = f"scenes.{asset.segment_index:02d}"
+        # a scene is encoded on its own clock: only its duration matters, not where it starts in the narration
+        timing = Timing(segment_index=asset.segment_index, start=0.0, end=duration, duration=duration)
+        inputs = self.composer.scene_key(asset, timing, visual_intensity, profile)
+        out = scenes_dir / f"scene_{asset.segment_index:02d}.mp4"
+        if manifest and manifest.fresh(stage, inputs):
+            return out, 0.0, True
+        rendered = self.composer.render_scene(asset, timing, scenes_dir, visual_intensity, profile)
+        if manifest:
+            manifest.record(stage, inputs, [rendered[0]])
+        return rendered
+
+    def write_subtitles(
+        self,
+        script: Script,
+        timings: list[Timing],
+        output_dir: Path,
+        profile: RenderProfile = PROFILES["final"],
+        manifest: StageManifest | None = None,
+    ) -> tuple[Path, Path]:
+        paths = (output_dir / "subtitles.srt", output_dir / "subtitles.ass")
+        inputs = StageManifest.key([asdict(s) for s in script.segments], [asdict(t) for t in timings], profile.width, profile.height, self.subtitles.STYLE)
+        if manifest and manifest.fresh("subtitles", inputs):
+            return paths
+        self.logger.info("Gerando legendas")
+        paths = self.subtitles.write(script.segments, timings, output_dir, profile)
+        if manifest:
+            manifest.record("subtitles", inputs, list(paths))
+        return paths
+
+    def render(
+        self,
+        job: GenerationJob,
+        script: Script,
+        narration: Path,
+        timings: list[Timing],
+        assets: list[AssetChoice],
+        subtitles: tuple[Path, Path],
+        output_dir: Path,
+        rendered_scenes: list[tuple[Path, float, bool]] | None = None,
+        manifest: StageManifest | None = None,
+    ) -> dict:
+        srt_path, ass_path = subtitles
+        self.logger.info("Compondo vídeo final")
+        final_mp4, metadata_path = self.composer.compose(
+            assets=assets,
+            timings=timings,
+            narration_path=narration,
+            subtitles_ass=ass_path,
+            output_dir=output_dir,
+            visual_intensity=job.visual_intensity,
+            music_on=job.music == "on",
+            music_path=self.config.music_default_path,
+            render_mode=job.render_mode,
+            rendered_scenes=rendered_scenes,
+            profile=PROFILES[job.profile],
+            # platform renditions only make sense from the full-size render
+            renditions=[RENDITIONS[name] for name in job.renditions] if job.profile == "final" else None,
+            manifest=manifest,
+        )
+
+        report = {
+            "title": script.title,
+            "topic": job.topic,
+            "style": job.style,
+            "length_target": job.length,
+            "profile": job.profile,
+            "job": asdict(job),
+            "assets": [asdict(asset) for asset in assets],
+            "final_video": str(final_mp4),
+            "subtitles_srt": str(srt_path),
+            "subtitles_ass": str(ass_path),
+            "metadata": str(metadata_path),
+            "hashtags": script.hashtags,
+            "description": script.description,
+            "tts_cache": _job_cache_stats("tts_cache", ("hits", "misses"), ("hits",)) if self.tts.cache else {},
+            "pexels_search_cache": _job_cache_stats("pexels_search_cache", ("hits", "stale", "misses"), ("hits", "stale")),
+            "api": self.api_stats(),
+            "http": self.http.stats(),
+        }
+        (output_dir / "generation_report.json").write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        self.logger.info(f"Concluído em: {final_mp4}")
+        return report
+
+
+def _job_cache_stats(group: str, outcomes: tuple[str, ...], hit_outcomes: tuple[str, ...]) -> dict:
+    """Cache outcomes of the current job, counted on its tracer; the shared services only keep process totals."""
+    stats: dict = {outcome: 0 for outcome in outcomes} | tracing.counts(group)
+    lookups = sum(stats.values())
+    stats["hit_ratio"] = round(sum(stats[outcome] for outcome in hit_outcomes) / lookups, 3) if lookups else 0.0
+    return stats
+
+
+def _loudnorm_mode(profile: RenderProfile) -> str | None:
+    return None if profile.loudnorm else "off"
+
+
+def _load_timings(path: Path) -> list[Timing]:
+    return [Timing(**item) for item in json.loads(path.read_text(encoding="utf-8"))]
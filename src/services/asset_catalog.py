@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import subprocess
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from src.utils.cache import SqliteFile, file_digest
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assets (
+    path TEXT PRIMARY KEY,
+    media_type TEXT NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    duration REAL,
+    bytes INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    source_url TEXT,
+    added_at REAL NOT NULL,
+    last_used REAL NOT NULL DEFAULT 0,
+    use_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS asset_keywords (
+    slug TEXT NOT NULL,
+    path TEXT NOT NULL REFERENCES assets (path) ON DELETE CASCADE,
+    keyword TEXT NOT NULL,
+    PRIMARY KEY (slug, path)
+);
+CREATE INDEX IF NOT EXISTS asset_keywords_path ON asset_keywords (path);
+CREATE INDEX IF NOT EXISTS assets_sha256 ON assets (sha256);
+"""
+
+
+def probe_media(path: Path) -> dict:
+    """Width, height and duration via ffprobe; empty when ffprobe is unavailable or the file is unreadable."""
+    try:
+        probe = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries", "stream=width,height:format=duration", "-of", "json", str(path)],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return {}
+    payload = json.loads(probe.stdout or "{}")
+    stream = (payload.get("streams") or [{}])[0]
+    duration = payload.get("format", {}).get("duration")
+    return {"width": stream.get("width"), "height": stream.get("height"), "duration": float(duration) if duration not in (None, "N/A") else None}
+
+
+class AssetCatalog:
+    """On-disk index of cached stock assets, looked up by keyword slug through a B-tree index.
+
+    Anti-repetition is least-recently-used: `pick` returns the slug's asset with the oldest `last_used`
+    and stamps it in the same transaction, so concurrent runs never pick the same clip back to back.
+    """
+
+    def __init__(self, path: Path, journal_mode: str = "WAL"):
+        self.path = path
+        self.db = SqliteFile(path, journal_mode=journal_mode, foreign_keys=True)
+        self.db.conn().executescript(SCHEMA)
+
+    def __len__(self) -> int:
+        return self.db.conn().execute("SELECT COUNT(*) FROM assets").fetchone()[0]
+
+    def add(self, path: Path, slug: str, keyword: str, media_type: str, source_url: str | None = None, used: bool = True) -> None:
+        stat = path.stat()
+        row = self.db.conn().execute("SELECT bytes, mtime_ns FROM assets WHERE path = ?", (str(path),)).fetchone()
+        fresh = row is None or tuple(row) != (stat.st_size, stat.st_mtime_ns)
+        media = probe_media(path) if fresh else {}
+        digest = file_digest(path) if fresh else None
+        now = time.time()
+        with self.db.transaction() as conn:
+            if fresh:
+                conn.execute(
+                    """
+                    INSERT INTO assets (path, media_type, width, height, duration, bytes, mtime_ns, sha256, source_url, added_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (path) DO UPDATE SET
+                        media_type = excluded.media_type, width = excluded.width, height = excluded.height,
+                        duration = excluded.duration, bytes = excluded.bytes, mtime_ns = excluded.mtime_ns,
+                        sha256 = excluded.sha256, source_url = COALESCE(excluded.source_url, assets.source_url)
+                    """,
+                    (str(path), media_type, media.get("width"), media.get("height"), media.get("duration"), stat.st_size, stat.st_mtime_ns, digest, source_url, now),
+                )
+            conn.execute("INSERT OR IGNORE INTO asset_keywords (slug, path, keyword) VALUES (?, ?, ?)", (slug, str(path), keyword))
+            if used:
+                conn.execute("UPDATE assets SET last_used = ?, use_count = use_count + 1 WHERE path = ?", (now, str(path)))
+
+    def pick(self, slug: str) -> Path | None:
+        with self.db.transaction() as conn:
+            while True:
+                row = conn.execute(
+                    """
+                    SELECT a.path FROM asset_keywords k JOIN assets a ON a.path = k.path
+                    WHERE k.slug = ? ORDER BY a.last_used, a.path LIMIT 1
+                    """,
+                    (slug,),
+                ).fetchone()
+                if row is None:
+                    return None
+                path = Path(row[0])
+                if path.exists():
+                    conn.execute("UPDATE assets SET last_used = ?, use_count = use_count + 1 WHERE path = ?", (time.time(), row[0]))
+                    return path
+                conn.execute("DELETE FROM assets WHERE path = ?", (row[0],))
+
+    def assets(self) -> list[tuple[Path, str]]:
+        return [(Path(path), media_type) for path, media_type in self.db.conn().execute("SELECT path, media_type FROM assets ORDER BY path")]
+
+    def entry(self, path: Path) -> dict | None:
+        conn = self.db.conn()
+        conn.row_factory = sqlite3.Row
+        try:
+            row = conn.execute("SELECT * FROM assets WHERE path = ?", (str(path),)).fetchone()
+            keywords = [r["keyword"] for r in conn.execute("SELECT keyword FROM asset_keywords WHERE path = ?", (str(path),))]
+        finally:
+            conn.row_factory = None
+        return {**dict(row), "keywords": keywords} if row else None
+
+    def reindex(self, asset_dir: Path, media_type_of: Callable[[Path], str], slug_of: Callable[[Path], str]) -> dict:
+        """Rebuild the catalog from the files in `asset_dir`, keeping usage stats and source URLs of known files."""
+        seen: set[str] = set()
+        for path in sorted(asset_dir.iterdir()):
+            if not path.is_file() or path.name.startswith((".", "placeholder_")) or path.suffix == ".part":
+                continue
+            slug = slug_of(path)
+            self.add(path, slug, slug.replace("_", " "), media_type_of(path), used=False)
+            seen.add(str(path))
+        with self.db.transaction() as conn:
+            known = [row[0] for row in conn.execute("SELECT path FROM assets")]
+            stale = [path for path in known if path not in seen]
+            conn.executemany("DELETE FROM assets WHERE path = ?", [(path,) for path in stale])
+        return {"indexed": len(seen), "removed": len(stale)}
@@ -3,7 +3,7 @@ from __future__ import annotations
 import random
 from pathlib import Path
 
-from src.utils.cache import JsonCache
+from src.utils.cache import StateStore
 
 INITIAL_CTAS = {
     "curiosity": [
@@ -81,25 +81,28 @@ FINAL_CTAS = [
 
 
 class CtaManager:
-    def __init__(self, cache_dir: Path, seed: int | None = None):
+    def __init__(self, cache_dir: Path, seed: int | None = None, journal_mode: str = "WAL"):
         self.random = random.Random(seed)
-        self.cache = JsonCache(cache_dir / "cta_history.json")
+        self.cache = StateStore(cache_dir / "state.sqlite3", "cta_history", legacy_json=cache_dir / "cta_history.json", journal_mode=journal_mode)
 
-    def _pick_with_history(self, candidates: list[str], key: str) -> str:
-        payload = self.cache.read()
-        recent = payload.get(key, [])[-3:]
-        filtered = [c for c in candidates if c not in recent] or candidates
-        chosen = self.random.choice(filtered)
-        payload[key] = (recent + [chosen])[-5:]
-        self.cache.write(payload)
-        return chosen
+    def _pick_with_history(self, candidates: list[str], key: str, rng: random.Random | None = None) -> str:
+        picked: list[str] = []
 
-    def initial(self, style: str, enabled: bool = True) -> str:
+        def pick(history: list[str]) -> list[str]:
+            recent = history[-3:]
+            filtered = [c for c in candidates if c not in recent] or candidates
+            picked.append((rng or self.random).choice(filtered))
+            return (recent + picked)[-5:]
+
+        self.cache.update(key, pick, default=[])
+        return picked[-1]
+
+    def initial(self, style: str, enabled: bool = True, rng: random.Random | None = None) -> str:
         if not enabled:
             return INITIAL_CTAS[style][0]
-        return self._pick_with_history(INITIAL_CTAS[style], f"initial_{style}")
+        return self._pick_with_history(INITIAL_CTAS[style], f"initial_{style}", rng)
 
-    def final(self, enabled: bool = True) -> str:
+    def final(self, enabled: bool = True, rng: random.Random | None = None) -> str:
         if not enabled:
             return FINAL_CTAS[0]
-        return self._pick_with_history(FINAL_CTAS, "final")
+        return self._pick_with_history(FINAL_CTAS, "final", rng)
@@ -1,69 +1,235 @@
 from __future__ import annotations
 
+import hashlib
 import json
 import subprocess
-import urllib.error
-import urllib.request
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
 from pathlib import Path
 
 from src.models import Timing
-from src.utils.retry import retry
+from src.utils.audio import combine_loudness, loudnorm_filter, measure_loudness, mp3_duration, probe_durations
+from src.utils import tracing
+from src.utils.cache import FileCache, file_digest
+from src.utils.http import HttpClient
+from src.utils.manifest import StageManifest
+from src.utils.retry import ApiPolicy, CircuitOpenError, retry
+
+
+LOUDNORM_MODES = ("linear", "dynamic", "off")
 
 
 class ElevenLabsService:
-    def __init__(self, api_key: str | None, voice_id: str):
+    MODEL_ID = "eleven_multilingual_v2"
+    VOICE_SETTINGS = {"stability": 0.45, "similarity_boost": 0.8}
+    BASE_URL = "https://api.elevenlabs.io"
+
+    def __init__(
+        self,
+        api_key: str | None,
+        voice_id: str,
+        max_concurrency: int = 3,
+        cache: FileCache | None = None,
+        loudnorm_mode: str = "linear",
+        base_url: str | None = None,
+        policy: ApiPolicy | None = None,
+        http: HttpClient | None = None,
+    ):
         self.api_key = api_key
         self.voice_id = voice_id
+        self.max_concurrency = max(1, max_concurrency)
+        self.cache = cache
+        self.loudnorm_mode = loudnorm_mode
+        self.base_url = (base_url or self.BASE_URL).rstrip("/")
+        self.policy = policy or ApiPolicy("elevenlabs")
+        self.http = http or HttpClient()
+        # bounds API calls, cache fetches and loudness scans however many segments are requested at once
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
 
-    @retry(max_attempts=3, exceptions=(urllib.error.URLError, subprocess.CalledProcessError))
-    def synthesize_segments(self, texts: list[str], output_dir: Path) -> tuple[list[Path], Path, Path]:
-        audio_dir = output_dir / "audio"
-        audio_dir.mkdir(parents=True, exist_ok=True)
-        segment_files: list[Path] = []
+    def synthesize_segments(
+        self, texts: list[str], output_dir: Path, loudnorm_mode: str | None = None, manifest: StageManifest | None = None
+    ) -> tuple[list[Path], Path, Path]:
+        """Segments, narration mix and timing.json; with a manifest, each step whose inputs are unchanged is reused."""
+        mode = loudnorm_mode or self.loudnorm_mode
+        segment_files = self.segment_paths(len(texts), output_dir)
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_concurrency, len(texts)))) as pool:
+            synthesize = tracing.propagate(lambda text, path: self._synthesize(text, path, mode, manifest))
+            metas = list(pool.map(synthesize, texts, segment_files))
 
-        for idx, text in enumerate(texts, start=1):
-            seg_path = audio_dir / f"segment_{idx:02d}.mp3"
-            if self.api_key:
-                self._elevenlabs_tts(text, seg_path)
-            else:
-                self._fallback_tone(text, seg_path)
-            segment_files.append(seg_path)
+        # what the frame parser could not read is probed by one ffmpeg process for the whole narration
+        missing = [idx for idx, meta in enumerate(metas) if meta.get("duration") is None]
+        for idx, duration in zip(missing, probe_durations([segment_files[idx] for idx in missing])):
+            metas[idx] = self._settle(texts[idx], segment_files[idx], metas[idx], duration)
+        for text, path, meta in zip(texts, segment_files, metas):
+            self._record(text, path, meta, mode, manifest)
+        return self.mix_segments(metas, output_dir, mode, manifest)
 
-        concat_file = audio_dir / "concat.txt"
-        concat_file.write_text("\n".join([f"file '{p.name}'" for p in segment_files]), encoding="utf-8")
+    def synthesize_segment(self, text: str, path: Path, loudnorm_mode: str | None = None, manifest: StageManifest | None = None) -> dict:
+        """One segment on its own, for callers that start work per segment; its meta carries the duration."""
+        mode = loudnorm_mode or self.loudnorm_mode
+        meta = self._synthesize(text, path, mode, manifest)
+        if meta.get("duration") is None:
+            meta = self._settle(text, path, meta, probe_durations([path])[0])
+        self._record(text, path, meta, mode, manifest)
+        return meta
 
-        full_raw = output_dir / "narration_raw.mp3"
+    def mix_segments(
+        self, metas: list[dict], output_dir: Path, loudnorm_mode: str | None = None, manifest: StageManifest | None = None
+    ) -> tuple[list[Path], Path, Path]:
+        """Narration mix and timing.json from the segments in `output_dir/audio` and their metas."""
+        mode = loudnorm_mode or self.loudnorm_mode
+        segment_files = self.segment_paths(len(metas), output_dir)
+        durations = [float(meta["duration"]) for meta in metas]
         full_norm = output_dir / "narration_full.mp3"
-        subprocess.run(["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", str(concat_file), "-c", "copy", str(full_raw)], cwd=audio_dir, check=True, capture_output=True)
-        subprocess.run(["ffmpeg", "-y", "-i", str(full_raw), "-af", "loudnorm=I=-16:TP=-1.5:LRA=11", str(full_norm)], check=True, capture_output=True)
+        mix_inputs = StageManifest.key([file_digest(path) for path in segment_files], durations, mode)
+        if not (manifest and manifest.fresh("narration", mix_inputs)):
+            self._mix_narration(segment_files, durations, [meta.get("loudness") for meta in metas], output_dir, mode)
+            if manifest:
+                manifest.record("narration", mix_inputs, [full_norm])
 
-        timings = self._build_timing(segment_files)
         timing_path = output_dir / "timing.json"
-        timing_path.write_text(json.dumps([t.__dict__ for t in timings], indent=2), encoding="utf-8")
+        if not (manifest and manifest.fresh("timing", StageManifest.key(durations))):
+            timings = self._build_timing(durations)
+            timing_path.write_text(json.dumps([asdict(t) for t in timings], indent=2), encoding="utf-8")
+            if manifest:
+                manifest.record("timing", StageManifest.key(durations), [timing_path])
         return segment_files, full_norm, timing_path
 
+    def segment_paths(self, count: int, output_dir: Path) -> list[Path]:
+        return [output_dir / "audio" / f"segment_{idx:02d}.mp3" for idx in range(1, count + 1)]
+
+    def remix(self, texts: list[str], durations: list[float], output_dir: Path, loudnorm_mode: str | None = None) -> Path:
+        """Rebuild narration_full.mp3 from the segments already in `output_dir`, without synthesizing anything."""
+        mode = loudnorm_mode or self.loudnorm_mode
+        segment_files = self.segment_paths(len(texts), output_dir)
+        loudness: list[dict | None] = [None] * len(texts)
+        if mode == "linear":
+            for idx, (text, path) in enumerate(zip(texts, segment_files)):
+                meta = (self.cache.meta(self._cache_key(text)) if self.cache else None) or {}
+                loudness[idx] = meta.get("loudness") or measure_loudness(path)
+        return self._mix_narration(segment_files, durations, loudness, output_dir, mode)
+
+    def cache_stats(self) -> dict:
+        """Process-wide totals; a job's own hits and misses are counted on its tracer as `tts_cache`."""
+        return self.cache.stats() if self.cache else {}
+
+    def _synthesize(self, text: str, path: Path, mode: str, manifest: StageManifest | None) -> dict:
+        if manifest and manifest.fresh(f"audio.{path.stem}", self._segment_inputs(text, mode)):
+            return manifest.value(f"audio.{path.stem}")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._slots:
+            return self._segment(text, path, mode)
+
+    def _settle(self, text: str, path: Path, meta: dict, duration: float | None) -> dict:
+        """Fill in a probed duration; a segment that ffmpeg cannot read either is replaced by the fallback tone."""
+        if duration is None:
+            # a tone keeps the narration going and is neither cached nor recorded
+            path.unlink(missing_ok=True)
+            tone = {"voice_id": self.voice_id, "text": text, "fallback": True}
+            tone["duration"] = self._fallback_tone(text, path)
+            return tone
+        meta["duration"] = duration
+        self._remember(text, path, meta)
+        return meta
+
+    def _record(self, text: str, path: Path, meta: dict, mode: str, manifest: StageManifest | None) -> None:
+        stage = f"audio.{path.stem}"
+        # a fallback tone stands in for an unavailable API and must not satisfy the next run
+        if manifest and stage not in manifest.reused and not meta.get("fallback"):
+            manifest.record(stage, self._segment_inputs(text, mode), [path], meta)
+
+    def _segment_inputs(self, text: str, mode: str) -> str:
+        return StageManifest.key(self._cache_key(text), mode)
+
+    def _segment(self, text: str, out_path: Path, mode: str) -> dict:
+        key = self._cache_key(text)
+        hit = self.cache is not None and self.cache.fetch(key, out_path)
+        if self.cache:
+            tracing.count("tts_cache", "hits" if hit else "misses")
+        if hit:
+            meta = self.cache.meta(key) or {}
+            if "duration" in meta and ("loudness" in meta or mode != "linear"):
+                return meta
+        else:
+            # a previous cache hit may have left a hard link to the cached file here
+            out_path.unlink(missing_ok=True)
+            meta = {"voice_id": self.voice_id, "text": text}
+            if not self.api_key:
+                self._fallback_tone(text, out_path)
+            else:
+                try:
+                    self.policy.call(self._elevenlabs_tts, text, out_path)
+                except CircuitOpenError:
+                    self._fallback_tone(text, out_path)
+                    meta["fallback"] = True
+
+        if meta.get("duration") is None:
+            meta["duration"] = mp3_duration(out_path)
+        if mode == "linear" and "loudness" not in meta:
+            with tracing.span("audio.loudness_scan", path=out_path.name):
+                loudness = measure_loudness(out_path)
+            # None when ffmpeg cannot read the segment; the duration probe then decides on the fallback tone
+            if loudness is not None:
+                meta["loudness"] = loudness
+        if meta["duration"] is not None:
+            self._remember(text, out_path, meta)
+        return meta
+
+    def _remember(self, text: str, path: Path, meta: dict) -> None:
+        if not self.cache or meta.get("fallback"):
+            return
+        key = self._cache_key(text)
+        if self.cache.path_for(key).exists():
+            self.cache.update_meta(key, meta)
+        else:
+            self.cache.store(key, path, meta)
+
+    def _cache_key(self, text: str) -> str:
+        normalized = " ".join(unicodedata.normalize("NFC", text).split())
+        payload = {"engine": "elevenlabs", "voice_id": self.voice_id, "model_id": self.MODEL_ID, "voice_settings": self.VOICE_SETTINGS}
+        if not self.api_key:
+            payload = {"engine": "fallback_tone"}
+        payload["text"] = normalized
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    @retry(max_attempts=3, exceptions=(subprocess.CalledProcessError,))
+    def _mix_narration(self, segment_files: list[Path], durations: list[float], loudness: list[dict | None], output_dir: Path, mode: str) -> Path:
+        audio_dir = segment_files[0].parent
+        concat_file = audio_dir / "concat.txt"
+        concat_file.write_text("\n".join([f"file '{p.name}'" for p in segment_files]), encoding="utf-8")
+
+        # concat and normalization in one pass; linear mode reuses the cached per-segment measurements
+        measured = None
+        if mode == "linear" and all(loudness):
+            measured = combine_loudness(loudness, durations)
+        full_norm = output_dir / "narration_full.mp3"
+        # "off" skips normalization entirely: the segments are joined as-is
+        audio_args = ["-c", "copy"] if mode == "off" else ["-af", loudnorm_filter(measured), "-ar", "44100"]
+        tracing.run_ffmpeg(["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", str(concat_file), *audio_args, str(full_norm)], "narration", cwd=audio_dir)
+        return full_norm
+
     def _elevenlabs_tts(self, text: str, out_path: Path) -> None:
-        url = f"https://api.elevenlabs.io/v1/text-to-speech/{self.voice_id}"
-        payload = json.dumps({"text": text, "model_id": "eleven_multilingual_v2", "voice_settings": {"stability": 0.45, "similarity_boost": 0.8}}).encode("utf-8")
-        req = urllib.request.Request(
-            url,
-            data=payload,
-            headers={"xi-api-key": self.api_key or "", "Content-Type": "application/json", "Accept": "audio/mpeg"},
-            method="POST",
-        )
-        with urllib.request.urlopen(req, timeout=45) as response:
-            out_path.write_bytes(response.read())
-
-    def _fallback_tone(self, text: str, out_path: Path) -> None:
+        url = f"{self.base_url}/v1/text-to-speech/{self.voice_id}"
+        payload = json.dumps({"text": text, "model_id": self.MODEL_ID, "voice_settings": self.VOICE_SETTINGS}).encode("utf-8")
+        headers = {"xi-api-key": self.api_key or "", "Content-Type": "application/json", "Accept": "audio/mpeg"}
+        with tracing.span("elevenlabs.tts", chars=len(text)) as item, self.http.post(url, payload, headers=headers, timeout=45) as response:
+            data = response.read()
+            out_path.write_bytes(data)
+            if item:
+                item.attrs["bytes"] = len(data)
+
+    @retry(max_attempts=3, exceptions=(subprocess.CalledProcessError,))
+    def _fallback_tone(self, text: str, out_path: Path) -> float:
         seconds = max(1.8, len(text.split()) * 0.38)
-        subprocess.run(["ffmpeg", "-y", "-f", "lavfi", "-i", f"sine=frequency=220:duration={seconds}", "-af", "volume=0.03", str(out_path)], check=True, capture_output=True)
+        tracing.run_ffmpeg(["ffmpeg", "-y", "-f", "lavfi", "-i", f"sine=frequency=220:duration={seconds}", "-af", "volume=0.03", str(out_path)], "fallback_tone")
+        return seconds
 
-    def _build_timing(self, segment_files: list[Path]) -> list[Timing]:
+    def _build_timing(self, durations: list[float]) -> list[Timing]:
         timings: list[Timing] = []
         current = 0.0
-        for idx, seg in enumerate(segment_files):
-            probe = subprocess.run(["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=nw=1:nk=1", str(seg)], check=True, capture_output=True, text=True)
-            duration = float(probe.stdout.strip())
+        for idx, duration in enumerate(durations):
             timings.append(Timing(segment_index=idx, start=current, end=current + duration, duration=duration))
             current += duration
         return timings
@@ -1,36 +1,88 @@
 from __future__ import annotations
 
+import hashlib
 import json
 import random
 import urllib.error
 import urllib.parse
-import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
 from src.models import Script, Segment
-from src.utils.retry import retry
+from src.utils import tracing
+from src.utils.cache import StateStore
+from src.utils.http import HttpClient
+from src.utils.retry import ApiPolicy, CircuitOpenError
 
 
 class GeminiService:
-    def __init__(self, api_key: str | None, seed: int | None = None):
+    MODEL = "gemini-1.5-flash"
+    BASE_URL = "https://generativelanguage.googleapis.com"
+
+    def __init__(
+        self,
+        api_key: str | None,
+        seed: int | None = None,
+        cache: StateStore | None = None,
+        max_concurrency: int = 4,
+        base_url: str | None = None,
+        policy: ApiPolicy | None = None,
+        http: HttpClient | None = None,
+    ):
         self.api_key = api_key
         self.random = random.Random(seed)
+        self.cache = cache
+        self.max_concurrency = max(1, max_concurrency)
+        self.base_url = (base_url or self.BASE_URL).rstrip("/")
+        # invalid JSON from the model is worth another attempt, like a transport error
+        self.policy = policy or ApiPolicy("gemini", retry_on=(ValueError,))
+        self.http = http or HttpClient()
 
-    @retry(max_attempts=3, exceptions=(urllib.error.URLError, ValueError))
-    def generate_script(self, topic: str, style: str, length: int) -> Script:
+    def generate_script(self, topic: str, style: str, length: int, use_cache: bool = True) -> Script:
         if not self.api_key:
             return self._fallback_script(topic, style, length)
 
-        endpoint = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent"
         prompt = self._build_prompt(topic=topic, style=style, length=length)
-        url = f"{endpoint}?key={urllib.parse.quote(self.api_key)}"
+        key = hashlib.sha256(f"{self.MODEL}\n{prompt}".encode("utf-8")).hexdigest()
+        if use_cache and self.cache:
+            cached = self.cache.get(key)
+            if cached:
+                return self._to_script(cached)
+        try:
+            payload = self.policy.call(self._request_script, prompt)
+        except CircuitOpenError:
+            return self._fallback_script(topic, style, length)
+        if self.cache:
+            self.cache.set(key, payload)
+        return self._to_script(payload)
+
+    def generate_scripts(self, requests: list[tuple[str, str, int]], use_cache: bool = True) -> list[Script]:
+        """Generate many scripts concurrently; each is requested, validated and retried on its own.
+
+        A topic that still fails after its retries gets the local fallback script instead of failing the batch.
+        """
+
+        def one(request: tuple[str, str, int]) -> Script:
+            topic, style, length = request
+            try:
+                return self.generate_script(topic, style, length, use_cache=use_cache)
+            except (urllib.error.URLError, ValueError):
+                return self._fallback_script(topic, style, length)
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            return list(pool.map(tracing.propagate(one), requests))
+
+    def _request_script(self, prompt: str) -> dict[str, Any]:
+        endpoint = f"{self.base_url}/v1beta/models/{self.MODEL}:generateContent"
+        url = f"{endpoint}?key={urllib.parse.quote(self.api_key or '')}"
         payload = json.dumps({"contents": [{"parts": [{"text": prompt}]}]}).encode("utf-8")
-        req = urllib.request.Request(url, data=payload, headers={"Content-Type": "application/json"}, method="POST")
-        with urllib.request.urlopen(req, timeout=45) as response:
-            data = json.loads(response.read().decode("utf-8"))
+        with tracing.span("gemini.generate", model=self.MODEL), self.http.post(url, payload, headers={"Content-Type": "application/json"}, timeout=45) as response:
+            data = response.json()
         text = data["candidates"][0]["content"]["parts"][0]["text"]
         cleaned = text.replace("```json", "").replace("```", "").strip()
-        return self._to_script(json.loads(cleaned))
+        parsed = json.loads(cleaned)
+        self._validate(parsed)
+        return parsed
 
     def _build_prompt(self, topic: str, style: str, length: int) -> str:
         return f"""
@@ -41,6 +93,14 @@ Regras: PT-BR natural, frases curtas, 6-10 segmentos, duração alvo {length}s,
 Tema: {topic}
 """.strip()
 
+    def _validate(self, payload: dict[str, Any]) -> None:
+        try:
+            script = self._to_script(payload)
+        except (KeyError, TypeError, AttributeError) as exc:
+            raise ValueError(f"roteiro inválido: {exc}") from exc
+        if not script.segments or any(not segment.text or not segment.keywords for segment in script.segments):
+            raise ValueError("roteiro inválido: segmentos vazios ou sem keywords")
+
     def _to_script(self, payload: dict[str, Any]) -> Script:
         segments = [Segment(**segment) for segment in payload["segments"]]
         return Script(payload["title"], payload["hook"], payload["style"], segments, payload["hashtags"], payload["description"], payload.get("cta_final"), payload.get("safety_flags", {}))
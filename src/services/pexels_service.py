@@ -1,72 +1,143 @@
 from __future__ import annotations
 
 import hashlib
-import json
-import subprocess
+import os
+import threading
+import time
 import urllib.error
 import urllib.parse
-import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-from src.models import AssetChoice
-from src.utils.cache import JsonCache
-from src.utils.retry import retry
+from src.models import AssetChoice, Segment
+from src.services.asset_catalog import AssetCatalog
+from src.utils import tracing
+from src.utils.cache import StateStore, file_lock
+from src.utils.http import HttpClient
+from src.utils.retry import ApiPolicy, CircuitOpenError
+from src.video.ingest import MezzanineIngest
+
+
+DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+class AssetTooLargeError(Exception):
+    pass
 
 
 class PexelsService:
-    def __init__(self, api_key: str | None, cache_dir: Path):
+    BASE_URL = "https://api.pexels.com"
+    # how often a process deletes search entries too old to be served even stale
+    SWEEP_INTERVAL = 3600
+
+    def __init__(
+        self,
+        api_key: str | None,
+        cache_dir: Path,
+        max_connections: int = 4,
+        max_download_bytes: int | None = None,
+        search_ttl: float = 24 * 3600,
+        negative_ttl: float = 3600,
+        stale_ttl: float = 7 * 24 * 3600,
+        ingest: MezzanineIngest | None = None,
+        base_url: str | None = None,
+        policy: ApiPolicy | None = None,
+        download_policy: ApiPolicy | None = None,
+        http: HttpClient | None = None,
+        journal_mode: str = "WAL",
+    ):
         self.api_key = api_key
         self.cache_dir = cache_dir
         self.asset_dir = cache_dir / "pexels"
         self.asset_dir.mkdir(parents=True, exist_ok=True)
-        self.history = JsonCache(cache_dir / "asset_history.json")
+        self.catalog = AssetCatalog(cache_dir / "catalog.sqlite3", journal_mode)
+        if not len(self.catalog):
+            self.reindex()
+        self.max_connections = max(1, max_connections)
+        self.max_download_bytes = max_download_bytes
+        self._connections = threading.Semaphore(self.max_connections)
+        self._download_locks: dict[Path, threading.Lock] = {}
+        self._download_locks_guard = threading.Lock()
+        self.search_cache = StateStore(cache_dir / "state.sqlite3", "pexels_search", journal_mode=journal_mode)
+        self.search_ttl = search_ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        self._swept_at = 0.0
+        self.base_url = (base_url or self.BASE_URL).rstrip("/")
+        self.policy = policy or ApiPolicy("pexels")
+        # media comes from Pexels' CDN, which has no API quota but can still fail on its own
+        self.download_policy = download_policy or ApiPolicy("pexels_cdn")
+        self.http = http or HttpClient(max_idle_per_host=self.max_connections)
+        self._search_stats = {"hits": 0, "stale": 0, "misses": 0}
+        self._stats_lock = threading.Lock()
+        self.ingest = ingest
+
+    def pick_assets(self, segments: list[Segment]) -> list[AssetChoice]:
+        """Search and download assets for all segments concurrently, at most `max_connections` requests at once."""
+        with ThreadPoolExecutor(max_workers=self.max_connections) as pool:
+            return list(pool.map(tracing.propagate(self.pick_asset), range(len(segments)), [segment.keywords for segment in segments]))
 
     def pick_asset(self, segment_index: int, keywords: list[str]) -> AssetChoice:
+        use_api = bool(self.api_key)
         for keyword in keywords:
             cached = self._find_in_cache(keyword)
             if cached:
-                return AssetChoice(segment_index, keyword, self._media_type(cached), str(cached), None)
-            if self.api_key:
-                video = self._search_video(keyword)
-                if video:
-                    path = self._download(video["url"], keyword)
-                    self._remember(path)
-                    return AssetChoice(segment_index, keyword, "video", str(path), video["url"])
-                image = self._search_image(keyword)
-                if image:
-                    path = self._download(image["url"], keyword)
-                    self._remember(path)
-                    return AssetChoice(segment_index, keyword, "image", str(path), image["url"])
+                return self._choice(segment_index, keyword, self._media_type(cached), cached, None)
+            if use_api:
+                try:
+                    found = self._fetch_asset(keyword)
+                except CircuitOpenError:
+                    # the API is down: the remaining keywords can still hit the local catalog
+                    use_api = False
+                    continue
+                if found:
+                    media_type, path, url = found
+                    return self._choice(segment_index, keyword, media_type, path, url)
         fallback = self._placeholder_video(segment_index)
-        return AssetChoice(segment_index, keywords[0], "video", str(fallback), None)
+        # the placeholder is generated at the render size and frame rate already
+        return AssetChoice(segment_index, keywords[0], "video", str(fallback), None, str(fallback))
+
+    def _fetch_asset(self, keyword: str) -> tuple[str, Path, str] | None:
+        video = self._search_video(keyword)
+        if video:
+            try:
+                path = self._download(video["url"], keyword)
+            except AssetTooLargeError:
+                pass
+            else:
+                self.catalog.add(path, self._slug(keyword), keyword, "video", video["url"])
+                return "video", path, video["url"]
+        image = self._search_image(keyword)
+        if image:
+            try:
+                path = self._download(image["url"], keyword)
+            except AssetTooLargeError:
+                return None
+            self.catalog.add(path, self._slug(keyword), keyword, "image", image["url"])
+            return "image", path, image["url"]
+        return None
+
+    def _choice(self, segment_index: int, keyword: str, media_type: str, path: Path, source_url: str | None) -> AssetChoice:
+        mezzanine = self.ingest.ensure(path, media_type) if self.ingest else None
+        return AssetChoice(segment_index, keyword, media_type, str(path), source_url, str(mezzanine) if mezzanine else None)
+
+    def reindex(self) -> dict:
+        return self.catalog.reindex(self.asset_dir, self._media_type, lambda path: path.stem.rsplit("_", 1)[0])
+
+    def ingest_cache(self, ingest: MezzanineIngest, workers: int = 2) -> dict:
+        """Build mezzanines for every cataloged asset that does not have one yet."""
+        assets = self.catalog.assets()
+        before = sum(1 for path, media_type in assets if ingest.path_for(path, media_type).exists())
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            results = list(pool.map(lambda item: ingest.ensure(*item), assets))
+        failed = sum(1 for result in results if result is None)
+        return {"assets": len(assets), "ingested": len(assets) - before - failed, "skipped": before, "failed": failed}
 
     def _find_in_cache(self, keyword: str) -> Path | None:
-        candidates = sorted(self.asset_dir.glob(f"{self._slug(keyword)}_*"))
-        if not candidates:
-            return None
-        payload = self.history.read()
-        recent = payload.get("recent_assets", [])[-6:]
-        for candidate in candidates:
-            if str(candidate) not in recent:
-                self._remember(candidate)
-                return candidate
-        return candidates[0]
-
-    def _remember(self, path: Path) -> None:
-        payload = self.history.read()
-        recent = payload.get("recent_assets", [])[-6:]
-        payload["recent_assets"] = (recent + [str(path)])[-12:]
-        self.history.write(payload)
-
-    @retry(max_attempts=3, exceptions=(urllib.error.URLError,))
+        return self.catalog.pick(self._slug(keyword))
+
     def _search_video(self, keyword: str) -> dict | None:
-        params = urllib.parse.urlencode({"query": keyword, "per_page": 8, "orientation": "portrait"})
-        req = urllib.request.Request(
-            f"https://api.pexels.com/videos/search?{params}",
-            headers={"Authorization": self.api_key or ""},
-        )
-        with urllib.request.urlopen(req, timeout=25) as response:
-            videos = json.loads(response.read().decode("utf-8")).get("videos", [])
+        videos = self._search("videos/search", {"query": keyword, "per_page": 8, "orientation": "portrait"}).get("videos", [])
         ranked = []
         for item in videos:
             files = item.get("video_files", [])
@@ -76,35 +147,116 @@ class PexelsService:
                 ranked.append({"url": best["link"], "score": score})
         return sorted(ranked, key=lambda x: x["score"], reverse=True)[0] if ranked else None
 
-    @retry(max_attempts=3, exceptions=(urllib.error.URLError,))
     def _search_image(self, keyword: str) -> dict | None:
-        params = urllib.parse.urlencode({"query": keyword, "per_page": 5, "orientation": "portrait"})
-        req = urllib.request.Request(
-            f"https://api.pexels.com/v1/search?{params}",
-            headers={"Authorization": self.api_key or ""},
-        )
-        with urllib.request.urlopen(req, timeout=25) as response:
-            photos = json.loads(response.read().decode("utf-8")).get("photos", [])
+        photos = self._search("v1/search", {"query": keyword, "per_page": 5, "orientation": "portrait"}).get("photos", [])
         if not photos:
             return None
         src = photos[0]["src"]
         return {"url": src.get("large2x") or src.get("original")}
 
+    def search_stats(self) -> dict:
+        """Process-wide totals; a job's own outcomes are counted on its tracer as `pexels_search_cache`."""
+        with self._stats_lock:
+            stats = dict(self._search_stats)
+        lookups = stats["hits"] + stats["stale"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["hits"] + stats["stale"]) / lookups, 3) if lookups else 0.0
+        return stats
+
+    def _search(self, endpoint: str, params: dict) -> dict:
+        """Cached Pexels search: fresh entries skip the API; expired ones are served stale while the API throttles."""
+        key = f"{endpoint}?{urllib.parse.urlencode(sorted(params.items()))}"
+        entry = self.search_cache.get(key)
+        now = time.time()
+        if entry:
+            ttl = self.negative_ttl if entry["empty"] else self.search_ttl
+            age = now - entry["fetched_at"]
+            if age < ttl or (self.policy.throttled() and age < self.stale_ttl):
+                self._count("hits" if age < ttl else "stale")
+                return entry["payload"]
+        try:
+            payload = self.policy.call(self._fetch_search, endpoint, params)
+        except (urllib.error.URLError, CircuitOpenError):
+            if entry and now - entry["fetched_at"] < self.stale_ttl:
+                self._count("stale")
+                return entry["payload"]
+            raise
+        self._count("misses")
+        empty = not (payload.get("videos") or payload.get("photos"))
+        self.search_cache.set(key, {"payload": payload, "fetched_at": time.time(), "empty": empty})
+        self._sweep()
+        return payload
+
+    def _sweep(self) -> None:
+        now = time.time()
+        with self._stats_lock:
+            if now - self._swept_at < self.SWEEP_INTERVAL:
+                return
+            self._swept_at = now
+        self.search_cache.prune("fetched_at", now - self.stale_ttl)
+
+    def _count(self, outcome: str) -> None:
+        with self._stats_lock:
+            self._search_stats[outcome] += 1
+        tracing.count("pexels_search_cache", outcome)
+
+    def _fetch_search(self, endpoint: str, params: dict) -> dict:
+        url = f"{self.base_url}/{endpoint}?{urllib.parse.urlencode(params)}"
+        with tracing.span("pexels.search", endpoint=endpoint), self._connections, self.http.get(url, headers={"Authorization": self.api_key or ""}, timeout=25) as response:
+            return response.json()
+
     def _download(self, url: str, keyword: str) -> Path:
         ext = ".mp4" if ".mp4" in url else ".jpg"
         digest = hashlib.md5(url.encode("utf-8")).hexdigest()[:10]
         path = self.asset_dir / f"{self._slug(keyword)}_{digest}{ext}"
-        if path.exists():
-            return path
-        with urllib.request.urlopen(url, timeout=60) as response:
-            path.write_bytes(response.read())
+        with self._download_locks_guard:
+            lock = self._download_locks.setdefault(path, threading.Lock())
+        # workers on other processes or hosts may share the asset directory
+        with lock, file_lock(path.with_name(f".{path.name}.lock")):
+            if path.exists():
+                return path
+            part = path.with_name(path.name + ".part")
+            with tracing.span("pexels.download", file=path.name), self._connections:
+                self.download_policy.call(self._stream_to, url, part)
+            os.replace(part, path)
         return path
 
+    def _stream_to(self, url: str, part: Path) -> None:
+        """Stream `url` into `part` in fixed-size chunks, resuming a previous partial file via HTTP Range."""
+        offset = part.stat().st_size if part.exists() else 0
+        try:
+            response = self.http.get(url, headers={"Range": f"bytes={offset}-"} if offset else {}, timeout=60, stream=True)
+        except urllib.error.HTTPError as exc:
+            if exc.code == 416 and offset:
+                return  # the partial file already holds the whole body
+            raise
+        with response:
+            if offset and response.status != 206:
+                offset = 0  # server ignored the Range header, start over
+            length = response.headers.get("Content-Length")
+            expected = offset + int(length) if length else None
+            if self.max_download_bytes and expected and expected > self.max_download_bytes:
+                part.unlink(missing_ok=True)
+                raise AssetTooLargeError(f"{url}: {expected} bytes")
+            written = offset
+            with part.open("ab" if offset else "wb") as handle:
+                while chunk := response.read(DOWNLOAD_CHUNK_BYTES):
+                    written += len(chunk)
+                    if self.max_download_bytes and written > self.max_download_bytes:
+                        handle.close()
+                        part.unlink(missing_ok=True)
+                        raise AssetTooLargeError(f"{url}: > {self.max_download_bytes} bytes")
+                    handle.write(chunk)
+            if expected is not None and written != expected:
+                # read() returns b"" when the server hangs up early; keep the .part so the retry resumes it
+                raise ConnectionError(f"{url}: download interrompido em {written} de {expected} bytes")
+
     def _placeholder_video(self, idx: int) -> Path:
         out = self.asset_dir / f"placeholder_{idx}.mp4"
         if out.exists():
             return out
-        subprocess.run(["ffmpeg", "-y", "-f", "lavfi", "-i", "testsrc2=size=1080x1920:rate=30", "-t", "4", str(out)], check=True, capture_output=True)
+        tmp = out.with_name(f".{os.getpid()}.{threading.get_ident()}.{out.name}")
+        tracing.run_ffmpeg(["ffmpeg", "-y", "-f", "lavfi", "-i", "testsrc2=size=1080x1920:rate=30", "-t", "4", str(tmp)], "placeholder")
+        os.replace(tmp, out)
         return out
 
     def _slug(self, text: str) -> str:
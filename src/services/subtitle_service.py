@@ -3,6 +3,7 @@ from __future__ import annotations
 from pathlib import Path
 
 from src.models import Segment, Timing
+from src.video.profiles import PROFILES, RenderProfile
 
 
 def _fmt_srt(seconds: float) -> str:
@@ -22,7 +23,10 @@ def _fmt_ass(seconds: float) -> str:
 
 
 class SubtitleService:
-    def write(self, segments: list[Segment], timings: list[Timing], out_dir: Path) -> tuple[Path, Path]:
+    # laid out for 1080x1920; smaller renders scale it together with PlayRes
+    STYLE = "Main,Montserrat,{font},&H00FFFFFF,&H0000FFFF,&H00000000,&H64000000,-1,0,0,0,100,100,0,0,1,{outline:g},{shadow:g},2,{side},{side},{bottom},1"
+
+    def write(self, segments: list[Segment], timings: list[Timing], out_dir: Path, profile: RenderProfile = PROFILES["final"]) -> tuple[Path, Path]:
         srt_path = out_dir / "subtitles.srt"
         ass_path = out_dir / "subtitles.ass"
 
@@ -31,14 +35,16 @@ class SubtitleService:
             srt_lines.extend([str(i), f"{_fmt_srt(timing.start)} --> {_fmt_srt(timing.end)}", segment.text, ""])
         srt_path.write_text("\n".join(srt_lines), encoding="utf-8")
 
-        header = """[Script Info]
+        k = profile.scale
+        style = self.STYLE.format(font=round(72 * k), outline=4 * k, shadow=1 * k, side=round(70 * k), bottom=round(220 * k))
+        header = f"""[Script Info]
 ScriptType: v4.00+
-PlayResX: 1080
-PlayResY: 1920
+PlayResX: {profile.width}
+PlayResY: {profile.height}
 
 [V4+ Styles]
 Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
-Style: Main,Montserrat,72,&H00FFFFFF,&H0000FFFF,&H00000000,&H64000000,-1,0,0,0,100,100,0,0,1,4,1,2,70,70,220,1
+Style: {style}
 
 [Events]
 Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
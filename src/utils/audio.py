@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import json
+import math
+import re
+import subprocess
+from pathlib import Path
+
+_BITRATES_KBPS = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_SAMPLE_RATES = {1: (44100, 48000, 32000), 2: (22050, 24000, 16000), 25: (11025, 12000, 8000)}
+_DURATION_RE = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+_INPUT_RE = re.compile(r"^Input #(\d+),", re.MULTILINE)
+
+
+def _frame_header(data: bytes, pos: int) -> tuple[int, int, int, int] | None:
+    """Return (frame_length, samples_per_frame, sample_rate, version) for a valid MPEG audio header at `pos`."""
+    if pos + 4 > len(data) or data[pos] != 0xFF or (data[pos + 1] & 0xE0) != 0xE0:
+        return None
+    version_bits = (data[pos + 1] >> 3) & 0x03
+    layer_bits = (data[pos + 1] >> 1) & 0x03
+    bitrate_idx = data[pos + 2] >> 4
+    rate_idx = (data[pos + 2] >> 2) & 0x03
+    padding = (data[pos + 2] >> 1) & 0x01
+    if version_bits == 1 or layer_bits == 0 or bitrate_idx in (0, 15) or rate_idx == 3:
+        return None
+
+    version = {0: 25, 2: 2, 3: 1}[version_bits]
+    layer = 4 - layer_bits
+    bitrate = _BITRATES_KBPS[(1 if version == 1 else 2, layer)][bitrate_idx] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_idx]
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate, version
+    samples = 576 if layer == 3 and version != 1 else 1152
+    return samples // 8 * bitrate // sample_rate + padding, samples, sample_rate, version
+
+
+def _vbr_frame_count(data: bytes, pos: int, version: int) -> int | None:
+    mono = (data[pos + 3] >> 6) == 3
+    side_info = (17 if mono else 32) if version == 1 else (9 if mono else 17)
+    xing = pos + 4 + side_info
+    flags = data[xing + 4:xing + 8]
+    if data[xing:xing + 4] in (b"Xing", b"Info") and len(flags) == 4 and flags[3] & 0x01:
+        return int.from_bytes(data[xing + 8:xing + 12], "big")
+    vbri = pos + 36
+    if data[vbri:vbri + 4] == b"VBRI":
+        return int.from_bytes(data[vbri + 14:vbri + 18], "big")
+    return None
+
+
+def mp3_duration(path: Path) -> float | None:
+    """Duration of an MP3 file from its frame headers (Xing/Info/VBRI when present, otherwise a frame walk).
+
+    Returns None when no MPEG audio frames can be found, so callers can fall back to ffprobe.
+    """
+    data = path.read_bytes()
+    pos = 0
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] & 0x7F) << 21 | (data[7] & 0x7F) << 14 | (data[8] & 0x7F) << 7 | (data[9] & 0x7F)
+        pos = 10 + size + (10 if data[5] & 0x10 else 0)
+
+    # resync to the first header that is followed by another valid header
+    pos = data.find(b"\xff", pos)
+    while True:
+        if pos < 0:
+            return None
+        header = _frame_header(data, pos)
+        if header and (pos + header[0] >= len(data) or _frame_header(data, pos + header[0])):
+            break
+        pos = data.find(b"\xff", pos + 1)
+
+    _, samples, sample_rate, version = header
+    frames = _vbr_frame_count(data, pos, version)
+    if frames is not None:
+        return frames * samples / sample_rate
+
+    total_samples = 0
+    while header:
+        total_samples += header[1]
+        pos += header[0]
+        header = _frame_header(data, pos)
+    return total_samples / sample_rate
+
+
+def probe_durations(paths: list[Path]) -> list[float | None]:
+    """Probe many media files with a single ffmpeg process (10 ms precision).
+
+    ffmpeg stops at the first input it cannot open, so every file missing from the combined report is
+    probed again on its own; None for a file whose duration still cannot be read (`Duration: N/A`).
+    """
+    durations = _probe(paths)
+    if len(paths) > 1:
+        for idx, duration in enumerate(durations):
+            if duration is None:
+                durations[idx] = _probe([paths[idx]])[0]
+    return durations
+
+
+def _probe(paths: list[Path]) -> list[float | None]:
+    if not paths:
+        return []
+    cmd = ["ffmpeg", "-hide_banner"]
+    for path in paths:
+        cmd.extend(["-i", str(path)])
+    # ffmpeg exits non-zero without an output file; the input report on stderr is all we need
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    durations: list[float | None] = [None] * len(paths)
+    sections = _INPUT_RE.split(result.stderr)
+    for index, report in zip(sections[1::2], sections[2::2]):
+        match = _DURATION_RE.search(report)
+        if match and int(index) < len(paths):
+            h, m, s = match.groups()
+            durations[int(index)] = int(h) * 3600 + int(m) * 60 + float(s)
+    return durations
+
+
+LOUDNORM_TARGET = {"I": -16.0, "TP": -1.5, "LRA": 11.0}
+
+
+def loudnorm_filter(measured: dict | None = None) -> str:
+    """loudnorm for the narration target; with `measured` stats it runs as a single linear-gain pass."""
+    target = ":".join(f"{name}={value:g}" for name, value in LOUDNORM_TARGET.items())
+    if not measured:
+        return f"loudnorm={target}"
+    return (
+        f"loudnorm={target}:measured_I={measured['input_i']:.2f}:measured_TP={measured['input_tp']:.2f}"
+        f":measured_LRA={measured['input_lra']:.2f}:measured_thresh={measured['input_thresh']:.2f}:linear=true"
+    )
+
+
+def measure_loudness(path: Path) -> dict | None:
+    """First-pass loudnorm analysis of one file (EBU R128 integrated, true peak, LRA and gate threshold).
+
+    None when ffmpeg cannot read the file, so an unreadable segment reaches the caller's fallback.
+    """
+    result = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-nostats", "-i", str(path), "-af", f"{loudnorm_filter()}:print_format=json", "-f", "null", "-"],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        return None
+    try:
+        report = json.loads(result.stderr[result.stderr.rindex("{"):result.stderr.rindex("}") + 1])
+        return {name: float(report[name]) for name in ("input_i", "input_tp", "input_lra", "input_thresh")}
+    except (ValueError, KeyError):
+        return None
+
+
+def _energy_mean(items: list[tuple[dict, float]]) -> float:
+    return 10 * math.log10(sum(duration * 10 ** (item["input_i"] / 10) for item, duration in items) / sum(duration for _, duration in items))
+
+
+def combine_loudness(stats: list[dict], durations: list[float]) -> dict | None:
+    """Approximate the stats of the concatenation from per-segment measurements.
+
+    Follows BS.1770 gating at segment granularity: silent segments are dropped by the absolute gate,
+    the relative gate sits 10 LU under that mean and integrated loudness is the duration-weighted energy
+    mean of what passes. True peak is the max and LRA the widest segment. None when everything is silence.
+    """
+    voiced = [(item, duration) for item, duration in zip(stats, durations) if duration > 0 and item["input_i"] > -70]
+    if not voiced:
+        return None
+    threshold = _energy_mean(voiced) - 10
+    integrated = _energy_mean([(item, duration) for item, duration in voiced if item["input_i"] >= threshold] or voiced)
+    return {
+        "input_i": max(-99.0, min(0.0, integrated)),
+        "input_tp": max(-99.0, min(99.0, max(item["input_tp"] for item in stats))),
+        "input_lra": max(0.0, min(99.0, max(item["input_lra"] for item in stats))),
+        "input_thresh": max(-99.0, min(0.0, threshold)),
+    }
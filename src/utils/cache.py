@@ -1,7 +1,18 @@
 from __future__ import annotations
 
+import fcntl
+import hashlib
 import json
+import os
+import shutil
+import sqlite3
+import threading
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Any
+
+from src.utils import tracing
 
 
 class JsonCache:
@@ -16,3 +27,271 @@ class JsonCache:
 
     def write(self, payload: dict) -> None:
         self.path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.read().get(key, default)
+
+    def set(self, key: str, value: Any) -> None:
+        self.update(key, lambda _: value)
+
+    def update(self, key: str, func: Callable[[Any], Any], default: Any = None) -> Any:
+        payload = self.read()
+        payload[key] = func(payload.get(key, default))
+        self.write(payload)
+        return payload[key]
+
+
+class SqliteFile:
+    """Per-thread connections to one SQLite file, plus IMMEDIATE write transactions.
+
+    WAL (the default) lets readers run alongside a writer but needs shared memory, so it only works for
+    processes on one host. `journal_mode="DELETE"` keeps to plain POSIX locks on the file, which is what
+    processes on different hosts sharing a network file system can rely on.
+    """
+
+    def __init__(self, path: Path, journal_mode: str = "WAL", foreign_keys: bool = False):
+        self.path = path
+        self.journal_mode = journal_mode
+        self.foreign_keys = foreign_keys
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute(f"PRAGMA journal_mode={self.journal_mode}")
+            # NORMAL is only crash-safe with WAL; a rollback journal needs FULL
+            conn.execute(f"PRAGMA synchronous={'NORMAL' if self.journal_mode == 'WAL' else 'FULL'}")
+            if self.foreign_keys:
+                conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self.conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+class StateStore:
+    """JsonCache-compatible key/value state in SQLite (WAL mode unless `journal_mode` says otherwise).
+
+    Safe for concurrent threads and processes sharing the same file: `update` is a read-modify-write of a
+    single key inside one IMMEDIATE transaction. A legacy JsonCache file is imported the first time its
+    namespace is opened.
+    """
+
+    def __init__(self, path: Path, namespace: str, legacy_json: Path | None = None, journal_mode: str = "WAL"):
+        self.path = path
+        self.namespace = namespace
+        self.db = SqliteFile(path, journal_mode=journal_mode)
+        with self.db.transaction() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS state (namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, PRIMARY KEY (namespace, key))")
+            empty = conn.execute("SELECT 1 FROM state WHERE namespace = ? LIMIT 1", (namespace,)).fetchone() is None
+            if empty and legacy_json and legacy_json.exists():
+                legacy = json.loads(legacy_json.read_text(encoding="utf-8") or "{}")
+                conn.executemany(
+                    "INSERT OR IGNORE INTO state VALUES (?, ?, ?)",
+                    [(namespace, key, json.dumps(value, ensure_ascii=False)) for key, value in legacy.items()],
+                )
+
+    def read(self) -> dict:
+        rows = self.db.conn().execute("SELECT key, value FROM state WHERE namespace = ?", (self.namespace,)).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def write(self, payload: dict) -> None:
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM state WHERE namespace = ?", (self.namespace,))
+            conn.executemany(
+                "INSERT INTO state VALUES (?, ?, ?)",
+                [(self.namespace, key, json.dumps(value, ensure_ascii=False)) for key, value in payload.items()],
+            )
+
+    def get(self, key: str, default: Any = None) -> Any:
+        row = self.db.conn().execute("SELECT value FROM state WHERE namespace = ? AND key = ?", (self.namespace, key)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, key: str, value: Any) -> None:
+        with self.db.transaction() as conn:
+            self._put(conn, key, value)
+
+    def update(self, key: str, func: Callable[[Any], Any], default: Any = None) -> Any:
+        with self.db.transaction() as conn:
+            row = conn.execute("SELECT value FROM state WHERE namespace = ? AND key = ?", (self.namespace, key)).fetchone()
+            value = func(json.loads(row[0]) if row else default)
+            self._put(conn, key, value)
+        return value
+
+    def delete(self, key: str) -> None:
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM state WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+    def prune(self, field: str, before: float) -> int:
+        """Delete entries whose numeric `field` is older than `before`; returns how many went."""
+        with self.db.transaction() as conn:
+            return conn.execute(
+                "DELETE FROM state WHERE namespace = ? AND json_extract(value, ?) < ?", (self.namespace, f"$.{field}", before)
+            ).rowcount
+
+    def _put(self, conn: sqlite3.Connection, key: str, value: Any) -> None:
+        conn.execute(
+            "INSERT INTO state VALUES (?, ?, ?) ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value",
+            (self.namespace, key, json.dumps(value, ensure_ascii=False)),
+        )
+
+
+_DIGESTS: dict[tuple[str, int, int], str] = {}
+_DIGESTS_LOCK = threading.Lock()
+
+
+def file_digest(path: Path) -> str:
+    """sha256 of a file's content, memoized per (path, size, mtime) for the process lifetime."""
+    stat = path.stat()
+    memo_key = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+    with _DIGESTS_LOCK:
+        cached = _DIGESTS.get(memo_key)
+    if cached:
+        return cached
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    value = digest.hexdigest()
+    with _DIGESTS_LOCK:
+        _DIGESTS[memo_key] = value
+    return value
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """Exclusive advisory lock on `path` (created if missing), held across processes sharing the file system."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def link_or_copy(src: Path, dest: Path) -> None:
+    dest.unlink(missing_ok=True)
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copy2(src, dest)
+
+
+class FileCache:
+    """Content-addressed file store with size-capped LRU eviction (mtime is bumped on every hit).
+
+    The cache size is scanned once and then tracked as entries are stored, so a store only walks the
+    directory when it pushes the total over `max_bytes`. Eviction then runs under a lock file shared with
+    other processes and trims down to `EVICT_TO` of the cap, which leaves room for many stores before the
+    next scan. Entries other processes stored since this one last scanned are only seen at that scan, so
+    the cap can be overshot by that much in between.
+    """
+
+    EVICT_TO = 0.9
+
+    def __init__(self, root: Path, max_bytes: int, suffix: str = ""):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._total: int | None = None
+
+    def path_for(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}{self.suffix}"
+
+    def fetch(self, key: str, dest: Path) -> bool:
+        entry = self.path_for(key)
+        try:
+            os.utime(entry)
+            link_or_copy(entry, dest)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return False
+        with self._lock:
+            self.hits += 1
+        tracing.note_fetched(dest)
+        return True
+
+    def meta(self, key: str) -> dict | None:
+        sidecar = self.path_for(key).with_suffix(".json")
+        try:
+            return json.loads(sidecar.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def update_meta(self, key: str, meta: dict) -> None:
+        sidecar = self.path_for(key).with_suffix(".json")
+        sidecar.parent.mkdir(parents=True, exist_ok=True)
+        tmp = sidecar.with_name(f".{sidecar.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, sidecar)
+
+    def store(self, key: str, src: Path, meta: dict | None = None) -> Path:
+        entry = self.path_for(key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        tmp = entry.with_name(f".{entry.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        link_or_copy(src, tmp)
+        if meta is not None:
+            self.update_meta(key, meta)
+        try:
+            replaced = entry.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+        added = tmp.stat().st_size - replaced
+        os.replace(tmp, entry)
+        os.utime(entry)
+        with self._lock:
+            if self._total is not None:
+                self._total += added
+            over = self._total is None or self._total > self.max_bytes
+        if over:
+            self.evict()
+        return entry
+
+    def evict(self) -> None:
+        """Rescan the cache and drop least recently used entries until it fits, if it does not already."""
+        with file_lock(self.root / ".evict.lock"):
+            entries = self._scan()
+            total = sum(size for _, size, _ in entries)
+            if total > self.max_bytes:
+                for _, size, path in sorted(entries):
+                    if total <= self.max_bytes * self.EVICT_TO:
+                        break
+                    path.unlink(missing_ok=True)
+                    path.with_suffix(".json").unlink(missing_ok=True)
+                    total -= size
+            with self._lock:
+                self._total = total
+
+    def _scan(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        for path in self.root.glob(f"*/*{self.suffix}"):
+            if path.name.startswith(".") or path.suffix == ".json":
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0}
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import asyncio
+import http.client
+import io
+import json
+import select
+import ssl
+import threading
+import urllib.error
+import urllib.parse
+from typing import Any
+
+REDIRECT_STATUS = {301, 302, 303, 307, 308}
+MAX_REDIRECTS = 5
+# safe to send twice: the server may have processed a request whose response never arrived
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+
+class HttpResponse:
+    """A response whose connection goes back to its pool once the body has been read to the end or closed.
+
+    Mirrors the parts of urllib's response the services use: `status`, `headers`, `read(amt)` and the
+    context manager protocol.
+    """
+
+    def __init__(self, client: "HttpClient", key: tuple[str, str, int], conn: http.client.HTTPConnection, response: http.client.HTTPResponse, url: str):
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+        self.url = url
+        self._client = client
+        self._key = key
+        self._conn: http.client.HTTPConnection | None = conn
+        self._response = response
+        self._buffer: io.BytesIO | None = None
+
+    def read(self, amt: int | None = None) -> bytes:
+        if self._buffer is not None:
+            return self._buffer.read(amt)
+        data = self._read(amt)
+        if amt is None or not data:
+            self._release()
+        return data
+
+    def json(self) -> Any:
+        return json.loads(self.read().decode("utf-8"))
+
+    def buffer(self) -> "HttpResponse":
+        """Read the whole body now and hand the connection back; later reads are served from memory."""
+        if self._buffer is None:
+            self._buffer = io.BytesIO(self._read(None))
+            self._release()
+        return self
+
+    def _read(self, amt: int | None) -> bytes:
+        try:
+            return self._response.read(amt)
+        except (OSError, http.client.HTTPException) as exc:
+            # a body cut short or timed out is a transport error, like a failed connect
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            raise urllib.error.URLError(exc) from exc
+
+    def close(self) -> None:
+        if self._conn is not None and not self._response.isclosed():
+            # an unread body would desync the next request on this connection
+            self._conn.close()
+            self._conn = None
+        self._release()
+
+    def _release(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        if self._response.isclosed() and not self._response.will_close:
+            self._client._checkin(self._key, conn)
+        else:
+            conn.close()
+
+    def __enter__(self) -> "HttpResponse":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+class HttpClient:
+    """HTTP/1.1 client with a keep-alive connection pool per (scheme, host, port), shared by all threads.
+
+    Failures surface as urllib's own exceptions (HTTPError for 4xx/5xx, URLError for transport errors), so
+    retry policies and callers treat it exactly like `urllib.request.urlopen`. Redirects are followed. A
+    pooled connection the server has closed is dropped before use; one that fails anyway is retried on a
+    fresh connection only if the request never went out or its method is idempotent, so a POST is never
+    sent twice behind the caller's back.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 30.0,
+        connect_timeout: float = 10.0,
+        max_idle_per_host: int = 8,
+        ssl_context: ssl.SSLContext | None = None,
+        user_agent: str = "aprende-aqui/1.0",
+    ):
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_idle_per_host = max(0, max_idle_per_host)
+        self.ssl_context = ssl_context or ssl.create_default_context()
+        self.user_agent = user_agent
+        self._idle: dict[tuple[str, str, int], list[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "connections": 0, "reused": 0}
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        body: bytes | None = None,
+        headers: dict[str, str] | None = None,
+        timeout: float | None = None,
+        stream: bool = False,
+    ) -> HttpResponse:
+        """Send a request; the body is read eagerly unless `stream`, in which case the caller reads and closes it."""
+        headers = {"User-Agent": self.user_agent, **(headers or {})}
+        for _ in range(MAX_REDIRECTS + 1):
+            response = self._send(method, url, body, headers, timeout or self.timeout)
+            if response.status in REDIRECT_STATUS and response.headers.get("Location"):
+                response.buffer()  # redirect bodies are tiny; draining them keeps the connection reusable
+                target = urllib.parse.urljoin(url, response.headers["Location"])
+                if urllib.parse.urlsplit(target).netloc != urllib.parse.urlsplit(url).netloc:
+                    headers = {key: value for key, value in headers.items() if key.lower() != "authorization"}
+                if response.status == 303 or (response.status in (301, 302) and method == "POST"):
+                    method, body = "GET", None
+                url = target
+                continue
+            if response.status >= 400:
+                response.buffer()
+                raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, io.BytesIO(response.read()))
+            return response if stream else response.buffer()
+        raise urllib.error.URLError(f"redirecionamentos demais: {url}")
+
+    def get(self, url: str, **kwargs: Any) -> HttpResponse:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, body: bytes, **kwargs: Any) -> HttpResponse:
+        return self.request("POST", url, body=body, **kwargs)
+
+    async def arequest(self, method: str, url: str, **kwargs: Any) -> HttpResponse:
+        """`request` on a worker thread, for asyncio callers; the pool is shared with synchronous calls."""
+        return await asyncio.to_thread(self.request, method, url, **kwargs)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["idle"] = sum(len(conns) for conns in self._idle.values())
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+    def _send(self, method: str, url: str, body: bytes | None, headers: dict[str, str], timeout: float) -> HttpResponse:
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise urllib.error.URLError(f"URL não suportada: {url}")
+        key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+        target = urllib.parse.urlunsplit(("", "", parts.path or "/", parts.query, ""))
+        while True:
+            conn, reused = self._checkout(key)
+            sent = False
+            try:
+                if conn.sock is None:
+                    conn.connect()
+                conn.sock.settimeout(timeout)
+                conn.request(method, target, body=body, headers=headers)
+                sent = True
+                response = conn.getresponse()
+            except (OSError, http.client.HTTPException) as exc:
+                conn.close()
+                # the server dropped the pooled connection under us: resend on a fresh one unless that could repeat a POST
+                if reused and isinstance(exc, STALE_CONNECTION_ERRORS) and (not sent or method in IDEMPOTENT_METHODS):
+                    continue
+                raise urllib.error.URLError(exc) from exc
+            with self._lock:
+                self._stats["requests"] += 1
+            return HttpResponse(self, key, conn, response, url)
+
+    def _checkout(self, key: tuple[str, str, int]) -> tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            conns = self._idle.get(key) or []
+            while conns:
+                conn = conns.pop()
+                if not _closed_by_peer(conn):
+                    self._stats["reused"] += 1
+                    return conn, True
+                conn.close()
+            self._stats["connections"] += 1
+        scheme, host, port = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=self.connect_timeout, context=self.ssl_context), False
+        return http.client.HTTPConnection(host, port, timeout=self.connect_timeout), False
+
+    def _checkin(self, key: tuple[str, str, int], conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            conns = self._idle.setdefault(key, [])
+            if len(conns) < self.max_idle_per_host:
+                conns.append(conn)
+                return
+        conn.close()
+
+
+def _closed_by_peer(conn: http.client.HTTPConnection) -> bool:
+    """An idle keep-alive socket is only readable once the server has closed it (or sent something unasked)."""
+    if conn.sock is None:
+        return False
+    try:
+        readable, _, _ = select.select([conn.sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    return bool(readable)
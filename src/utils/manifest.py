@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any
+
+from src.utils.cache import file_digest
+
+# upstream to downstream; `--from-stage X` recomputes X and every group after it
+STAGE_ORDER = ("script", "audio", "narration", "timing", "assets", "subtitles", "scenes", "visual", "final")
+# stands in for the run directory in stored paths, so the manifest stays valid when the run directory moves
+ROOT = "$RUN_DIR"
+
+
+class StageManifest:
+    """Make-style bookkeeping for one run directory, kept in `manifest.json`.
+
+    Each stage entry (`script`, `audio.segment_01`, `scenes.03`, ...) stores the hash of its inputs, the
+    size and sha256 of the files it wrote and an optional JSON value. A stage is reused when its inputs
+    hash is unchanged and its outputs are still on disk with the same content. Paths inside the run
+    directory are stored relative to it, so a run in a scratch workspace and one in place share entries.
+    """
+
+    def __init__(self, output_dir: Path, force: bool = False, from_stage: str | None = None):
+        if from_stage and from_stage not in STAGE_ORDER:
+            raise ValueError(f"estágio inválido: {from_stage} (opções: {', '.join(STAGE_ORDER)})")
+        self.root = output_dir
+        self.path = output_dir / "manifest.json"
+        self.force = force
+        self.from_index = STAGE_ORDER.index(from_stage) if from_stage else None
+        try:
+            self.entries: dict[str, dict] = json.loads(self.path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+        self.reused: set[str] = set()
+        self.recomputed: set[str] = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(*parts: Any) -> str:
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def fresh(self, stage: str, inputs: str) -> bool:
+        if self.force or (self.from_index is not None and STAGE_ORDER.index(stage.split(".")[0]) >= self.from_index):
+            return False
+        with self._lock:
+            entry = self.entries.get(stage)
+        if not entry or entry["inputs"] != inputs:
+            return False
+        for name, (size, digest) in entry["outputs"].items():
+            path = Path(_swap(name, ROOT, str(self.root)))
+            if not path.exists() or path.stat().st_size != size or file_digest(path) != digest:
+                return False
+        with self._lock:
+            self.reused.add(stage)
+        return True
+
+    def value(self, stage: str) -> Any:
+        with self._lock:
+            return _swap(self.entries[stage].get("value"), ROOT, str(self.root))
+
+    def record(self, stage: str, inputs: str, outputs: list[Path], value: Any = None) -> None:
+        entry = {
+            "inputs": inputs,
+            "outputs": {_swap(str(path), str(self.root), ROOT): [path.stat().st_size, file_digest(path)] for path in outputs},
+            "value": _swap(value, str(self.root), ROOT),
+        }
+        with self._lock:
+            self.entries[stage] = entry
+            self.recomputed.add(stage)
+            tmp = self.path.with_name(f".{self.path.name}.{threading.get_ident()}")
+            tmp.write_text(json.dumps(self.entries, indent=2, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, self.path)
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {"reused": sorted(self.reused), "recomputed": sorted(self.recomputed)}
+
+
+def _swap(value: Any, old: str, new: str) -> Any:
+    """Replace the `old` path prefix with `new` in every string of a JSON-like value."""
+    if isinstance(value, str):
+        return new + value[len(old):] if value == old or value.startswith(old + os.sep) else value
+    if isinstance(value, dict):
+        return {key: _swap(item, old, new) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_swap(item, old, new) for item in value]
+    return value
@@ -1,14 +1,28 @@
 from __future__ import annotations
 
+import email.utils
+import random
+import socket
+import threading
 import time
+import urllib.error
 from collections.abc import Callable
 from functools import wraps
 from typing import TypeVar
 
 T = TypeVar("T")
 
+# HTTP statuses worth another attempt; everything else in 4xx is the caller's fault
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+TRANSPORT_ERRORS = (urllib.error.URLError, socket.timeout, TimeoutError, ConnectionError)
 
-def retry(max_attempts: int = 3, base_sleep: float = 0.5, exceptions: tuple[type[Exception], ...] = (Exception,)):
+
+def backoff(attempt: int, base_sleep: float, max_sleep: float) -> float:
+    """Exponential backoff with full jitter: uniform in [0, min(max_sleep, base_sleep * 2**(attempt-1))]."""
+    return random.uniform(0, min(max_sleep, base_sleep * 2 ** (attempt - 1)))
+
+
+def retry(max_attempts: int = 3, base_sleep: float = 0.5, exceptions: tuple[type[Exception], ...] = (Exception,), max_sleep: float = 8.0):
     def decorator(func: Callable[..., T]) -> Callable[..., T]:
         @wraps(func)
         def wrapper(*args, **kwargs):
@@ -18,8 +32,222 @@ def retry(max_attempts: int = 3, base_sleep: float = 0.5, exceptions: tuple[type
                 except exceptions:
                     if attempt == max_attempts:
                         raise
-                    time.sleep(base_sleep * attempt)
+                    time.sleep(backoff(attempt, base_sleep, max_sleep))
 
         return wrapper
 
     return decorator
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, up to `burst` banked; `pause` stalls every caller."""
+
+    def __init__(self, rate: float | None, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, sleeping until it is available; returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if self.rate:
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                delay = self._paused_until - now
+                if delay <= 0:
+                    if not self.rate:
+                        return waited
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return waited
+                    delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failed calls; after `reset_after` seconds one probe call is let through."""
+
+    def __init__(self, failure_threshold: int = 5, reset_after: float = 60.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_after = reset_after
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now: float) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if now - self._opened_at >= self.reset_after else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._state(time.monotonic())
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def release(self) -> None:
+        """End a probe that failed for reasons unrelated to the provider's health; the next call probes again."""
+        with self._lock:
+            self._probing = False
+
+    def failure(self) -> bool:
+        """Record a failed call; True when this failure opened the circuit."""
+        with self._lock:
+            self._failures += 1
+            reopened = self._probing
+            self._probing = False
+            if reopened or (self._opened_at is None and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+
+class ApiPolicy:
+    """Rate limit, retry and circuit breaker for one external provider, shared by every caller of that provider.
+
+    Retries back off exponentially with full jitter; a 429/503 `Retry-After` pauses the provider's bucket for
+    all threads and is honored up to `max_retry_after` seconds, beyond which the call fails at once. When the
+    breaker is open `call` raises CircuitOpenError without touching the network, so callers can fall back.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float | None = None,
+        burst: int = 1,
+        max_attempts: int = 4,
+        base_sleep: float = 0.5,
+        max_sleep: float = 8.0,
+        max_retry_after: float = 60.0,
+        failure_threshold: int = 5,
+        reset_after: float = 60.0,
+        retry_on: tuple[type[Exception], ...] = (),
+    ):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_after)
+        self.max_attempts = max(1, max_attempts)
+        self.base_sleep = base_sleep
+        self.max_sleep = max_sleep
+        self.max_retry_after = max_retry_after
+        self.retry_on = retry_on
+        self._stats = {"calls": 0, "retries": 0, "throttled": 0, "failures": 0, "circuit_opened": 0, "short_circuited": 0, "waited_s": 0.0}
+        self._throttled_until = 0.0
+        self._stats_lock = threading.Lock()
+
+    def call(self, func: Callable[..., T], *args, **kwargs) -> T:
+        if not self.breaker.allow():
+            self._count("short_circuited")
+            raise CircuitOpenError(f"{self.name}: circuito aberto")
+        attempt = 0
+        while True:
+            attempt += 1
+            self._count("waited_s", self.bucket.acquire())
+            self._count("calls")
+            try:
+                result = func(*args, **kwargs)
+            except Exception as exc:
+                delay = self._retry_delay(exc, attempt)
+                if delay is None:
+                    self._count("failures")
+                    if not _provider_fault(exc):
+                        self.breaker.release()
+                    elif self.breaker.failure():
+                        self._count("circuit_opened")
+                    raise
+                self._count("retries")
+                self._count("waited_s", delay)
+                time.sleep(delay)
+                continue
+            self.breaker.success()
+            return result
+
+    def throttled(self) -> bool:
+        """True while the provider's last Retry-After has not elapsed or the breaker is open."""
+        with self._stats_lock:
+            throttled = time.monotonic() < self._throttled_until
+        return throttled or self.breaker.state == "open"
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["waited_s"] = round(stats["waited_s"], 3)
+        stats["circuit"] = self.breaker.state
+        return stats
+
+    def _retry_delay(self, exc: Exception, attempt: int) -> float | None:
+        """Seconds to sleep before the next attempt, or None when `exc` should be raised now."""
+        if isinstance(exc, urllib.error.HTTPError):
+            if exc.code not in RETRYABLE_STATUS:
+                return None
+            if exc.code == 429:
+                self._count("throttled")
+            retry_after = parse_retry_after(exc.headers.get("Retry-After") if exc.headers else None)
+            if retry_after is not None:
+                with self._stats_lock:
+                    self._throttled_until = max(self._throttled_until, time.monotonic() + retry_after)
+                if attempt == self.max_attempts or retry_after > self.max_retry_after:
+                    return None
+                self.bucket.pause(retry_after)
+                return retry_after + backoff(1, self.base_sleep, self.base_sleep)
+        elif not isinstance(exc, (*TRANSPORT_ERRORS, *self.retry_on)):
+            return None
+        return None if attempt == self.max_attempts else backoff(attempt, self.base_sleep, self.max_sleep)
+
+    def _count(self, key: str, amount: float = 1) -> None:
+        with self._stats_lock:
+            self._stats[key] += amount
+
+
+def _provider_fault(exc: Exception) -> bool:
+    """Transport errors, 5xx and throttling count against the provider; any other 4xx is the caller's fault."""
+    if isinstance(exc, urllib.error.HTTPError):
+        return exc.code >= 500 or exc.code in RETRYABLE_STATUS
+    return isinstance(exc, TRANSPORT_ERRORS)
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """`Retry-After` as seconds; accepts delta-seconds and HTTP dates."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any
+
+from src.utils import tracing
+
+
+class StageCancelled(Exception):
+    pass
+
+
+@dataclass(slots=True)
+class Stage:
+    name: str
+    func: Callable[..., Any]
+    deps: tuple[str, ...]
+    start: float | None = None
+    end: float | None = None
+    result: Any = None
+    done: bool = False
+
+
+@dataclass(slots=True)
+class StageGraph:
+    """Dependency-driven stage runner: each stage starts as soon as all of its deps have finished.
+
+    A stage's function receives its deps' results positionally, in `deps` order. Stages may be added
+    between `run()` calls; completed results and timings are kept across calls. Once `cancel` is set no
+    further stage starts: the running ones finish and `run()` raises StageCancelled.
+    """
+
+    # None: a thread per pending stage; the services' own limits (scene slots, connection and API caps) bound the real work
+    max_workers: int | None = None
+    cancel: threading.Event | None = None
+    stages: dict[str, Stage] = field(default_factory=dict)
+    origin: float = field(default_factory=time.perf_counter)
+
+    def add(self, name: str, func: Callable[..., Any], deps: Iterable[str] = ()) -> None:
+        deps = tuple(deps)
+        unknown = [dep for dep in deps if dep not in self.stages]
+        if name in self.stages or unknown:
+            raise ValueError(f"stage inválido: {name} (deps desconhecidas: {unknown})")
+        self.stages[name] = Stage(name, func, deps)
+
+    def run(self) -> dict[str, Any]:
+        running: dict[Future, Stage] = {}
+        pending = sum(1 for stage in self.stages.values() if not stage.done)
+        with ThreadPoolExecutor(max_workers=self.max_workers or max(1, pending)) as pool:
+            while True:
+                if self.cancel is not None and self.cancel.is_set():
+                    for pending in running:
+                        pending.cancel()
+                    raise StageCancelled(f"cancelado com {len(running)} estágios em andamento")
+                for stage in self._ready(running.values()):
+                    stage.start = time.perf_counter()
+                    args = [self.stages[dep].result for dep in stage.deps]
+                    running[pool.submit(tracing.propagate(self._call), stage, args)] = stage
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage = running.pop(future)
+                    stage.end = time.perf_counter()
+                    error = future.exception()
+                    if error is not None:
+                        for pending in running:
+                            pending.cancel()
+                        raise error
+                    stage.result = future.result()
+                    stage.done = True
+        return {name: stage.result for name, stage in self.stages.items() if stage.done}
+
+    def _call(self, stage: Stage, args: list[Any]) -> Any:
+        with tracing.span(f"stage.{stage.name}"):
+            return stage.func(*args)
+
+    def _ready(self, running: Iterable[Stage]) -> list[Stage]:
+        active = {stage.name for stage in running}
+        return [
+            stage
+            for stage in self.stages.values()
+            if not stage.done and stage.name not in active and all(self.stages[dep].done for dep in stage.deps)
+        ]
+
+    def timings(self) -> list[dict]:
+        return [
+            {
+                "stage": stage.name,
+                "deps": list(stage.deps),
+                "start": round(stage.start - self.origin, 3),
+                "end": round(stage.end - self.origin, 3),
+                "seconds": round(stage.end - stage.start, 3),
+            }
+            for stage in sorted(self.stages.values(), key=lambda s: s.start or 0.0)
+            if stage.done
+        ]
+
+    def critical_path(self) -> list[str]:
+        """Walk back from the last stage to finish, always through the dep that finished last."""
+        done = [stage for stage in self.stages.values() if stage.done]
+        if not done:
+            return []
+        stage = max(done, key=lambda s: s.end)
+        path = [stage.name]
+        while stage.deps:
+            stage = max((self.stages[dep] for dep in stage.deps), key=lambda s: s.end)
+            path.append(stage.name)
+        return path[::-1]
+
+    def log_summary(self, logger: logging.Logger) -> None:
+        for item in self.timings():
+            logger.info(f"Estágio {item['stage']}: {item['seconds']:.3f}s (início +{item['start']:.3f}s)")
+        logger.info(f"Caminho crítico: {' -> '.join(self.critical_path())}")
@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import contextvars
+import functools
+import json
+import logging
+import os
+import resource
+import subprocess
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+
+@dataclass(slots=True)
+class Span:
+    name: str
+    start: float
+    thread: str
+    parent: str | None = None
+    end: float | None = None
+    cpu_thread_s: float = 0.0
+    cpu_children_s: float = 0.0
+    process_max_rss_mb: float = 0.0  # the process's high-water mark so far, not this span's
+    peak_child_rss_mb: float | None = None  # ffmpeg spans only: that process's own peak
+    attrs: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def seconds(self) -> float:
+        return (self.end or self.start) - self.start
+
+
+class Tracer:
+    """Collects spans for one run: wall time, thread CPU and child CPU per span, plus memory figures.
+
+    Child CPU comes from RUSAGE_CHILDREN deltas, which are process-wide: exact for ffmpeg spans
+    (their own rusage via wait4) and for sequential stages, an upper bound when spans overlap.
+    Per-span peak memory is only known for ffmpeg spans; every span also records the process's
+    lifetime RSS high-water mark at its end, which says nothing about that span alone.
+    """
+
+    def __init__(self, logger: logging.Logger | None = None):
+        self.logger = logger
+        self.origin = time.perf_counter()
+        self.spans: list[Span] = []
+        self.counters: dict[str, dict[str, int]] = {}
+        self.fetched: set[Path] = set()  # files a cache linked into the run: on disk already, not written by it
+        self._lock = threading.Lock()
+
+    def count(self, group: str, key: str, amount: int = 1) -> None:
+        with self._lock:
+            counts = self.counters.setdefault(group, {})
+            counts[key] = counts.get(key, 0) + amount
+
+    @contextmanager
+    def span(self, name: str, **attrs: Any) -> Iterator[Span]:
+        _, parent = _active.get()
+        item = Span(name, time.perf_counter() - self.origin, threading.current_thread().name, parent.name if parent else None, attrs=attrs)
+        token = _active.set((self, item))
+        cpu_before = time.thread_time()
+        children_before = _children_cpu()
+        try:
+            yield item
+        finally:
+            _active.reset(token)
+            item.end = time.perf_counter() - self.origin
+            item.cpu_thread_s = time.thread_time() - cpu_before
+            item.process_max_rss_mb = _max_rss_mb(resource.RUSAGE_SELF)
+            if not item.cpu_children_s:  # ffmpeg spans already hold their own child's exact figures
+                item.cpu_children_s = _children_cpu() - children_before
+            with self._lock:
+                self.spans.append(item)
+            if self.logger:
+                self.logger.info(f"span {name}", extra={"event": {"span": self._record(item)}})
+
+    def summary(self) -> list[dict]:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        return [self._record(span) for span in spans]
+
+    def chrome_trace(self) -> dict:
+        """Trace Event Format ("X" complete events), loadable in chrome://tracing or Perfetto."""
+        with self._lock:
+            spans = list(self.spans)
+        threads = {name: idx for idx, name in enumerate(sorted({span.thread for span in spans}), start=1)}
+        return {
+            "traceEvents": [
+                {
+                    "name": span.name,
+                    "ph": "X",
+                    "ts": round(span.start * 1e6),
+                    "dur": round(span.seconds * 1e6),
+                    "pid": os.getpid(),
+                    "tid": threads[span.thread],
+                    "args": {key: value for key, value in self._record(span).items() if key not in ("name", "start", "end", "seconds")},
+                }
+                for span in spans
+            ],
+            "displayTimeUnit": "ms",
+        }
+
+    def write_chrome_trace(self, path: Path) -> Path:
+        path.write_text(json.dumps(self.chrome_trace()), encoding="utf-8")
+        return path
+
+    def _record(self, span: Span) -> dict:
+        record = asdict(span)
+        attrs = record.pop("attrs")
+        for key in ("start", "end", "cpu_thread_s", "cpu_children_s", "process_max_rss_mb"):
+            record[key] = round(record[key] or 0.0, 3)
+        if record["peak_child_rss_mb"] is None:
+            del record["peak_child_rss_mb"]
+        else:
+            record["peak_child_rss_mb"] = round(record["peak_child_rss_mb"], 3)
+        record["seconds"] = round(span.seconds, 3)
+        return {**record, **attrs}
+
+
+_active: contextvars.ContextVar[tuple[Tracer | None, Span | None]] = contextvars.ContextVar("tracing_active", default=(None, None))
+
+
+def current() -> Tracer | None:
+    return _active.get()[0]
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Span | None]:
+    """A span on the active tracer; a no-op outside a traced run."""
+    tracer = current()
+    if tracer is None:
+        yield None
+        return
+    with tracer.span(name, **attrs) as item:
+        yield item
+
+
+def count(group: str, key: str, amount: int = 1) -> None:
+    """Count an outcome (a cache hit, say) against the active run, so shared services can report per job."""
+    tracer = current()
+    if tracer is not None:
+        tracer.count(group, key, amount)
+
+
+def note_fetched(path: Path) -> None:
+    """Record a file a cache put in the active run, so disk accounting can tell it from the run's own output."""
+    tracer = current()
+    if tracer is not None:
+        with tracer._lock:
+            tracer.fetched.add(path)
+
+
+def counts(group: str) -> dict[str, int]:
+    tracer = current()
+    if tracer is None:
+        return {}
+    with tracer._lock:
+        return dict(tracer.counters.get(group, {}))
+
+
+@contextmanager
+def activate(tracer: Tracer) -> Iterator[Tracer]:
+    token = _active.set((tracer, None))
+    try:
+        yield tracer
+    finally:
+        _active.reset(token)
+
+
+def propagate(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Bind the caller's tracer and current span to `func`, for work handed to a thread pool."""
+    state = _active.get()
+
+    @functools.wraps(func)
+    def call(*args: Any, **kwargs: Any) -> Any:
+        token = _active.set(state)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _active.reset(token)
+
+    return call
+
+
+def run_ffmpeg(cmd: list[str], label: str, cwd: Path | None = None) -> subprocess.CompletedProcess:
+    """Run ffmpeg like `subprocess.run(cmd, check=True, capture_output=True)` inside a span.
+
+    `-progress pipe:1` feeds the span's fps/speed/frames, and the child is reaped with wait4 so CPU
+    time and peak RSS are that process's own.
+    """
+    with span(f"ffmpeg.{label}", output=cmd[-1]) as item:
+        if item is None:
+            return subprocess.run(cmd, cwd=cwd, check=True, capture_output=True)
+        proc = subprocess.Popen([cmd[0], "-progress", "pipe:1", "-nostats", *cmd[1:]], cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stderr: list[bytes] = []
+        reader = threading.Thread(target=lambda: stderr.append(proc.stderr.read()), daemon=True)
+        reader.start()
+        progress = _parse_progress(proc.stdout.read().decode("utf-8", "replace"))
+        reader.join()
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        proc.stdout.close()
+        proc.stderr.close()
+        item.cpu_children_s = usage.ru_utime + usage.ru_stime
+        item.peak_child_rss_mb = _kb_to_mb(usage.ru_maxrss)
+        item.attrs.update(progress)
+        if proc.returncode:
+            raise subprocess.CalledProcessError(proc.returncode, cmd, b"", b"".join(stderr))
+        return subprocess.CompletedProcess(cmd, proc.returncode, b"", b"".join(stderr))
+
+
+def _parse_progress(text: str) -> dict:
+    last: dict[str, str] = {}
+    for line in text.splitlines():
+        key, sep, value = line.partition("=")
+        if sep:
+            last[key.strip()] = value.strip()
+    result: dict[str, Any] = {}
+    if last.get("frame", "").isdigit():
+        result["frames"] = int(last["frame"])
+    for key in ("fps", "speed"):
+        try:
+            result[key] = float(last.get(key, "").rstrip("x"))
+        except ValueError:
+            pass
+    return result
+
+
+def _children_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _max_rss_mb(who: int) -> float:
+    return _kb_to_mb(resource.getrusage(who).ru_maxrss)
+
+
+def _kb_to_mb(value: int) -> float:
+    return value / 1024  # ru_maxrss is in KiB on Linux
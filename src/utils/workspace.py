@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Any
+
+from src.utils.cache import file_lock
+
+# top-level names under a run directory that are kept after a successful run; None keeps everything
+ARTIFACT_POLICIES: dict[str, tuple[str, ...] | None] = {
+    "final": ("final.mp4", "draft.mp4", "renditions", "metadata.json", "generation_report.json", "trace.json"),
+    # plus what `promote` and incremental regeneration need: the manifest's scene and visual entries point at
+    # `scenes/` and `visual_only.mp4`, so a rerun after a CTA or subtitle change only re-encodes what changed
+    "review": (
+        "final.mp4",
+        "draft.mp4",
+        "renditions",
+        "metadata.json",
+        "generation_report.json",
+        "trace.json",
+        "script.json",
+        "manifest.json",
+        "timing.json",
+        "subtitles.srt",
+        "subtitles.ass",
+        "narration_full.mp3",
+        "audio",
+        "scenes",
+        "visual_only.mp4",
+    ),
+    "all": None,
+}
+
+
+def unique_run_id(*parts: str) -> str:
+    """`<parts>_<timestamp>_<random>`, so two jobs with the same style and topic never share a directory."""
+    slug = "_".join(re.sub(r"[^\w-]+", "_", part).strip("_") for part in parts if part)
+    return f"{slug}_{time.strftime('%Y%m%d-%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+
+class Workspace:
+    """Where one run writes its files: a private scratch directory (e.g. on /dev/shm) or the run directory itself.
+
+    With a scratch root, the run directory's current files are copied in first so the manifest can still
+    reuse them. On success the artifacts named by the policy are moved to the run directory and everything
+    else is deleted; on failure everything is moved there, for resuming and debugging. Without a scratch
+    root the run writes in place and only the cleanup applies. A lock next to the run directory is held
+    from start to finish, so a second run on the same directory waits instead of sharing or wiping it.
+    """
+
+    def __init__(self, output_dir: Path, scratch_root: Path | None = None, policy: str = "review", fetched: set[Path] | None = None):
+        if policy not in ARTIFACT_POLICIES:
+            raise ValueError(f"política de artefatos inválida: {policy} (opções: {', '.join(ARTIFACT_POLICIES)})")
+        self.output_dir = output_dir
+        self.scratch_root = scratch_root
+        self.policy = policy
+        if scratch_root:
+            # stable per run directory, so the next run clears what a killed one left behind
+            tag = hashlib.sha256(str(output_dir.resolve()).encode("utf-8")).hexdigest()[:8]
+            self.path = scratch_root / f"{output_dir.name}-{tag}"
+        else:
+            self.path = output_dir
+        self.disk: dict = {}
+        # cache hits linked in during the run (a tracer's `fetched`), filled while the run goes on
+        self.fetched = fetched if fetched is not None else set()
+        self._seeded: dict[Path, tuple[int, int]] = {}
+        self._lock = ExitStack()
+
+    def __enter__(self) -> "Workspace":
+        self._lock.enter_context(file_lock(self.output_dir.with_name(f".{self.output_dir.name}.lock")))
+        try:
+            self._open()
+        except BaseException:
+            self._lock.close()
+            raise
+        return self
+
+    def __exit__(self, exc_type: Any, *exc: object) -> None:
+        try:
+            self.disk = self.close(success=exc_type is None)
+        finally:
+            self._lock.close()
+
+    def _open(self) -> None:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        if self.path != self.output_dir:
+            # only a killed run can have left this behind: a live one would still hold the lock
+            shutil.rmtree(self.path, ignore_errors=True)
+            self.path.mkdir(parents=True)
+            for src in _files(self.output_dir):
+                dest = self.path / src.relative_to(self.output_dir)
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(src, dest)  # not a hard link: an in-place rewrite would reach the run directory
+        self._seeded = {path.relative_to(self.path): _signature(path) for path in _files(self.path)}
+
+    def close(self, success: bool) -> dict:
+        """Promote and clean up; returns the bytes this run wrote to scratch and to persistent disk."""
+        keep = ARTIFACT_POLICIES[self.policy] if success else None
+        scratch = self.path != self.output_dir
+        written = promoted = removed = 0
+        fetched = {path.relative_to(self.path) for path in self.fetched if path.is_relative_to(self.path)}
+        for path in _files(self.path):
+            rel = path.relative_to(self.path)
+            stat = path.stat()
+            changed = self._seeded.get(rel) != _signature(path)
+            # a cache hit still linked to its entry was not written by this run; its own renders are linked into the cache too
+            if changed and not (rel in fetched and stat.st_nlink > 1):
+                written += stat.st_size
+            if keep is not None and rel.parts[0] not in keep:
+                continue
+            if scratch and (changed or not (self.output_dir / rel).exists()):
+                dest = self.output_dir / rel
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                shutil.move(path, dest)
+                promoted += stat.st_size
+        if scratch:
+            shutil.rmtree(self.path, ignore_errors=True)
+        if keep is not None:
+            # intermediates written in place, or left by an earlier failed run
+            for entry in list(self.output_dir.iterdir()):
+                if entry.name in keep:
+                    continue
+                if entry.is_dir():
+                    removed += sum(path.stat().st_size for path in _files(entry))
+                    shutil.rmtree(entry)
+                else:
+                    removed += entry.stat().st_size
+                    entry.unlink()
+            self._relocate_file(self.output_dir / "metadata.json")
+        on_disk = not scratch or _same_device(self.path.parent, self.output_dir)
+        return {
+            "scratch_root": str(self.scratch_root) if scratch else None,
+            "policy": self.policy if success else "all",
+            "scratch_bytes": written if scratch else 0,
+            "disk_bytes_written": written if on_disk else promoted,
+            "promoted_bytes": promoted,
+            "removed_bytes": removed,
+        }
+
+    def relocate(self, value: Any) -> Any:
+        """Rewrite workspace paths inside a report to where the files ended up."""
+        if self.path == self.output_dir:
+            return value
+        if isinstance(value, str):
+            return value.replace(str(self.path), str(self.output_dir))
+        if isinstance(value, dict):
+            return {key: self.relocate(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.relocate(item) for item in value]
+        return value
+
+    def _relocate_file(self, path: Path) -> None:
+        if path.exists() and self.path != self.output_dir:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+            path.write_text(json.dumps(self.relocate(payload), indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+def _files(root: Path) -> list[Path]:
+    return [path for path in root.rglob("*") if path.is_file()] if root.exists() else []
+
+
+def _signature(path: Path) -> tuple[int, int]:
+    stat = path.stat()
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _same_device(a: Path, b: Path) -> bool:
+    try:
+        return os.stat(a).st_dev == os.stat(b).st_dev
+    except OSError:
+        return False
@@ -1,16 +1,35 @@
 from __future__ import annotations
 
+import hashlib
 import json
+import os
 import random
 import subprocess
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
 from pathlib import Path
 
 from src.models import AssetChoice, Timing
+from src.utils import tracing
+from src.utils.cache import FileCache, file_digest
+from src.utils.manifest import StageManifest
+from src.video.motion import DEFAULT_MOTION, MOTION_BACKENDS
+from src.video.profiles import PROFILES, RenderProfile
+from src.video.renditions import Rendition
+
+RENDER_MODES = ("multi", "single")
 
 
 class VideoComposer:
-    def __init__(self, seed: int | None = None):
+    def __init__(self, seed: int | None = None, workers: int | None = None, scene_cache: FileCache | None = None, motion: dict[str, str] | None = None):
         self.random = random.Random(seed)
+        self.motion = {**DEFAULT_MOTION, **(motion or {})}
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.scene_cache = scene_cache
+        self._scene_slots = threading.Semaphore(self.workers)
 
     def compose(
         self,
@@ -22,73 +41,65 @@ class VideoComposer:
         visual_intensity: str,
         music_on: bool,
         music_path: Path | None,
+        render_mode: str = "multi",
+        rendered_scenes: list[tuple[Path, float, bool]] | None = None,
+        profile: RenderProfile = PROFILES["final"],
+        renditions: list[Rendition] | None = None,
+        manifest: StageManifest | None = None,
     ) -> tuple[Path, Path]:
-        scenes_dir = output_dir / "scenes"
-        scenes_dir.mkdir(parents=True, exist_ok=True)
-        scene_files: list[Path] = []
-
-        for asset, timing in zip(assets, timings):
-            out = scenes_dir / f"scene_{asset.segment_index:02d}.mp4"
-            zoom_to = {"low": 1.04, "medium": 1.06, "high": 1.08}.get(visual_intensity, 1.06)
-            direction = 1 if asset.segment_index % 2 else -1
-            zoom_expr = f"if(lte(on,1),1,zoom+0.0008*{direction})"
-            base = ["-stream_loop", "-1", "-i", asset.path] if asset.media_type == "video" else ["-loop", "1", "-i", asset.path]
-            vf = (
-                f"scale=1080:1920:force_original_aspect_ratio=increase,crop=1080:1920,"
-                f"zoompan=z='min(max({zoom_expr},1),{zoom_to})':d=1:s=1080x1920:fps=30"
+        final_path = output_dir / f"{profile.name}.mp4"
+        music = music_path if music_on and music_path and music_path.exists() else None
+        renditions = renditions or []
+        if renditions:
+            (output_dir / "renditions").mkdir(parents=True, exist_ok=True)
+        scene_seconds: list[dict] = []
+        scene_cache = {"hits": 0, "misses": 0}
+        workers = 1
+
+        mode = render_mode
+        if mode == "single":
+            inputs = StageManifest.key(
+                "single",
+                [file_digest(Path(asset.mezzanine_path or asset.path)) for asset in assets],
+                [self._scene_filter(asset, visual_intensity, timing.duration, profile) for asset, timing in zip(assets, timings)],
+                [timing.duration for timing in timings],
+                self._mux_inputs(narration_path, subtitles_ass, music, profile, renditions),
             )
-            if asset.segment_index % 4 == 0:
-                vf += ",eq=brightness=0.02"
-            subprocess.run(
-                ["ffmpeg", "-y", *base, "-t", f"{timing.duration}", "-vf", vf, "-an", str(out)],
-                check=True,
-                capture_output=True,
+            try:
+                outputs = self._final_stage(
+                    manifest,
+                    inputs,
+                    final_path,
+                    profile,
+                    renditions,
+                    lambda extra: self._compose_single_pass(
+                        assets, timings, narration_path, subtitles_ass, final_path, visual_intensity, music, profile, extra
+                    ),
+                )
+            except subprocess.CalledProcessError:
+                # the multi-pass path stays available as the fallback
+                mode = "multi"
+        if mode == "multi":
+            scene_seconds, scene_cache, workers, outputs = self._compose_multi_pass(
+                assets, timings, narration_path, subtitles_ass, output_dir, final_path, visual_intensity, music, rendered_scenes, profile, renditions, manifest
             )
-            scene_files.append(out)
-
-        concat_list = scenes_dir / "concat.txt"
-        concat_list.write_text("\n".join(f"file '{f.name}'" for f in scene_files), encoding="utf-8")
-        visual_mp4 = output_dir / "visual_only.mp4"
-        subprocess.run(
-            ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", str(concat_list), "-c", "copy", str(visual_mp4)],
-            cwd=scenes_dir,
-            check=True,
-            capture_output=True,
-        )
-
-        final_path = output_dir / "final.mp4"
-        mix_cmd = ["ffmpeg", "-y", "-i", str(visual_mp4), "-i", str(narration_path)]
-        if music_on and music_path and music_path.exists():
-            mix_cmd.extend(["-stream_loop", "-1", "-i", str(music_path)])
-            mix_filter = "[2:a]volume=0.08[bg];[bg][1:a]sidechaincompress=threshold=0.08:ratio=8[ducked]"
-            mix_cmd.extend(["-filter_complex", mix_filter, "-map", "0:v", "-map", "[ducked]"])
-        else:
-            mix_cmd.extend(["-map", "0:v", "-map", "1:a"])
-
-        mix_cmd.extend([
-            "-vf",
-            f"ass={subtitles_ass}",
-            "-shortest",
-            "-c:v",
-            "libx264",
-            "-preset",
-            "veryfast",
-            "-crf",
-            "20",
-            "-c:a",
-            "aac",
-            str(final_path),
-        ])
-        subprocess.run(mix_cmd, check=True, capture_output=True)
 
         metadata = output_dir / "metadata.json"
         metadata.write_text(
             json.dumps(
                 {
                     "video": str(final_path),
-                    "scene_count": len(scene_files),
+                    "scene_count": len(assets),
                     "visual_intensity": visual_intensity,
                     "music_on": music_on,
+                    "render_mode": mode,
+                    "profile": profile.name,
+                    "resolution": f"{profile.width}x{profile.height}",
+                    "motion": profile.motion or self.motion.get(visual_intensity, "zoompan"),
+                    "render_workers": workers,
+                    "scene_render_seconds": scene_seconds,
+                    "scene_cache": scene_cache,
+                    "renditions": outputs,
                 },
                 indent=2,
                 ensure_ascii=False,
@@ -96,3 +107,274 @@ class VideoComposer:
             encoding="utf-8",
         )
         return final_path, metadata
+
+    def _compose_multi_pass(
+        self,
+        assets: list[AssetChoice],
+        timings: list[Timing],
+        narration_path: Path,
+        subtitles_ass: Path,
+        output_dir: Path,
+        final_path: Path,
+        visual_intensity: str,
+        music: Path | None,
+        rendered: list[tuple[Path, float, bool]] | None = None,
+        profile: RenderProfile = PROFILES["final"],
+        renditions: list[Rendition] | None = None,
+        manifest: StageManifest | None = None,
+    ) -> tuple[list[dict], dict, int, list[dict]]:
+        scenes_dir = output_dir / "scenes"
+        scenes_dir.mkdir(parents=True, exist_ok=True)
+
+        jobs = list(zip(assets, timings))
+        workers = max(1, min(self.workers, len(jobs)))
+        if rendered is None:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                render = tracing.propagate(lambda job: self.render_scene(job[0], job[1], scenes_dir, visual_intensity, profile))
+                rendered = list(pool.map(render, jobs))
+        scene_files = [path for path, _, _ in rendered]
+        scene_seconds = [
+            {"segment_index": asset.segment_index, "seconds": round(elapsed, 3), "cache_hit": hit}
+            for (asset, _), (_, elapsed, hit) in zip(jobs, rendered)
+        ]
+        hits = sum(1 for _, _, hit in rendered if hit)
+        scene_cache = {"hits": hits, "misses": len(rendered) - hits}
+
+        visual_mp4 = output_dir / "visual_only.mp4"
+        visual_inputs = StageManifest.key([file_digest(path) for path in scene_files])
+        if not (manifest and manifest.fresh("visual", visual_inputs)):
+            self.concat_scenes(scene_files, visual_mp4)
+            if manifest:
+                manifest.record("visual", visual_inputs, [visual_mp4])
+
+        inputs = StageManifest.key(file_digest(visual_mp4), self._mux_inputs(narration_path, subtitles_ass, music, profile, renditions or []))
+        outputs = self._final_stage(
+            manifest,
+            inputs,
+            final_path,
+            profile,
+            renditions or [],
+            lambda extra: self.mux(visual_mp4, narration_path, subtitles_ass, final_path, music, profile, extra),
+        )
+        return scene_seconds, scene_cache, workers, outputs
+
+    def _mux_inputs(self, narration_path: Path, subtitles_ass: Path, music: Path | None, profile: RenderProfile, renditions: list[Rendition]) -> list:
+        return [
+            file_digest(narration_path),
+            file_digest(subtitles_ass),
+            file_digest(music) if music else None,
+            asdict(profile),
+            [asdict(rendition) for rendition in renditions],
+        ]
+
+    def _final_stage(
+        self,
+        manifest: StageManifest | None,
+        inputs: str,
+        final_path: Path,
+        profile: RenderProfile,
+        renditions: list[Rendition],
+        produce: Callable[[list[Rendition]], list[dict]],
+    ) -> list[dict]:
+        """Run the final encode unless the manifest shows the same inputs already produced `final_path`.
+
+        Renditions normally ride along in the same ffmpeg pass. If that pass fails, the main video is encoded
+        on its own and each rendition is cut from it separately, best effort: a failed rendition is reported
+        with its error instead of failing the render.
+        """
+        if manifest and manifest.fresh("final", inputs):
+            return manifest.value("final")
+        try:
+            outputs = produce(renditions)
+        except subprocess.CalledProcessError:
+            if not renditions:
+                raise
+            produce([])
+            outputs = [self.encode_rendition(final_path, rendition, profile.preset) for rendition in renditions]
+        # a run with a failed rendition is not reused, so the next one tries it again
+        if manifest and not any("error" in item for item in outputs):
+            manifest.record("final", inputs, [final_path, *(Path(item["path"]) for item in outputs)], outputs)
+        return outputs
+
+    def encode_rendition(self, final_path: Path, rendition: Rendition, preset: str) -> dict:
+        """Cut one rendition from the finished video in its own ffmpeg run; failures are returned, not raised."""
+        path = self._rendition_path(final_path, rendition)
+        audio = ["-map", "0:a"] if rendition.kind == "video" else []
+        try:
+            tracing.run_ffmpeg(
+                ["ffmpeg", "-y", "-i", str(final_path), "-vf", rendition.filter(), "-map", "0:v", *audio, *rendition.output_args(preset), str(path)],
+                f"rendition_{rendition.name}",
+            )
+        except subprocess.CalledProcessError as exc:
+            lines = (exc.stderr or b"").decode("utf-8", "replace").strip().splitlines()
+            return {**rendition.describe(str(path)), "error": lines[-1] if lines else str(exc)}
+        return rendition.describe(str(path))
+
+    @staticmethod
+    def _rendition_path(final_path: Path, rendition: Rendition) -> Path:
+        return final_path.parent / "renditions" / f"{rendition.name}{rendition.extension}"
+
+    def concat_scenes(self, scene_files: list[Path], visual_mp4: Path) -> Path:
+        """Join encoded scenes without re-encoding (stream copy through the concat demuxer)."""
+        scenes_dir = scene_files[0].parent
+        concat_list = scenes_dir / "concat.txt"
+        concat_list.write_text("\n".join(f"file '{f.name}'" for f in scene_files), encoding="utf-8")
+        tracing.run_ffmpeg(["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", str(concat_list), "-c", "copy", str(visual_mp4)], "concat", cwd=scenes_dir)
+        return visual_mp4
+
+    def mux(
+        self,
+        visual_mp4: Path,
+        narration_path: Path,
+        subtitles_ass: Path,
+        final_path: Path,
+        music: Path | None,
+        profile: RenderProfile = PROFILES["final"],
+        renditions: list[Rendition] | None = None,
+    ) -> list[dict]:
+        """Burn subtitles, mix narration (and ducked music) and encode the final video plus its renditions."""
+        mix_cmd = ["ffmpeg", "-y", "-i", str(visual_mp4), "-i", str(narration_path)]
+        graph = [f"[0:v]ass={subtitles_ass}[vout]"]
+        audio_map = "1:a"
+        if music:
+            mix_cmd.extend(["-stream_loop", "-1", "-i", str(music)])
+            graph.append(self._music_filter(1, 2))
+            audio_map = "[ducked]"
+        output_args, outputs = self._outputs(graph, "[vout]", audio_map, final_path, profile, renditions or [])
+        mix_cmd.extend(["-filter_complex", ";".join(graph), *output_args])
+        tracing.run_ffmpeg(mix_cmd, "mux")
+        return outputs
+
+    def _compose_single_pass(
+        self,
+        assets: list[AssetChoice],
+        timings: list[Timing],
+        narration_path: Path,
+        subtitles_ass: Path,
+        final_path: Path,
+        visual_intensity: str,
+        music: Path | None,
+        profile: RenderProfile = PROFILES["final"],
+        renditions: list[Rendition] | None = None,
+    ) -> list[dict]:
+        cmd = ["ffmpeg", "-y"]
+        graph: list[str] = []
+        for idx, (asset, timing) in enumerate(zip(assets, timings)):
+            cmd.extend(self._scene_input(asset))
+            vf = self._scene_filter(asset, visual_intensity, timing.duration, profile)
+            graph.append(f"[{idx}:v]{vf},trim=duration={timing.duration},setpts=PTS-STARTPTS[v{idx}]")
+        scene_labels = "".join(f"[v{idx}]" for idx in range(len(assets)))
+        graph.append(f"{scene_labels}concat=n={len(assets)}:v=1:a=0,ass={subtitles_ass}[vout]")
+
+        narration_idx = len(assets)
+        cmd.extend(["-i", str(narration_path)])
+        if music:
+            cmd.extend(["-stream_loop", "-1", "-i", str(music)])
+            graph.append(self._music_filter(narration_idx, narration_idx + 1))
+            audio_map = "[ducked]"
+        else:
+            audio_map = f"{narration_idx}:a"
+
+        output_args, outputs = self._outputs(graph, "[vout]", audio_map, final_path, profile, renditions or [])
+        cmd.extend(["-filter_complex", ";".join(graph), *output_args])
+        tracing.run_ffmpeg(cmd, "single_pass")
+        return outputs
+
+    def _outputs(
+        self, graph: list[str], video: str, audio: str, final_path: Path, profile: RenderProfile, renditions: list[Rendition]
+    ) -> tuple[list[str], list[dict]]:
+        """Output args for the main video plus every rendition, split from the same subtitled frames in `graph`."""
+        labels = [video]
+        if renditions:
+            labels = [f"[s{idx}]" for idx in range(len(renditions) + 1)]
+            graph.append(f"{video}split={len(labels)}{''.join(labels)}")
+        audio_users = 1 + sum(1 for rendition in renditions if rendition.kind == "video")
+        audio_labels = [audio] * audio_users
+        if audio.startswith("[") and audio_users > 1:
+            # a filter output can be mapped once, unlike an input stream
+            audio_labels = [f"[a{idx}]" for idx in range(audio_users)]
+            graph.append(f"{audio}asplit={audio_users}{''.join(audio_labels)}")
+
+        args = ["-map", labels[0], "-map", audio_labels[0], *self._output_args(profile), str(final_path)]
+        outputs: list[dict] = []
+        spare_audio = iter(audio_labels[1:])
+        for idx, rendition in enumerate(renditions, start=1):
+            path = self._rendition_path(final_path, rendition)
+            graph.append(f"{labels[idx]}{rendition.filter()}[r{idx}]")
+            args.extend(["-map", f"[r{idx}]"])
+            if rendition.kind == "video":
+                args.extend(["-map", next(spare_audio)])
+            args.extend([*rendition.output_args(profile.preset), str(path)])
+            outputs.append(rendition.describe(str(path)))
+        return args, outputs
+
+    def render_scene(
+        self, asset: AssetChoice, timing: Timing, scenes_dir: Path, visual_intensity: str, profile: RenderProfile = PROFILES["final"]
+    ) -> tuple[Path, float, bool]:
+        """Encode (or fetch from cache) one scene; at most `workers` encodes run at once across callers."""
+        out = scenes_dir / f"scene_{asset.segment_index:02d}.mp4"
+        vf = self._scene_filter(asset, visual_intensity, timing.duration, profile)
+        encode = self._scene_encode(profile)
+        started = time.perf_counter()
+        key = self._scene_key(asset, timing, vf, encode) if self.scene_cache else None
+        if key and self.scene_cache.fetch(key, out):
+            return out, time.perf_counter() - started, True
+
+        # never write through a hard link left by a previous cache hit
+        out.unlink(missing_ok=True)
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        with self._scene_slots:
+            # timed inside the slot, so the figure is the encode and not the wait for a free slot
+            started = time.perf_counter()
+            self._encode_scene(asset, timing, vf, encode, out, threads)
+            elapsed = time.perf_counter() - started
+        if key:
+            self.scene_cache.store(key, out)
+        return out, elapsed, False
+
+    def scene_key(self, asset: AssetChoice, timing: Timing, visual_intensity: str, profile: RenderProfile = PROFILES["final"]) -> str:
+        """Content key of a scene: source asset, duration, filter chain and encoder settings."""
+        vf = self._scene_filter(asset, visual_intensity, timing.duration, profile)
+        return self._scene_key(asset, timing, vf, self._scene_encode(profile))
+
+    def _scene_encode(self, profile: RenderProfile) -> list[str]:
+        return ["-preset", profile.scene_preset] if profile.scene_preset else []
+
+    def _encode_scene(self, asset: AssetChoice, timing: Timing, vf: str, encode: list[str], out: Path, threads: int) -> None:
+        tracing.run_ffmpeg(
+            [
+                "ffmpeg", "-y", "-filter_threads", str(threads), *self._scene_input(asset),
+                "-t", f"{timing.duration}", "-vf", vf, "-an", *encode, "-threads", str(threads), str(out),
+            ],
+            f"scene_{asset.segment_index:02d}",
+        )
+
+    def _scene_key(self, asset: AssetChoice, timing: Timing, vf: str, encode: list[str]) -> str:
+        payload = json.dumps(
+            {"asset": file_digest(Path(asset.path)), "media_type": asset.media_type, "duration": timing.duration, "vf": vf, "encode": encode},
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _scene_input(self, asset: AssetChoice) -> list[str]:
+        source = asset.mezzanine_path or asset.path
+        return ["-stream_loop", "-1", "-i", source] if asset.media_type == "video" else ["-loop", "1", "-i", source]
+
+    def _scene_filter(self, asset: AssetChoice, visual_intensity: str, duration: float, profile: RenderProfile = PROFILES["final"]) -> str:
+        backend = MOTION_BACKENDS[profile.motion or self.motion.get(visual_intensity, "zoompan")]
+        w, h = profile.width, profile.height
+        # mezzanines are already 1080x1920 (cropped), so they only need scaling for smaller profiles
+        if asset.mezzanine_path:
+            vf = "" if (w, h) == (1080, 1920) else f"scale={w}:{h},"
+        else:
+            vf = f"scale={w}:{h}:force_original_aspect_ratio=increase,crop={w}:{h},"
+        vf += backend.filter(asset.segment_index, visual_intensity, duration, w, h)
+        if asset.segment_index % 4 == 0:
+            vf += ",eq=brightness=0.02"
+        return vf
+
+    def _music_filter(self, narration_idx: int, music_idx: int) -> str:
+        return f"[{music_idx}:a]volume=0.08[bg];[bg][{narration_idx}:a]sidechaincompress=threshold=0.08:ratio=8[ducked]"
+
+    def _output_args(self, profile: RenderProfile = PROFILES["final"]) -> list[str]:
+        return ["-shortest", "-c:v", "libx264", "-preset", profile.preset, "-crf", str(profile.crf), "-c:a", "aac"]
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import threading
+from pathlib import Path
+
+from src.utils import tracing
+from src.utils.cache import file_digest, file_lock
+
+FRAME_SIZE = (1080, 1920)
+FRAME_RATE = 30
+# scenes are a few seconds long and loop their input, so a longer mezzanine only costs disk
+MEZZANINE_MAX_SECONDS = 30
+
+
+class MezzanineIngest:
+    """Render-ready copies of stock assets: 1080x1920, 30 fps, short GOP, no audio; stills pre-cropped.
+
+    Mezzanines are content-addressed by the source file's sha256, so every name a source is cached under
+    shares one transcode, and scene filters no longer need to scale or crop.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._locks: dict[Path, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def path_for(self, source: Path, media_type: str) -> Path:
+        return self.root / f"{file_digest(source)[:24]}{'.mp4' if media_type == 'video' else '.jpg'}"
+
+    def ensure(self, source: Path, media_type: str) -> Path | None:
+        """Mezzanine for `source`, transcoding it on first use; None when ffmpeg cannot handle the file."""
+        out = self.path_for(source, media_type)
+        with self._locks_guard:
+            lock = self._locks.setdefault(out, threading.Lock())
+        # the thread lock keeps file_lock to one flock per process; file_lock serializes farm workers
+        with lock, file_lock(out.with_name(f".{out.name}.lock")):
+            if out.exists():
+                return out
+            tmp = out.with_name(f".{os.getpid()}.{out.name}")
+            try:
+                tracing.run_ffmpeg(self._command(source, media_type, tmp), f"ingest_{media_type}")
+            except (OSError, subprocess.CalledProcessError):
+                tmp.unlink(missing_ok=True)
+                return None
+            os.replace(tmp, out)
+        return out
+
+    def _command(self, source: Path, media_type: str, out: Path) -> list[str]:
+        width, height = FRAME_SIZE
+        vf = f"scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height},setsar=1"
+        if media_type != "video":
+            return ["ffmpeg", "-y", "-i", str(source), "-vf", vf, "-frames:v", "1", "-q:v", "2", str(out)]
+        return [
+            "ffmpeg", "-y", "-i", str(source), "-t", str(MEZZANINE_MAX_SECONDS), "-vf", f"{vf},fps={FRAME_RATE}", "-an",
+            "-c:v", "libx264", "-preset", "veryfast", "-crf", "18", "-pix_fmt", "yuv420p",
+            "-g", str(FRAME_RATE // 2), "-bf", "0", "-movflags", "+faststart", str(out),
+        ]
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+
+@dataclass(slots=True, frozen=True)
+class RenderProfile:
+    name: str
+    width: int
+    height: int
+    preset: str
+    crf: int
+    scene_preset: str | None  # intermediate scene encodes; None keeps the libx264 default
+    motion: str | None  # forces one motion backend; None keeps the per-intensity choice
+    loudnorm: bool
+
+    @property
+    def scale(self) -> float:
+        """Size factor for layouts drawn at 1080x1920, such as the subtitle style."""
+        return self.height / 1920
+
+
+PROFILES = {
+    "final": RenderProfile("final", 1080, 1920, "veryfast", 20, None, None, True),
+    # quick review renders: quarter of the pixels, cheapest encoder settings and raw narration levels
+    "draft": RenderProfile("draft", 540, 960, "ultrafast", 28, "ultrafast", "pan_fast", False),
+}
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+
+@dataclass(slots=True, frozen=True)
+class Rendition:
+    """An extra output cut from the final, subtitled frames: a platform encode, a cover still or a short preview."""
+
+    name: str
+    kind: str  # video | thumbnail | preview
+    width: int
+    height: int
+    extension: str = ".mp4"
+    crf: int | None = None
+    video_bitrate: str | None = None
+    audio_bitrate: str = "128k"
+    fps: int | None = None
+    seconds: float = 0.0  # thumbnail timestamp, or preview length
+
+    def filter(self) -> str:
+        scale = f"scale={self.width}:{self.height}"
+        if self.kind == "thumbnail":
+            return f"select='gte(t,{self.seconds:g})',{scale}"
+        if self.kind == "preview":
+            return f"trim=duration={self.seconds:g},setpts=PTS-STARTPTS,fps={self.fps},{scale}"
+        return f"{scale},fps={self.fps}" if self.fps else scale
+
+    def output_args(self, preset: str) -> list[str]:
+        if self.kind == "thumbnail":
+            return ["-frames:v", "1", "-q:v", "2"]
+        if self.kind == "preview":
+            codec = ["-c:v", "libwebp", "-quality", "60"] if self.extension == ".webp" else []
+            return ["-an", *codec, "-loop", "0"]
+        if self.video_bitrate:
+            bitrate = parse_bitrate(self.video_bitrate)
+            video = ["-b:v", self.video_bitrate, "-maxrate", self.video_bitrate, "-bufsize", str(2 * bitrate)]
+        else:
+            video = ["-crf", str(self.crf if self.crf is not None else 20)]
+        return ["-shortest", "-c:v", "libx264", "-preset", preset, *video, "-c:a", "aac", "-b:a", self.audio_bitrate, "-movflags", "+faststart"]
+
+    def describe(self, path: str) -> dict:
+        item = {"name": self.name, "kind": self.kind, "path": path, "resolution": f"{self.width}x{self.height}"}
+        if self.kind == "video":
+            item.update({"crf": self.crf, "video_bitrate": self.video_bitrate, "audio_bitrate": self.audio_bitrate})
+        return item
+
+
+def parse_bitrate(value: str) -> int:
+    """ffmpeg-style bitrate ("2.5M", "800k", "1500000") in bits per second."""
+    units = {"k": 1000, "K": 1000, "M": 1_000_000}
+    if value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(float(value))
+
+
+RENDITIONS = {
+    "shorts": Rendition("shorts", "video", 1080, 1920, crf=20, audio_bitrate="192k"),
+    "reels": Rendition("reels", "video", 1080, 1920, video_bitrate="5M", audio_bitrate="128k"),
+    "tiktok": Rendition("tiktok", "video", 720, 1280, video_bitrate="3M", audio_bitrate="128k"),
+    "thumbnail": Rendition("thumbnail", "thumbnail", 1080, 1920, extension=".jpg", seconds=1.0),
+    "preview_webp": Rendition("preview_webp", "preview", 270, 480, extension=".webp", fps=10, seconds=5.0),
+    "preview_gif": Rendition("preview_gif", "preview", 270, 480, extension=".gif", fps=8, seconds=4.0),
+}
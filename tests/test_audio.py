@@ -0,0 +1,103 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from src.utils import audio
+from src.utils.audio import combine_loudness, measure_loudness, mp3_duration, probe_durations
+
+MPEG1, MPEG2 = 3, 2  # version bits of the header
+
+
+def _frame(version: int = MPEG1, bitrate_idx: int = 9, rate_idx: int = 0, mono: bool = False, body: bytes = b"") -> bytes:
+    """One layer III frame: 128 kbps / 44.1 kHz by default (MPEG-2 index 9 is 80 kbps, rate 0 is 22.05 kHz)."""
+    header = bytes([0xFF, 0xE0 | version << 3 | 1 << 1 | 1, bitrate_idx << 4 | rate_idx << 2, 0xC0 if mono else 0x00])
+    bitrate = {MPEG1: 128_000, MPEG2: 80_000}[version]
+    rate, samples = {MPEG1: (44100, 1152), MPEG2: (22050, 576)}[version]
+    length = samples // 8 * bitrate // rate
+    return (header + body).ljust(length, b"\x00")
+
+
+def _write(tmp_path: Path, data: bytes) -> Path:
+    path = tmp_path / "segment.mp3"
+    path.write_bytes(data)
+    return path
+
+
+def test_cbr_duration_walks_every_frame(tmp_path):
+    assert mp3_duration(_write(tmp_path, _frame() * 38)) == pytest.approx(38 * 1152 / 44100)
+
+
+def test_mpeg2_frames_use_their_own_tables(tmp_path):
+    assert mp3_duration(_write(tmp_path, _frame(MPEG2) * 10)) == pytest.approx(10 * 576 / 22050)
+
+
+def test_xing_header_frame_count_wins_over_the_walk(tmp_path):
+    # side info is 32 bytes for MPEG-1 stereo; flag bit 0 says the frame count follows
+    xing = bytes(32) + b"Xing" + (1).to_bytes(4, "big") + (1000).to_bytes(4, "big")
+    data = _frame(body=xing) + _frame() * 3
+    assert mp3_duration(_write(tmp_path, data)) == pytest.approx(1000 * 1152 / 44100)
+
+
+def test_id3_tag_is_skipped_even_when_it_looks_like_a_frame(tmp_path):
+    tag_body = _frame() * 2  # e.g. an embedded clip; syncsafe size 834 = 6 * 128 + 66
+    tag = b"ID3\x04\x00\x00" + bytes([0, 0, 6, 66]) + tag_body
+    assert mp3_duration(_write(tmp_path, tag + _frame() * 5)) == pytest.approx(5 * 1152 / 44100)
+
+
+@pytest.mark.parametrize("data", [b"", b"<html>quota exceeded</html>", b"\xff\xff\xff\xff" * 50])
+def test_unparseable_data_returns_none(tmp_path, data):
+    assert mp3_duration(_write(tmp_path, data)) is None
+
+
+def _ffmpeg_report(files: list[str]) -> str:
+    """stderr of `ffmpeg -i a -i b ...`: one section per input until the first one ffmpeg cannot open."""
+    lines = []
+    for idx, name in enumerate(files):
+        if name.startswith("bad"):
+            lines.append(f"{name}: Invalid data found when processing input")
+            break
+        duration = "N/A" if name.startswith("na") else f"00:01:0{idx}.25"
+        lines += [f"Input #{idx}, mp3, from '{name}':", f"  Duration: {duration}, start: 0.000000, bitrate: 128 kb/s"]
+    return "\n".join([*lines, "At least one output file must be specified"])
+
+
+def test_probe_maps_durations_to_inputs_and_reprobes_the_rest(monkeypatch):
+    calls = []
+
+    def run(cmd, **kwargs):
+        files = cmd[3::2]
+        calls.append(files)
+        return SimpleNamespace(returncode=1, stderr=_ffmpeg_report(files))
+
+    monkeypatch.setattr(audio.subprocess, "run", run)
+    durations = probe_durations([Path(name) for name in ("a.mp3", "na.mp3", "b.mp3", "bad.mp3", "c.mp3")])
+    assert durations == [60.25, None, 62.25, None, 60.25]
+    assert calls[1:] == [["na.mp3"], ["bad.mp3"], ["c.mp3"]]
+
+
+def test_measure_loudness_returns_none_when_ffmpeg_cannot_read(monkeypatch):
+    monkeypatch.setattr(audio.subprocess, "run", lambda *args, **kwargs: SimpleNamespace(returncode=1, stderr="Invalid data"))
+    assert measure_loudness(Path("broken.mp3")) is None
+
+
+def _stats(integrated: float, tp: float = -3.0, lra: float = 4.0) -> dict:
+    return {"input_i": integrated, "input_tp": tp, "input_lra": lra, "input_thresh": integrated - 10}
+
+
+def test_combine_loudness_gates_silence_and_quiet_segments():
+    stats = [_stats(-20, tp=-2.0), _stats(-20, lra=7.0), _stats(-40), _stats(-80)]
+    combined = combine_loudness(stats, [1.0, 1.0, 1.0, 5.0])
+    # -80 fails the absolute gate; -40 is more than 10 LU under the mean of what is left
+    assert combined["input_i"] == pytest.approx(-20.0)
+    assert combined["input_thresh"] == pytest.approx(-31.74, abs=0.01)
+    assert (combined["input_tp"], combined["input_lra"]) == (-2.0, 7.0)
+
+
+def test_combine_loudness_weights_by_duration():
+    combined = combine_loudness([_stats(-20), _stats(-26)], [3.0, 1.0])
+    assert combined["input_i"] == pytest.approx(-20.9, abs=0.01)
+
+
+def test_combine_loudness_of_silence_is_none():
+    assert combine_loudness([_stats(-80), _stats(-90)], [1.0, 2.0]) is None
@@ -0,0 +1,51 @@
+import os
+
+from src.utils.cache import FileCache
+
+
+def _store(cache: FileCache, tmp_path, key: str, size: int = 100, age: int = 0):
+    src = tmp_path / f"{key}.src"
+    src.write_bytes(b"x" * size)
+    entry = cache.store(key, src, meta={"key": key})
+    stamp = entry.stat().st_mtime - age
+    os.utime(entry, (stamp, stamp))
+    return entry
+
+
+def test_least_recently_used_entries_are_evicted_below_the_cap(tmp_path):
+    cache = FileCache(tmp_path / "cache", 1000, suffix=".mp4")
+    for idx in range(10):
+        _store(cache, tmp_path, f"{idx:02d}" * 32, age=100 - idx)
+    assert cache.fetch("00" * 32, tmp_path / "hit.mp4")  # the oldest entry becomes the newest
+
+    _store(cache, tmp_path, "aa" * 32)
+    kept = sorted(path.name[:2] for path in cache.root.glob("*/*.mp4"))
+    # 1100 bytes: trimmed to EVICT_TO of the cap, oldest first
+    assert kept == ["00", "03", "04", "05", "06", "07", "08", "09", "aa"]
+    assert cache.meta("01" * 32) is None and cache.meta("00" * 32) == {"key": "00" * 32}
+
+
+def test_stores_under_the_cap_do_not_rescan(tmp_path, monkeypatch):
+    cache = FileCache(tmp_path / "cache", 1000, suffix=".mp4")
+    scans = []
+    scan = cache._scan
+    monkeypatch.setattr(cache, "_scan", lambda: scans.append(1) or scan())
+    for idx in range(10):
+        _store(cache, tmp_path, f"{idx:02d}" * 32)
+    assert len(scans) == 1  # the first store learns the size
+
+    _store(cache, tmp_path, "00" * 32)  # replacing an entry does not grow the cache
+    _store(cache, tmp_path, "aa" * 32)
+    assert len(scans) == 2
+
+
+def test_a_scan_picks_up_entries_stored_by_other_processes(tmp_path):
+    first = FileCache(tmp_path / "cache", 1000, suffix=".mp4")
+    second = FileCache(tmp_path / "cache", 1000, suffix=".mp4")
+    _store(first, tmp_path, "00" * 32, size=600, age=10)
+    _store(second, tmp_path, "11" * 32, size=300)
+    _store(first, tmp_path, "22" * 32, size=300)  # 900 bytes as far as `first` knows
+    assert len(list(first.root.glob("*/*.mp4"))) == 3
+
+    _store(first, tmp_path, "33" * 32, size=200)
+    assert sorted(path.name[:2] for path in first.root.glob("*/*.mp4")) == ["11", "22", "33"]
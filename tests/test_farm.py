@@ -0,0 +1,64 @@
+import time
+from pathlib import Path
+
+from src.farm import WorkQueue
+
+
+def _queue(tmp_path: Path, jobs: int = 1, max_attempts: int = 3) -> WorkQueue:
+    queue = WorkQueue(tmp_path / "queue.sqlite3", max_attempts=max_attempts)
+    queue.enqueue(iter({"id": f"job-{idx}", "topic": f"tema {idx}"} for idx in range(jobs)))
+    for worker in ("a", "b"):
+        queue.register(worker)
+    return queue
+
+
+def _expire(queue: WorkQueue, worker: str) -> None:
+    queue.claim(worker, 0.01)
+    time.sleep(0.02)
+
+
+def test_enqueue_skips_known_jobs_and_claims_in_order(tmp_path):
+    queue = _queue(tmp_path, jobs=2)
+    assert queue.enqueue(iter([{"id": "job-0"}, {"id": "job-2"}])) == {"enqueued": 1, "skipped": 1}
+
+    first, second = queue.claim("a", 60), queue.claim("b", 60)
+    assert (first.job_id, first.attempt, first.payload["topic"]) == ("job-0", 1, "tema 0")
+    assert second.job_id == "job-1"
+    assert queue.complete("a", "job-0", {"final": "final.mp4"}, 1.0)
+    assert queue.stats()["queue"] == {"queued": 1, "leased": 1, "done": 1, "failed": 0}
+
+
+def test_expired_lease_is_requeued_and_fences_the_old_holder(tmp_path):
+    queue = _queue(tmp_path)
+    _expire(queue, "a")
+    assert queue.requeue_expired() == 1
+
+    lease = queue.claim("b", 60)
+    assert (lease.job_id, lease.attempt) == ("job-0", 2)
+    # "a" lost the lease: it can neither extend it nor overwrite the outcome of "b"
+    assert not queue.heartbeat("a", "job-0", 60)
+    assert not queue.complete("a", "job-0", {"final": "stale.mp4"}, 1.0)
+    assert not queue.fail("a", "job-0", "boom", 1.0)
+    assert queue.heartbeat("b", "job-0", 60)
+    assert queue.complete("b", "job-0", {"final": "final.mp4"}, 1.0)
+    assert queue.stats()["queue"]["done"] == 1
+
+
+def test_job_fails_for_good_after_max_attempts(tmp_path):
+    queue = _queue(tmp_path, max_attempts=2)
+    _expire(queue, "a")
+    _expire(queue, "b")
+    assert queue.requeue_expired() == 1
+    assert queue.claim("a", 60) is None
+    assert queue.stats()["queue"]["failed"] == 1
+
+
+def test_retryable_failure_requeues_until_attempts_run_out(tmp_path):
+    queue = _queue(tmp_path, max_attempts=2)
+    queue.claim("a", 60)
+    assert queue.fail("a", "job-0", "ffmpeg", 1.0)
+    assert queue.pending() == 1
+    queue.claim("b", 60)
+    assert queue.fail("b", "job-0", "ffmpeg", 1.0)
+    assert queue.pending() == 0
+    assert queue.stats()["queue"]["failed"] == 1
@@ -0,0 +1,68 @@
+import socket
+import threading
+import time
+import urllib.error
+
+import pytest
+
+from src.utils.http import HttpClient
+
+
+class _Server:
+    """Keep-alive server that answers one request per connection, then hangs up: right away when `idle_close`,
+    otherwise after reading (and so processing) the next one."""
+
+    def __init__(self, idle_close: bool = False):
+        self.idle_close = idle_close
+        self.received: list[str] = []
+        self.sock = socket.create_server(("127.0.0.1", 0))
+        self.url = f"http://127.0.0.1:{self.sock.getsockname()[1]}/"
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self) -> None:
+        while True:
+            conn, _ = self.sock.accept()
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn: socket.socket) -> None:
+        with conn, conn.makefile("rb") as stream:
+            for served in range(2):
+                request = stream.readline().decode()
+                if not request:
+                    return
+                length = 0
+                while (line := stream.readline()) not in (b"\r\n", b""):
+                    name, _, value = line.decode().partition(":")
+                    if name.lower() == "content-length":
+                        length = int(value)
+                stream.read(length)
+                self.received.append(request.split()[0])
+                if served:
+                    return  # processed, but the response never goes out
+                conn.sendall(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+                if self.idle_close:
+                    return
+
+
+def test_dropped_pooled_connection_resends_an_idempotent_request():
+    server, client = _Server(), HttpClient()
+    client.get(server.url)
+    assert client.get(server.url).read() == b"ok"
+    assert server.received == ["GET", "GET", "GET"]
+
+
+def test_dropped_pooled_connection_never_resends_a_post():
+    server, client = _Server(), HttpClient()
+    client.get(server.url)
+    with pytest.raises(urllib.error.URLError):
+        client.post(server.url, b"{}")
+    assert server.received == ["GET", "POST"]
+
+
+def test_connection_closed_while_idle_is_replaced_before_a_post():
+    server, client = _Server(idle_close=True), HttpClient()
+    client.get(server.url)
+    time.sleep(0.05)
+    assert client.post(server.url, b"{}").read() == b"ok"
+    assert server.received == ["GET", "POST"]
+    assert client.stats()["reused"] == 0
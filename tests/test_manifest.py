@@ -0,0 +1,78 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from src.utils.manifest import ROOT, StageManifest
+
+
+def _record(manifest: StageManifest, stage: str, inputs: str, name: str, content: bytes = b"data", value=None) -> Path:
+    path = manifest.root / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    manifest.record(stage, inputs, [path], value)
+    return path
+
+
+def test_unchanged_inputs_are_reused(tmp_path):
+    _record(StageManifest(tmp_path), "script", "k1", "script.json")
+    manifest = StageManifest(tmp_path)
+    assert manifest.fresh("script", "k1")
+    assert manifest.summary() == {"reused": ["script"], "recomputed": []}
+
+
+def test_changed_inputs_are_recomputed(tmp_path):
+    _record(StageManifest(tmp_path), "script", "k1", "script.json")
+    assert not StageManifest(tmp_path).fresh("script", "k2")
+    assert not StageManifest(tmp_path).fresh("subtitles", "k1")
+
+
+def test_missing_or_changed_output_is_recomputed(tmp_path):
+    manifest = StageManifest(tmp_path)
+    script = _record(manifest, "script", "k1", "script.json")
+    scene = _record(manifest, "scenes.00", "k1", "scenes/scene_00.mp4", b"abcd")
+
+    scene.write_bytes(b"abce")  # same size, different content
+    script.unlink()
+    manifest = StageManifest(tmp_path)
+    assert not manifest.fresh("script", "k1")
+    assert not manifest.fresh("scenes.00", "k1")
+
+
+def test_paths_are_stored_relative_to_the_run_directory(tmp_path):
+    first = tmp_path / "scratch"
+    _record(StageManifest(first), "audio.segment_01", "k1", "audio/segment_01.mp3", value={"path": str(first / "audio" / "segment_01.mp3")})
+    entries = json.loads((first / "manifest.json").read_text(encoding="utf-8"))
+    assert list(entries["audio.segment_01"]["outputs"]) == [f"{ROOT}/audio/segment_01.mp3"]
+
+    # the run directory moves (scratch workspace promoted to output/): the entry still holds
+    moved = tmp_path / "output"
+    first.rename(moved)
+    manifest = StageManifest(moved)
+    assert manifest.fresh("audio.segment_01", "k1")
+    assert manifest.value("audio.segment_01") == {"path": str(moved / "audio" / "segment_01.mp3")}
+
+
+def test_force_recomputes_everything(tmp_path):
+    _record(StageManifest(tmp_path), "script", "k1", "script.json")
+    assert not StageManifest(tmp_path, force=True).fresh("script", "k1")
+
+
+@pytest.mark.parametrize(
+    ("from_stage", "expected"),
+    [
+        ("scenes", {"script": True, "assets.00": True, "scenes.00": False, "final": False}),
+        ("script", {"script": False, "assets.00": False, "scenes.00": False, "final": False}),
+    ],
+)
+def test_from_stage_recomputes_that_stage_and_everything_after_it(tmp_path, from_stage, expected):
+    manifest = StageManifest(tmp_path)
+    for stage in expected:
+        _record(manifest, stage, "k1", f"{stage}.out")
+    manifest = StageManifest(tmp_path, from_stage=from_stage)
+    assert {stage: manifest.fresh(stage, "k1") for stage in expected} == expected
+
+
+def test_unknown_from_stage_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        StageManifest(tmp_path, from_stage="render")
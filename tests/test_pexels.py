@@ -0,0 +1,18 @@
+import time
+
+from src.services.pexels_service import PexelsService
+
+
+def test_search_entries_past_the_stale_ttl_are_swept_on_write(tmp_path, monkeypatch):
+    service = PexelsService(None, tmp_path, stale_ttl=3600)
+    monkeypatch.setattr(service, "_fetch_search", lambda endpoint, params: {"videos": [{"id": params["query"]}]})
+    service.search_cache.set("videos/search?query=velho", {"payload": {}, "fetched_at": time.time() - 7200, "empty": True})
+    service.search_cache.set("videos/search?query=recente", {"payload": {}, "fetched_at": time.time() - 60, "empty": True})
+
+    service._search("videos/search", {"query": "novo"})
+    assert sorted(service.search_cache.read()) == ["videos/search?query=novo", "videos/search?query=recente"]
+
+    # later writes within SWEEP_INTERVAL leave the table alone
+    service.search_cache.set("videos/search?query=velho", {"payload": {}, "fetched_at": time.time() - 7200, "empty": True})
+    service._search("videos/search", {"query": "outro"})
+    assert "videos/search?query=velho" in service.search_cache.read()
@@ -0,0 +1,135 @@
+import email.utils
+import time
+import urllib.error
+
+import pytest
+
+from src.utils.retry import ApiPolicy, CircuitBreaker, CircuitOpenError, TokenBucket, parse_retry_after
+
+
+def _unreachable():
+    raise urllib.error.URLError("connection refused")
+
+
+def _http_error(code: int, retry_after: str | None = None) -> urllib.error.HTTPError:
+    headers = {"Retry-After": retry_after} if retry_after else {}
+    return urllib.error.HTTPError("http://provider.test", code, "error", headers, None)
+
+
+def _flaky(*errors: Exception):
+    pending = list(errors)
+
+    def call():
+        if pending:
+            raise pending.pop(0)
+        return "ok"
+
+    return call
+
+
+def _open(policy: ApiPolicy) -> None:
+    for _ in range(policy.breaker.failure_threshold):
+        with pytest.raises(urllib.error.URLError):
+            policy.call(_unreachable)
+    assert policy.breaker.state == "open"
+
+
+def test_probe_error_unrelated_to_provider_releases_half_open_circuit():
+    policy = ApiPolicy("test", max_attempts=1, failure_threshold=2, reset_after=0.05)
+    _open(policy)
+    with pytest.raises(CircuitOpenError):
+        policy.call(lambda: 1)
+
+    time.sleep(0.06)
+    assert policy.breaker.state == "half_open"
+    with pytest.raises(KeyError):
+        policy.call(lambda: {}["candidates"])
+
+    # the failed probe must not wedge the breaker: the next call probes again and closes it
+    assert policy.call(lambda: 1) == 1
+    assert policy.breaker.state == "closed"
+
+
+def test_token_bucket_paces_after_the_burst():
+    bucket = TokenBucket(rate=50, burst=2)
+    assert bucket.acquire() == 0 and bucket.acquire() == 0
+    assert bucket.acquire() == pytest.approx(0.02, abs=0.01)
+
+
+def test_token_bucket_pause_stalls_unlimited_callers():
+    bucket = TokenBucket(rate=None)
+    bucket.pause(0.05)
+    started = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - started >= 0.04
+
+
+def test_parse_retry_after_accepts_seconds_and_http_dates():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("-5") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    assert 25 < parse_retry_after(email.utils.formatdate(time.time() + 30, usegmt=True)) <= 30
+
+
+def test_circuit_breaker_lets_one_probe_through_and_closes_on_success():
+    breaker = CircuitBreaker(failure_threshold=2, reset_after=0.05)
+    assert not breaker.failure()
+    assert breaker.failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()  # a single probe at a time
+    breaker.success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_circuit_breaker_failed_probe_reopens_at_once():
+    breaker = CircuitBreaker(failure_threshold=3, reset_after=0.05)
+    for _ in range(3):
+        breaker.failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.failure()
+    assert breaker.state == "open"
+
+
+def test_policy_retries_transient_statuses_honoring_retry_after():
+    policy = ApiPolicy("test", max_attempts=3, base_sleep=0.001)
+    assert policy.call(_flaky(_http_error(503), _http_error(429, "0.02"))) == "ok"
+    stats = policy.stats()
+    assert (stats["calls"], stats["retries"], stats["throttled"], stats["failures"]) == (3, 2, 1, 0)
+    assert stats["waited_s"] >= 0.02
+
+
+def test_policy_fails_fast_on_client_errors_and_long_retry_after():
+    policy = ApiPolicy("test", max_attempts=4, base_sleep=0.001, max_retry_after=1)
+    with pytest.raises(urllib.error.HTTPError):
+        policy.call(_flaky(_http_error(404)))
+    with pytest.raises(urllib.error.HTTPError):
+        policy.call(_flaky(_http_error(429, "120")))
+    assert policy.throttled()
+    assert policy.stats()["calls"] == 2
+
+
+def test_policy_short_circuits_once_the_breaker_opens():
+    policy = ApiPolicy("test", max_attempts=1, failure_threshold=2, reset_after=60)
+    _open(policy)
+    with pytest.raises(CircuitOpenError):
+        policy.call(lambda: 1)
+    stats = policy.stats()
+    assert (stats["circuit_opened"], stats["short_circuited"], stats["circuit"]) == (1, 1, "open")
+
+
+def test_client_errors_do_not_open_the_circuit():
+    policy = ApiPolicy("test", max_attempts=1, failure_threshold=2)
+    for _ in range(5):
+        with pytest.raises(urllib.error.HTTPError):
+            policy.call(_flaky(_http_error(404)))
+    assert policy.breaker.state == "closed"
+
+    for _ in range(2):
+        with pytest.raises(urllib.error.HTTPError):
+            policy.call(_flaky(_http_error(502)))
+    assert policy.breaker.state == "open"
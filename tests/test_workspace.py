@@ -0,0 +1,98 @@
+import json
+import threading
+import time
+
+import pytest
+
+from src.utils import tracing
+from src.utils.cache import FileCache
+from src.utils.tracing import Tracer
+from src.utils.workspace import Workspace
+
+
+def _write(path, content: bytes = b"x" * 100) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+
+
+def test_in_place_run_keeps_only_the_policy_artifacts(tmp_path):
+    out = tmp_path / "run"
+    with Workspace(out, policy="final") as ws:
+        assert ws.path == out
+        _write(ws.path / "final.mp4")
+        _write(ws.path / "scenes" / "scene_00.mp4")
+        _write(ws.path / "narration_full.mp3")
+    assert sorted(path.name for path in out.iterdir()) == ["final.mp4"]
+    assert ws.disk["disk_bytes_written"] == 300
+    assert ws.disk["removed_bytes"] == 200
+
+
+def test_scratch_run_is_seeded_and_promotes_only_what_changed(tmp_path):
+    out, scratch = tmp_path / "run", tmp_path / "shm"
+    _write(out / "script.json", b"old script")
+    _write(out / "audio" / "segment_01.mp3")
+    with Workspace(out, scratch, policy="review") as ws:
+        assert ws.path.parent == scratch
+        assert (ws.path / "audio" / "segment_01.mp3").exists()
+        _write(ws.path / "script.json", b"new script")
+        _write(ws.path / "final.mp4")
+        _write(ws.path / "tmp.txt")
+        (ws.path / "metadata.json").write_text(json.dumps({"video": str(ws.path / "final.mp4")}), encoding="utf-8")
+    assert not ws.path.exists()
+    assert (out / "script.json").read_bytes() == b"new script"
+    assert not (out / "tmp.txt").exists()
+    # report paths are rewritten to where the files ended up
+    assert json.loads((out / "metadata.json").read_text(encoding="utf-8")) == {"video": str(out / "final.mp4")}
+    assert ws.relocate({"final": [str(ws.path / "final.mp4")]}) == {"final": [str(out / "final.mp4")]}
+    assert ws.disk["scratch_bytes"] == ws.disk["promoted_bytes"] + 100  # tmp.txt was written but not promoted
+
+
+def test_failed_run_moves_everything_for_the_next_attempt(tmp_path):
+    out = tmp_path / "run"
+    with pytest.raises(RuntimeError):
+        with Workspace(out, tmp_path / "shm", policy="final") as ws:
+            _write(ws.path / "scenes" / "scene_00.mp4")
+            raise RuntimeError("ffmpeg")
+    assert (out / "scenes" / "scene_00.mp4").exists()
+    assert ws.disk["policy"] == "all"
+
+
+def test_second_run_on_the_same_directory_waits_for_the_first(tmp_path):
+    out, events = tmp_path / "run", []
+    first_in = threading.Event()
+
+    def second():
+        first_in.wait()
+        with Workspace(out, tmp_path / "shm"):
+            events.append("second")
+
+    thread = threading.Thread(target=second)
+    thread.start()
+    with Workspace(out, tmp_path / "shm"):
+        first_in.set()
+        time.sleep(0.1)
+        events.append("first")
+    thread.join(5)
+    assert events == ["first", "second"]
+
+
+def test_cache_hits_are_not_counted_as_written_but_fresh_renders_are(tmp_path):
+    cache = FileCache(tmp_path / "cache", 1 << 30, suffix=".mp4")
+
+    def run(name: str) -> int:
+        tracer = Tracer()
+        with Workspace(tmp_path / name, policy="all", fetched=tracer.fetched) as ws, tracing.activate(tracer):
+            scene = ws.path / "scenes" / "scene_00.mp4"
+            scene.parent.mkdir(parents=True)
+            if not cache.fetch("ab" * 32, scene):
+                _write(scene, b"x" * 1000)
+                cache.store("ab" * 32, scene)
+        return ws.disk["disk_bytes_written"]
+
+    assert run("first") == 1000
+    assert run("second") == 0
+
+
+def test_unknown_policy_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        Workspace(tmp_path, policy="everything")